@@ -0,0 +1,282 @@
+import argparse
+import contextlib
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, time as dtime, timedelta
+
+from src import intercambio, snapshot
+from src.frota import Frota
+from src.main import (
+    ORIGEM_AGENDADA, Agenda, FilaNotificacoes, HistoricoAlimentacao, PetFeederTech, RTC,
+    RelogioSimulado, TimerSimulado, TransporteLoopback,
+)
+from src.servidor import ServidorControle
+
+# -------------------- BENCHMARKS --------------------
+
+# Todos os resultados são "menor é melhor" (microssegundos, bytes ou segundos).
+# Cada benchmark roda `repeticoes` vezes e fica o melhor valor: o ruído da
+# máquina só piora os tempos, então o mínimo é o mais estável para comparar.
+INICIO = datetime(2025, 1, 6, 0, 0)
+BENCHMARKS = {}
+
+def benchmark(nome, unidade):
+    def registrar(funcao):
+        BENCHMARKS[nome] = (funcao, unidade)
+        return funcao
+    return registrar
+
+def _por_operacao(funcao, repeticoes):
+    inicio = time.perf_counter()
+    funcao(repeticoes)
+    return (time.perf_counter() - inicio) / repeticoes * 1e6
+
+def _horario(indice):
+    return dtime(indice // 60 % 24, indice % 60)
+
+def _silencioso(mensagem):
+    pass
+
+@benchmark("agenda_insercao", "us")
+def agenda_insercao(escala):
+    agenda = Agenda()
+    quantidade = int(100_000 * escala) or 1
+
+    def inserir(n):
+        for indice in range(n):
+            agenda.adicionar(_horario(indice), indice % 2 == 0, INICIO)
+
+    return _por_operacao(inserir, quantidade)
+
+@benchmark("agenda_proximo_disparo", "us")
+def agenda_proximo_disparo(escala):
+    agenda = Agenda()
+    for indice in range(int(100_000 * escala) or 1):
+        agenda.adicionar(_horario(indice), True, INICIO)
+
+    def consultar(n):
+        for _ in range(n):
+            agenda.proximo_disparo()
+
+    return _por_operacao(consultar, 100_000)
+
+def _tick_ocioso(quantidade):
+    feeder = PetFeederTech(_silencioso)
+    feeder.ligar()
+    agenda = feeder.agendamentos
+    for indice in range(quantidade):
+        agenda.adicionar(_horario(60 + indice % 1380), True, INICIO)
+    agenda.reiniciar_janela(INICIO)
+
+    def checar(n):
+        for segundo in range(n):
+            feeder.checar_agendamentos(INICIO + timedelta(seconds=segundo % 3600))
+
+    return _por_operacao(checar, 20_000)
+
+@benchmark("agendar_alimentacao", "us")
+def agendar_alimentacao(escala):
+    # Pelo caminho completo (alerta preditivo e replanejamento do pet),
+    # não só Agenda.adicionar: um custo que cresce com a agenda aparece aqui.
+    feeder = PetFeederTech(_silencioso)
+    feeder.ligar()
+    feeder.sensor.peso = 10 ** 12
+    feeder.configurar_pet(10, "Beagle")
+
+    def agendar(n):
+        for indice in range(n):
+            feeder.agendar_alimentacao(_horario(indice), diario=True)
+
+    return _por_operacao(agendar, int(4_000 * escala) or 1)
+
+@benchmark("tick_10_agendamentos", "us")
+def tick_10_agendamentos(escala):
+    return _tick_ocioso(10)
+
+@benchmark("tick_100k_agendamentos", "us")
+def tick_100k_agendamentos(escala):
+    return _tick_ocioso(int(100_000 * escala) or 1)
+
+@benchmark("historico_anexar", "us")
+def historico_anexar(escala):
+    historico = HistoricoAlimentacao()
+    base = INICIO.timestamp()
+
+    def anexar(n):
+        for indice in range(n):
+            historico.registrar(base + indice, 50, 500, ORIGEM_AGENDADA)
+
+    return _por_operacao(anexar, int(1_000_000 * escala) or 1)
+
+@benchmark("historico_consulta_pagina", "us")
+def historico_consulta_pagina(escala):
+    historico = HistoricoAlimentacao()
+    base = INICIO.timestamp()
+    total = int(1_000_000 * escala) or 1
+    for indice in range(total):
+        historico.registrar(base + indice * 60, 50, 500, ORIGEM_AGENDADA)
+
+    def consultar(n):
+        for indice in range(n):
+            historico.pagina(historico.indice_por_data(base + (indice * 7919 % total) * 60), 25)
+
+    return _por_operacao(consultar, 2_000)
+
+@benchmark("alimentar", "us")
+def alimentar(escala):
+    feeder = PetFeederTech(_silencioso)
+    feeder.ligar()
+    feeder.sensor.peso = 10 ** 12
+
+    def alimentar_n(n):
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(n):
+                feeder.alimentar()
+
+    return _por_operacao(alimentar_n, int(50_000 * escala) or 1)
+
+@benchmark("alerta_fila_notificacoes", "us")
+def alerta_fila_notificacoes(escala):
+    fila = FilaNotificacoes(TransporteLoopback(), capacidade=1024)
+    fila.definir_conexao(True)
+
+    def publicar(n):
+        for indice in range(n):
+            fila.publicar(f"alerta {indice % 64}")
+
+    return _por_operacao(publicar, int(100_000 * escala) or 1)
+
+@benchmark("alerta_fanout_1000_inscritos", "us")
+def alerta_fanout(escala):
+    import asyncio
+
+    servidor = ServidorControle([], porta=0)
+    servidor.inscritos = {asyncio.Queue(servidor.TAMANHO_FILA_EVENTOS) for _ in range(1000)}
+
+    def publicar(n):
+        for indice in range(n):
+            servidor.publicar_evento({"alimentador": indice, "mensagem": "Nível de ração baixo!"})
+
+    return _por_operacao(publicar, int(1_000 * escala) or 1)
+
+def _lote_intercambio(escala):
+    lote = intercambio.Lote()
+    for indice in range(int(200_000 * escala) or 1):
+        lote.adicionar_agendamento(indice % 1000, indice % 1440, 0x7F if indice % 3 else 0x15, 30.0 * (indice % 2))
+    return lote
+
+def _ler_lote(escrever, ler, arquivo, escala):
+    lote = _lote_intercambio(escala)
+    escrever(lote, arquivo)
+
+    def ler_n(n):
+        for _ in range(n):
+            arquivo.seek(0)
+            ler(arquivo).validar()
+
+    return _por_operacao(ler_n, 1) / len(lote)
+
+@benchmark("intercambio_csv_por_linha", "us")
+def intercambio_csv(escala):
+    return _ler_lote(intercambio.escrever_csv, intercambio.ler_csv, io.StringIO(), escala)
+
+@benchmark("intercambio_binario_por_linha", "us")
+def intercambio_binario(escala):
+    return _ler_lote(intercambio.escrever_binario, intercambio.ler_binario, io.BytesIO(), escala)
+
+@benchmark("restauracao_frota", "s")
+def restauracao_frota(escala):
+    # Snapshot completo mais um delta, restaurados de arquivo.
+    with contextlib.redirect_stdout(io.StringIO()):
+        return snapshot.medir_restauracao(int(10_000 * escala) or 1)
+
+@benchmark("memoria_por_feeder", "bytes")
+def memoria_por_feeder(escala):
+    quantidade = int(10_000 * escala) or 1
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    frota = Frota.criar(quantidade, update_status_callback=_silencioso)
+    depois = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del frota
+    return (depois - antes) / quantidade
+
+@benchmark("simulacao_semana_frota", "s")
+def simulacao_semana_frota(escala):
+    # Simulação de eventos discretos: uma semana de agenda para a frota.
+    relogio = RelogioSimulado(INICIO)
+    RTC().usar_relogio(relogio)
+    try:
+        frota = Frota.criar(int(1_000 * escala) or 1, update_status_callback=_silencioso)
+        frota.ligar()
+        for indice, feeder in enumerate(frota.feeders):
+            feeder.sensor.peso = 10 ** 9
+            feeder.agendar_alimentacao(dtime(7, indice % 60), diario=True)
+            feeder.agendar_alimentacao(dtime(19, indice % 60), diario=True)
+        frota.iniciar(TimerSimulado(relogio))
+        inicio = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            relogio.executar_ate(INICIO + timedelta(days=7))
+        return time.perf_counter() - inicio
+    finally:
+        RTC().restaurar()
+
+# -------------------- EXECUÇÃO E COMPARAÇÃO --------------------
+
+def executar(escala=1.0, selecionados=None, repeticoes=3) -> dict:
+    resultados = {}
+    for nome, (funcao, unidade) in BENCHMARKS.items():
+        if selecionados and nome not in selecionados:
+            continue
+        melhor = min(funcao(escala) for _ in range(max(repeticoes, 1)))
+        resultados[nome] = {"valor": round(melhor, 4), "unidade": unidade}
+    return {
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "escala": escala,
+        "repeticoes": repeticoes,
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "resultados": resultados,
+    }
+
+def comparar(atual: dict, referencia: dict, tolerancia=0.5) -> list:
+    regressoes = []
+    for nome, resultado in atual["resultados"].items():
+        base = referencia["resultados"].get(nome)
+        if base is None or base["valor"] <= 0:
+            continue
+        razao = resultado["valor"] / base["valor"]
+        if razao > 1 + tolerancia:
+            regressoes.append((nome, base["valor"], resultado["valor"], razao))
+    return regressoes
+
+def main(argumentos=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks do PetFeederTech")
+    parser.add_argument("--escala", type=float, default=1.0)
+    parser.add_argument("--saida", help="grava os resultados em JSON")
+    parser.add_argument("--comparar", help="JSON de referência para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.5)
+    parser.add_argument("--repeticoes", type=int, default=3, help="fica o melhor de N execuções")
+    parser.add_argument("benchmarks", nargs="*")
+    opcoes = parser.parse_args(argumentos)
+
+    atual = executar(opcoes.escala, opcoes.benchmarks, opcoes.repeticoes)
+    for nome, resultado in atual["resultados"].items():
+        print(f"{nome:32} {resultado['valor']:>14.4f} {resultado['unidade']}")
+    if opcoes.saida:
+        with open(opcoes.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(atual, arquivo, indent=2, ensure_ascii=False)
+    if opcoes.comparar:
+        with open(opcoes.comparar, encoding="utf-8") as arquivo:
+            regressoes = comparar(atual, json.load(arquivo), opcoes.tolerancia)
+        for nome, base, valor, razao in regressoes:
+            print(f"REGRESSÃO {nome}: {base} -> {valor} ({razao:.2f}x)")
+        return 1 if regressoes else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
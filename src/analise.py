@@ -0,0 +1,151 @@
+import time
+from datetime import datetime
+
+import numpy as np
+
+from src.main import HistoricoAlimentacao
+
+# -------------------- ANÁLISE DE CONSUMO --------------------
+
+SEGUNDOS_DIA = 86400
+# O dia 0 da época Unix foi uma quinta-feira; somando 3 as semanas começam na segunda.
+AJUSTE_SEMANA = 3
+
+def deslocamentos(timestamps, fuso=None):
+    # Deslocamento UTC de cada instante, no fuso dado (ZoneInfo) ou no local.
+    # Calcula um por dia UTC e só vai registro a registro nos dias em que o
+    # deslocamento muda (mudança de horário).
+    if fuso is None:
+        def deslocamento(instante):
+            return time.localtime(instante).tm_gmtoff
+    else:
+        def deslocamento(instante):
+            return datetime.fromtimestamp(instante, fuso).utcoffset().total_seconds()
+    dias, indices = np.unique(np.floor_divide(timestamps, SEGUNDOS_DIA).astype(np.int64), return_inverse=True)
+    inicio = np.array([deslocamento(dia * SEGUNDOS_DIA) for dia in dias.tolist()], dtype=np.float64)
+    fim = np.array([deslocamento(dia * SEGUNDOS_DIA + SEGUNDOS_DIA - 1) for dia in dias.tolist()], dtype=np.float64)
+    resultado = inicio[indices]
+    for dia in np.flatnonzero(inicio != fim):
+        mesmo_dia = indices == dia
+        resultado[mesmo_dia] = [deslocamento(instante) for instante in timestamps[mesmo_dia].tolist()]
+    return resultado
+
+def _deslocamentos(timestamps, deslocamento):
+    # `deslocamento`: segundos fixos, um ZoneInfo ou None (fuso local).
+    if isinstance(deslocamento, (int, float)):
+        return deslocamento
+    return deslocamentos(timestamps, deslocamento)
+
+def colunas(historico: HistoricoAlimentacao) -> dict:
+    # Copia as colunas: um buffer exportado impediria o array de crescer.
+    return {
+        "timestamp": np.array(historico.timestamps, dtype=np.float64),
+        "gramas": np.array(historico.gramas, dtype=np.float64),
+        "peso_restante": np.array(historico.pesos_restantes, dtype=np.float64),
+        "origem": np.array(historico.origens, dtype=np.uint8),
+    }
+
+def _dias(timestamps, deslocamento):
+    return np.floor_divide(timestamps + deslocamento, SEGUNDOS_DIA).astype(np.int64)
+
+def _somar_por_periodo(periodos, gramas):
+    if not len(periodos):
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    primeiro = periodos.min()
+    somas = np.bincount(periodos - primeiro, weights=gramas)
+    return np.arange(primeiro, primeiro + len(somas)), somas
+
+def consumo_diario(historico, deslocamento=None):
+    c = colunas(historico)
+    deslocamento = _deslocamentos(c["timestamp"], deslocamento)
+    dias, somas = _somar_por_periodo(_dias(c["timestamp"], deslocamento), c["gramas"])
+    return dias.astype("datetime64[D]"), somas
+
+def consumo_semanal(historico, deslocamento=None):
+    c = colunas(historico)
+    deslocamento = _deslocamentos(c["timestamp"], deslocamento)
+    semanas = (_dias(c["timestamp"], deslocamento) + AJUSTE_SEMANA) // 7
+    semanas, somas = _somar_por_periodo(semanas, c["gramas"])
+    # Data da segunda-feira de cada semana.
+    return (semanas * 7 - AJUSTE_SEMANA).astype("datetime64[D]"), somas
+
+def soma_movel(historico, janela: float):
+    # Gramas liberadas na janela de `janela` segundos que termina em cada alimentação.
+    c = colunas(historico)
+    acumulado = np.concatenate(([0.0], np.cumsum(c["gramas"])))
+    inicio = np.searchsorted(c["timestamp"], c["timestamp"] - janela, side="right")
+    return acumulado[1:] - acumulado[inicio]
+
+def estatisticas_intervalos(historico) -> dict:
+    intervalos = np.diff(np.array(historico.timestamps, dtype=np.float64))
+    if not len(intervalos):
+        return {"quantidade": 0}
+    return {
+        "quantidade": int(len(intervalos)),
+        "media": float(intervalos.mean()),
+        "mediana": float(np.median(intervalos)),
+        "desvio": float(intervalos.std()),
+        "minimo": float(intervalos.min()),
+        "maximo": float(intervalos.max()),
+    }
+
+def histograma_horario(historico, deslocamento=None):
+    c = colunas(historico)
+    deslocamento = _deslocamentos(c["timestamp"], deslocamento)
+    horas = (np.mod(c["timestamp"] + deslocamento, SEGUNDOS_DIA) // 3600).astype(np.int64)
+    return np.bincount(horas, weights=c["gramas"], minlength=24)
+
+def previsao_esvaziamento(historico, peso_atual, agora=None, janela=7 * SEGUNDOS_DIA):
+    # Projeta quando o reservatório esvazia mantendo o ritmo da última janela.
+    agora = time.time() if agora is None else agora
+    c = colunas(historico)
+    recentes = c["timestamp"] >= agora - janela
+    taxa = c["gramas"][recentes].sum() / janela
+    if taxa <= 0:
+        return None
+    return agora + peso_atual / taxa
+
+# -------------------- ANÁLISE EM LOTE --------------------
+
+def colunas_frota(feeders) -> dict:
+    historicos = [feeder.historico_alimentacao for feeder in feeders]
+    tamanhos = np.fromiter((len(h) for h in historicos), dtype=np.int64, count=len(historicos))
+    return {
+        "feeder": np.repeat(np.arange(len(historicos)), tamanhos),
+        "timestamp": np.concatenate([np.array(h.timestamps, dtype=np.float64) for h in historicos] or [np.empty(0)]),
+        "gramas": np.concatenate([np.array(h.gramas, dtype=np.float64) for h in historicos] or [np.empty(0)]),
+    }
+
+def _deslocamentos_frota(feeders, c):
+    # Cada alimentador no seu próprio fuso (o local quando não configurado).
+    limites = np.cumsum(np.bincount(c["feeder"], minlength=len(feeders)))[:-1]
+    partes = np.split(c["timestamp"], limites)
+    return np.concatenate([deslocamentos(parte, feeder.fuso) for parte, feeder in zip(partes, feeders)]
+                          or [np.empty(0)])
+
+def consumo_diario_frota(feeders, deslocamento=None):
+    # Matriz alimentador x dia com as gramas liberadas. Sem `deslocamento`,
+    # os dias seguem o fuso de cada alimentador.
+    c = colunas_frota(feeders)
+    if deslocamento is None:
+        deslocamento = _deslocamentos_frota(feeders, c)
+    else:
+        deslocamento = _deslocamentos(c["timestamp"], deslocamento)
+    dias = _dias(c["timestamp"], deslocamento)
+    if not len(dias):
+        return np.empty(0, dtype="datetime64[D]"), np.zeros((len(feeders), 0))
+    primeiro = dias.min()
+    quantidade_dias = int(dias.max() - primeiro + 1)
+    celulas = c["feeder"] * quantidade_dias + (dias - primeiro)
+    somas = np.bincount(celulas, weights=c["gramas"], minlength=len(feeders) * quantidade_dias)
+    eixo = np.arange(primeiro, primeiro + quantidade_dias).astype("datetime64[D]")
+    return eixo, somas.reshape(len(feeders), quantidade_dias)
+
+def previsao_esvaziamento_frota(feeders, agora=None, janela=7 * SEGUNDOS_DIA):
+    agora = time.time() if agora is None else agora
+    c = colunas_frota(feeders)
+    recentes = c["timestamp"] >= agora - janela
+    taxas = np.bincount(c["feeder"][recentes], weights=c["gramas"][recentes], minlength=len(feeders)) / janela
+    pesos = np.fromiter((feeder.sensor.medir_peso() for feeder in feeders), dtype=np.float64, count=len(feeders))
+    with np.errstate(divide="ignore"):
+        return np.where(taxas > 0, agora + pesos / taxas, np.inf)
@@ -0,0 +1,171 @@
+import heapq
+import itertools
+import logging
+import sys
+import time
+from datetime import datetime, timedelta
+
+from src.main import PLANEJADOR, REGISTRO, PetFeederTech, RTC, TimerAsyncio
+
+# -------------------- FROTA DE ALIMENTADORES --------------------
+
+# Hospeda muitos alimentadores em um processo. Um único heap compartilhado
+# guarda o próximo disparo de cada alimentador, então um tick só toca os
+# alimentadores que realmente têm algo vencido. Os disparos entram no heap
+# como timestamps, uma linha do tempo UTC única mesmo com fusos diferentes.
+class Frota:
+    def __init__(self, feeders=()):
+        self.feeders = []
+        self.rtc = RTC()
+        self._roda = []
+        self._proximos = []
+        self._seq = itertools.count()
+        self._timer = None
+        self._handle = None
+        for feeder in feeders:
+            self.adicionar(feeder)
+
+    @classmethod
+    def criar(cls, quantidade, update_status_callback=None):
+        return cls(PetFeederTech(update_status_callback) for _ in range(quantidade))
+
+    def __len__(self):
+        return len(self.feeders)
+
+    def __getitem__(self, indice):
+        return self.feeders[indice]
+
+    def adicionar(self, feeder: PetFeederTech) -> int:
+        indice = len(self.feeders)
+        self.feeders.append(feeder)
+        self._proximos.append(None)
+        feeder.ao_alterar_agenda(lambda: self._registrar(indice))
+        self._registrar(indice)
+        return indice
+
+    def _registrar(self, indice):
+        feeder = self.feeders[indice]
+        proximo = feeder.agendamentos.proximo_disparo() if feeder.sistema_ativo else None
+        if proximo is not None:
+            proximo = proximo.timestamp()
+        if proximo == self._proximos[indice]:
+            return
+        self._proximos[indice] = proximo
+        if proximo is not None:
+            # Entradas antigas do mesmo alimentador ficam obsoletas e são
+            # descartadas quando chegam ao topo.
+            heapq.heappush(self._roda, (proximo, next(self._seq), indice))
+            if self._handle is not None and self._roda[0][2] == indice:
+                self._rearmar()
+
+    def _proximo_instante(self):
+        roda = self._roda
+        while roda and roda[0][0] != self._proximos[roda[0][2]]:
+            heapq.heappop(roda)
+        return roda[0][0] if roda else None
+
+    def proximo_disparo(self):
+        # No horário local do processo, como RTC.agora() com o relógio do sistema.
+        instante = self._proximo_instante()
+        return None if instante is None else datetime.fromtimestamp(instante)
+
+    def tick(self, agora=None) -> int:
+        agora = agora or self.rtc.agora()
+        instante = agora.timestamp()
+        roda = self._roda
+        proximos = self._proximos
+        disparados = 0
+        while roda and roda[0][0] <= instante:
+            disparo, _, indice = heapq.heappop(roda)
+            if disparo != proximos[indice]:
+                continue
+            proximos[indice] = None
+            self.feeders[indice].checar_agendamentos(agora)
+            self._registrar(indice)
+            disparados += 1
+        return disparados
+
+    # ---- timer compartilhado ----
+
+    def iniciar(self, timer=None):
+        self._timer = timer or TimerAsyncio()
+        self._rearmar()
+
+    def parar(self):
+        if self._handle is not None:
+            self._timer.cancelar(self._handle)
+            self._handle = None
+
+    def _rearmar(self):
+        self.parar()
+        proximo = self._proximo_instante()
+        if proximo is None:
+            return
+        atraso = proximo - self.rtc.agora().timestamp()
+        self._handle = self._timer.armar(atraso, self._disparar)
+
+    def _disparar(self):
+        self._handle = None
+        self.tick()
+        self._rearmar()
+
+    # ---- operações em lote ----
+
+    def _selecionar(self, selecao):
+        if selecao is None:
+            return self.feeders
+        return (self.feeders[indice] for indice in selecao)
+
+    def ligar(self, selecao=None):
+        for feeder in self._selecionar(selecao):
+            feeder.ligar()
+
+    def alimentar(self, selecao=None):
+        for feeder in self._selecionar(selecao):
+            feeder.alimentar()
+
+    def verificar_peso(self, selecao=None) -> dict:
+        pesos = {}
+        indices = range(len(self.feeders)) if selecao is None else selecao
+        for indice in indices:
+            feeder = self.feeders[indice]
+            feeder.verificar_peso()
+            pesos[indice] = feeder.sensor.medir_peso()
+        return pesos
+
+    def configurar_pet(self, peso, raca, selecao=None):
+        for feeder in self._selecionar(selecao):
+            feeder.configurar_pet(peso, raca)
+
+    def replanejar(self, selecao=None, agora=None) -> list:
+        # Uma leitura de relógio para o lote; perfis de raça vêm do cache.
+        return PLANEJADOR.planejar_lote(self._selecionar(selecao), agora or self.rtc.agora())
+
+# -------------------- BENCHMARK --------------------
+
+def medir_tick(quantidade=10_000, agendamentos_por_feeder=4):
+    frota = Frota.criar(quantidade, update_status_callback=lambda mensagem: None)
+    frota.ligar()
+    inicio = frota.rtc.agora().replace(microsecond=0)
+    for indice, feeder in enumerate(frota.feeders):
+        for n in range(agendamentos_por_feeder):
+            segundos = 60 + (indice * agendamentos_por_feeder + n) % 3600
+            feeder.agendar_alimentacao((inicio + timedelta(seconds=segundos)).time(), diario=True)
+
+    # Sem o log de cada alimentação no console, que dominaria a medição.
+    nivel = REGISTRO.level
+    REGISTRO.setLevel(logging.CRITICAL)
+    try:
+        ticks = 0
+        inicio_medicao = time.perf_counter()
+        for segundo in range(60, 3660):
+            frota.tick(inicio + timedelta(seconds=segundo))
+            ticks += 1
+        duracao = time.perf_counter() - inicio_medicao
+    finally:
+        REGISTRO.setLevel(nivel)
+    return duracao / ticks * 1000
+
+if __name__ == "__main__":
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    print(f"{quantidade} alimentadores: {medir_tick(quantidade):.3f} ms por tick")
@@ -0,0 +1,300 @@
+import csv
+import functools
+import json
+import struct
+import sys
+from array import array
+from datetime import date, time as dtime
+
+from src.main import DIAS_SEMANA, PORCAO_MAXIMA, PetFeederTech, Recorrencia, para_local
+
+# -------------------- IMPORTAÇÃO E EXPORTAÇÃO EM LOTE --------------------
+
+# Um lote guarda agendamentos e configurações de pet em colunas compactas
+# (array), uma linha por horário. Datas são dias desde 01/01/1970, com 0 para
+# "sem data"; dias da semana são uma máscara de bits (bit 0 = segunda).
+COLUNAS_AGENDA = (("alimentador", "I"), ("minuto", "H"), ("dias", "B"), ("porcao", "f"), ("inicio", "i"), ("fim", "i"))
+COLUNAS_PET = (("alimentador", "I"), ("peso", "f"))
+CABECALHO_CSV = ("alimentador", "horario", "dias", "inicio", "fim", "porcao", "peso", "raca")
+TODOS_OS_DIAS = 0x7F
+EPOCA = date(1970, 1, 1).toordinal()
+HORARIOS = tuple(dtime(minuto // 60, minuto % 60) for minuto in range(1440))
+MAGICO = b"PFTL\x01"
+CONTAGENS = struct.Struct("<II")
+
+class Lote:
+    def __init__(self):
+        self.agenda = {nome: array(tipo) for nome, tipo in COLUNAS_AGENDA}
+        self.pets = {nome: array(tipo) for nome, tipo in COLUNAS_PET}
+        self.racas = []
+
+    def __len__(self):
+        return len(self.agenda["minuto"]) + len(self.racas)
+
+    def adicionar_agendamento(self, alimentador, minuto, dias=TODOS_OS_DIAS, porcao=0.0, inicio=0, fim=0):
+        agenda = self.agenda
+        agenda["alimentador"].append(alimentador)
+        agenda["minuto"].append(minuto)
+        agenda["dias"].append(dias)
+        agenda["porcao"].append(porcao)
+        agenda["inicio"].append(inicio)
+        agenda["fim"].append(fim)
+
+    def adicionar_pet(self, alimentador, peso, raca):
+        self.pets["alimentador"].append(alimentador)
+        self.pets["peso"].append(peso)
+        self.racas.append(raca)
+
+    def linhas_agenda(self):
+        return zip(*(self.agenda[nome] for nome, _ in COLUNAS_AGENDA))
+
+    def linhas_pet(self):
+        return zip(self.pets["alimentador"], self.pets["peso"], self.racas)
+
+    def validar(self, alimentadores=None) -> None:
+        # Coluna a coluna: min/max percorrem os arrays em C, sem um laço por linha.
+        agenda = self.agenda
+        if agenda["minuto"]:
+            _exigir(agenda["minuto"], max(agenda["minuto"]) < 1440, max, "Agendamento", "Horário fora do dia")
+            _exigir(agenda["dias"], min(agenda["dias"]) > 0, min, "Agendamento", "Nenhum dia da semana")
+            _exigir(agenda["dias"], max(agenda["dias"]) <= TODOS_OS_DIAS, max, "Agendamento", "Dias da semana inválidos")
+            _exigir(agenda["porcao"], min(agenda["porcao"]) >= 0, min, "Agendamento", "Porção negativa")
+            _exigir(agenda["porcao"], max(agenda["porcao"]) <= PORCAO_MAXIMA, max, "Agendamento", "Porção acima do máximo")
+            for indice, (inicio, fim) in enumerate(zip(agenda["inicio"], agenda["fim"])):
+                if inicio and fim and fim < inicio:
+                    raise ValueError(f"Agendamento {indice}: período invertido")
+        if self.racas:
+            _exigir(self.pets["peso"], min(self.pets["peso"]) > 0, min, "Pet", "Peso do pet inválido")
+        if alimentadores is not None:
+            for colunas, rotulo in ((agenda, "Agendamento"), (self.pets, "Pet")):
+                if colunas["alimentador"]:
+                    _exigir(colunas["alimentador"], max(colunas["alimentador"]) < alimentadores, max,
+                            rotulo, "Alimentador inexistente")
+
+    def regras(self) -> dict:
+        # Linhas com os mesmos dias, período e porção viram uma Recorrencia.
+        grupos = {}
+        for alimentador, minuto, dias, porcao, inicio, fim in self.linhas_agenda():
+            grupos.setdefault(alimentador, {}).setdefault((dias, porcao, inicio, fim), []).append(HORARIOS[minuto])
+        return {
+            alimentador: [
+                Recorrencia(horarios, _dias_da_mascara(dias), _data(inicio), _data(fim), porcao or None)
+                for (dias, porcao, inicio, fim), horarios in regras.items()
+            ]
+            for alimentador, regras in grupos.items()
+        }
+
+def _exigir(coluna, condicao, extremo, rotulo, mensagem):
+    # O índice é a posição na coluna, não a linha do arquivo: um Lote pode
+    # vir de CSV, JSONL, binário ou ser montado em memória.
+    if not condicao:
+        raise ValueError(f"{rotulo} {coluna.index(extremo(coluna))}: {mensagem}")
+
+@functools.lru_cache(maxsize=128)
+def _dias_da_mascara(mascara) -> tuple:
+    return tuple(dia for dia in range(7) if mascara >> dia & 1)
+
+@functools.lru_cache(maxsize=128)
+def _mascara(texto) -> int:
+    if not texto:
+        return TODOS_OS_DIAS
+    mascara = 0
+    for dia in texto.split("|"):
+        mascara |= 1 << DIAS_SEMANA.index(dia)
+    return mascara
+
+@functools.lru_cache(maxsize=4096)
+def _dia(texto) -> int:
+    return date.fromisoformat(texto).toordinal() - EPOCA if texto else 0
+
+def _data(dia):
+    return date.fromordinal(dia + EPOCA) if dia else None
+
+def _minuto(texto) -> int:
+    # Mais barato que datetime.strptime.
+    if len(texto) != 5 or texto[2] != ":":
+        raise ValueError(f"Horário inválido: {texto!r}")
+    hora, minuto = int(texto[:2]), int(texto[3:])
+    if not (0 <= hora < 24 and 0 <= minuto < 60):
+        raise ValueError(f"Horário inválido: {texto!r}")
+    return hora * 60 + minuto
+
+def _texto_dias(mascara):
+    return "" if mascara == TODOS_OS_DIAS else "|".join(DIAS_SEMANA[dia] for dia in _dias_da_mascara(mascara))
+
+# ---- CSV ----
+
+def ler_csv(arquivo) -> Lote:
+    lote = Lote()
+    leitor = csv.reader(arquivo)
+    if tuple(next(leitor, ())) != CABECALHO_CSV:
+        raise ValueError("Cabeçalho CSV inesperado")
+    for numero, linha in enumerate(leitor, 2):
+        try:
+            alimentador, horario, dias, inicio, fim, porcao, peso, raca = linha
+            if horario:
+                lote.adicionar_agendamento(int(alimentador), _minuto(horario), _mascara(dias),
+                                           float(porcao) if porcao else 0.0, _dia(inicio), _dia(fim))
+            else:
+                lote.adicionar_pet(int(alimentador), float(peso), raca)
+        except (ValueError, OverflowError) as erro:
+            raise ValueError(f"Linha {numero}: {erro}") from None
+    return lote
+
+def escrever_csv(lote: Lote, arquivo) -> None:
+    escritor = csv.writer(arquivo, lineterminator="\n")
+    escritor.writerow(CABECALHO_CSV)
+    escritor.writerows(
+        (alimentador, HORARIOS[minuto].strftime("%H:%M"), _texto_dias(dias),
+         _data(inicio) or "", _data(fim) or "", porcao or "", "", "")
+        for alimentador, minuto, dias, porcao, inicio, fim in lote.linhas_agenda()
+    )
+    escritor.writerows((alimentador, "", "", "", "", "", peso, raca) for alimentador, peso, raca in lote.linhas_pet())
+
+# ---- JSON Lines ----
+
+def ler_jsonl(arquivo) -> Lote:
+    lote = Lote()
+    for numero, linha in enumerate(arquivo, 1):
+        if not linha.strip():
+            continue
+        try:
+            dados = json.loads(linha)
+            if "pet" in dados:
+                lote.adicionar_pet(dados["alimentador"], dados["pet"]["peso"], dados["pet"]["raca"])
+            else:
+                lote.adicionar_agendamento(
+                    dados["alimentador"], _minuto(dados["horario"]), _mascara("|".join(dados.get("dias", ()))),
+                    dados.get("porcao") or 0.0, _dia(dados.get("inicio")), _dia(dados.get("fim")),
+                )
+        except (ValueError, KeyError, TypeError, OverflowError) as erro:
+            raise ValueError(f"Linha {numero}: {erro}") from None
+    return lote
+
+def escrever_jsonl(lote: Lote, arquivo) -> None:
+    for alimentador, minuto, dias, porcao, inicio, fim in lote.linhas_agenda():
+        dados = {"alimentador": alimentador, "horario": HORARIOS[minuto].strftime("%H:%M")}
+        if dias != TODOS_OS_DIAS:
+            dados["dias"] = [DIAS_SEMANA[dia] for dia in _dias_da_mascara(dias)]
+        if inicio:
+            dados["inicio"] = _data(inicio).isoformat()
+        if fim:
+            dados["fim"] = _data(fim).isoformat()
+        if porcao:
+            dados["porcao"] = porcao
+        arquivo.write(json.dumps(dados, ensure_ascii=False) + "\n")
+    for alimentador, peso, raca in lote.linhas_pet():
+        arquivo.write(json.dumps({"alimentador": alimentador, "pet": {"peso": peso, "raca": raca}},
+                                 ensure_ascii=False) + "\n")
+
+# ---- binário ----
+
+# MAGICO, as contagens e depois cada coluna inteira (little-endian), lida
+# direto para o array com fromfile. As raças vão no fim, separadas por "\n".
+def ler_binario(arquivo) -> Lote:
+    if arquivo.read(len(MAGICO)) != MAGICO:
+        raise ValueError("Arquivo binário inválido")
+    lote = Lote()
+    try:
+        agendamentos, pets = CONTAGENS.unpack(arquivo.read(CONTAGENS.size))
+        for colunas, quantidade in ((lote.agenda, agendamentos), (lote.pets, pets)):
+            for coluna in colunas.values():
+                coluna.fromfile(arquivo, quantidade)
+                if sys.byteorder == "big":
+                    coluna.byteswap()
+        if pets:
+            (tamanho,) = struct.unpack("<I", arquivo.read(4))
+            dados = arquivo.read(tamanho)
+            if len(dados) != tamanho:
+                raise EOFError
+            lote.racas = dados.decode("utf-8").split("\n")
+    except (EOFError, struct.error):
+        raise ValueError("Arquivo binário truncado") from None
+    if len(lote.racas) != pets:
+        raise ValueError("Arquivo binário truncado")
+    return lote
+
+def escrever_binario(lote: Lote, arquivo) -> None:
+    arquivo.write(MAGICO)
+    arquivo.write(CONTAGENS.pack(len(lote.agenda["minuto"]), len(lote.racas)))
+    for colunas in (lote.agenda, lote.pets):
+        for coluna in colunas.values():
+            if sys.byteorder == "big":
+                coluna = array(coluna.typecode, coluna)
+                coluna.byteswap()
+            coluna.tofile(arquivo)
+    if lote.racas:
+        racas = "\n".join(lote.racas).encode("utf-8")
+        arquivo.write(struct.pack("<I", len(racas)))
+        arquivo.write(racas)
+
+FORMATOS = {
+    ".csv": (ler_csv, escrever_csv, False),
+    ".jsonl": (ler_jsonl, escrever_jsonl, False),
+    ".bin": (ler_binario, escrever_binario, True),
+}
+
+def _formato(caminho):
+    for extensao, formato in FORMATOS.items():
+        if caminho.endswith(extensao):
+            return formato
+    raise ValueError(f"Formato desconhecido: {caminho}")
+
+def ler(caminho) -> Lote:
+    leitor, _, binario = _formato(caminho)
+    with open(caminho, "rb") if binario else open(caminho, encoding="utf-8", newline="") as arquivo:
+        return leitor(arquivo)
+
+def escrever(lote: Lote, caminho) -> None:
+    _, escritor, binario = _formato(caminho)
+    with open(caminho, "wb") if binario else open(caminho, "w", encoding="utf-8", newline="") as arquivo:
+        escritor(lote, arquivo)
+
+# ---- alimentadores ----
+
+def exportar(feeders) -> Lote:
+    if isinstance(feeders, PetFeederTech):
+        feeders = [feeders]
+    lote = Lote()
+    for indice, feeder in enumerate(getattr(feeders, "feeders", feeders)):
+        for agendamento in feeder.agendamentos:
+            regra = agendamento.regra
+            if regra is None:
+                # "Hoje" vira uma regra de um único dia.
+                dia = 0
+                if not agendamento.diario:
+                    disparo = agendamento.disparo if feeder.fuso is None else para_local(agendamento.disparo, feeder.fuso)
+                    dia = disparo.toordinal() - EPOCA
+                lote.adicionar_agendamento(indice, agendamento.horario.hour * 60 + agendamento.horario.minute,
+                                           TODOS_OS_DIAS, 0.0, dia, dia)
+                continue
+            mascara = sum(1 << dia for dia in regra.dias)
+            inicio = regra.data_inicio.toordinal() - EPOCA if regra.data_inicio else 0
+            fim = regra.data_fim.toordinal() - EPOCA if regra.data_fim else 0
+            for horario in regra.horarios:
+                lote.adicionar_agendamento(indice, horario.hour * 60 + horario.minute, mascara,
+                                           regra.porcao or 0.0, inicio, fim)
+        if feeder.peso_pet:
+            lote.adicionar_pet(indice, feeder.peso_pet, feeder.raca_pet)
+    return lote
+
+def aplicar(lote: Lote, feeders) -> int:
+    # Valida tudo antes de tocar nos alimentadores; cada um recebe o seu lote
+    # numa única chamada, com uma só mensagem no display e uma só notificação.
+    if isinstance(feeders, PetFeederTech):
+        feeders = [feeders]
+    feeders = getattr(feeders, "feeders", feeders)
+    lote.validar(len(feeders))
+    regras = lote.regras()
+    pets = {alimentador: (peso, raca) for alimentador, peso, raca in lote.linhas_pet()}
+    importados = 0
+    for indice in sorted(regras.keys() | pets.keys()):
+        importados += len(feeders[indice].importar_agendamentos(regras.get(indice, ()), pets.get(indice)))
+    return importados
+
+if __name__ == "__main__":
+    # Conversão entre formatos: python -m src.intercambio agenda.csv agenda.bin
+    lote = ler(sys.argv[1])
+    lote.validar()
+    escrever(lote, sys.argv[2])
+    print(f"{len(lote)} linhas convertidas")
@@ -1,10 +1,114 @@
-import tkinter as tk
-from datetime import datetime
+from array import array
+from collections import OrderedDict, deque, namedtuple
+from datetime import date, datetime, time as dtime, timedelta, timezone
+import asyncio
+import bisect
+import functools
+import heapq
+import itertools
+import json
+import logging
+import logging.handlers
+import math
+import os
+import queue
 import random
+import statistics
+import sys
+import threading
+import time
+import unicodedata
+from zoneinfo import ZoneInfo
+
+# tkinter só é importado pelas classes de interface, para que o núcleo rode
+# em servidores e testes sem display.
+tk = None
+
+def carregar_tk():
+    global tk
+    if tk is None:
+        import tkinter
+        tk = tkinter
+    return tk
+
+# -------------------- REGISTRO DE EVENTOS --------------------
+
+# Cada componente registra no seu logger ("petfeedertech.Motor", ...). As
+# mensagens levam argumentos no estilo "%s" e só são formatadas se algum
+# handler aceitar o nível. Por padrão o console mantém o formato "[Motor]: ...".
+REGISTRO = logging.getLogger("petfeedertech")
+
+class HandlerConsole(logging.Handler):
+    # Usa o sys.stdout do momento da escrita, então redirect_stdout continua funcionando.
+    def emit(self, registro):
+        try:
+            print(f"[{registro.name.rpartition('.')[2]}]: {registro.getMessage()}")
+        except Exception:
+            self.handleError(registro)
+
+class FormatoJSON(logging.Formatter):
+    def format(self, registro):
+        evento = {
+            "ts": registro.created,
+            "nivel": registro.levelname,
+            "componente": registro.name.rpartition(".")[2],
+            "mensagem": registro.getMessage(),
+        }
+        dados = getattr(registro, "dados", None)
+        if dados:
+            evento["dados"] = dados
+        return json.dumps(evento, ensure_ascii=False)
+
+class HandlerFila(logging.handlers.QueueHandler):
+    # O QueueHandler padrão formata no thread de quem registra; aqui a
+    # formatação fica toda para o thread do listener.
+    def prepare(self, registro):
+        return registro
+
+CONSOLE = HandlerConsole()
+REGISTRO.addHandler(CONSOLE)
+REGISTRO.setLevel(logging.INFO)
+REGISTRO.propagate = False
+
+# Grava os eventos em JSON lines com rotação por tamanho. Quem registra só
+# coloca o evento numa fila; o arquivo é escrito por um thread separado.
+class RegistroJSON:
+    def __init__(self, arquivo, nivel=logging.INFO, tamanho_maximo=10 * 1024 * 1024, copias=5, console=False):
+        self.arquivo = logging.handlers.RotatingFileHandler(
+            arquivo, maxBytes=tamanho_maximo, backupCount=copias, encoding="utf-8", delay=True,
+        )
+        self.arquivo.setFormatter(FormatoJSON())
+        self.nivel = nivel
+        self.console = console
+        self.fila = HandlerFila(queue.SimpleQueue())
+        self._listener = logging.handlers.QueueListener(self.fila.queue, self.arquivo)
+
+    def iniciar(self):
+        REGISTRO.setLevel(self.nivel)
+        if not self.console:
+            REGISTRO.removeHandler(CONSOLE)
+        REGISTRO.addHandler(self.fila)
+        self._listener.start()
+        return self
+
+    def parar(self):
+        REGISTRO.removeHandler(self.fila)
+        self._listener.stop()
+        self.arquivo.close()
+        if CONSOLE not in REGISTRO.handlers:
+            REGISTRO.addHandler(CONSOLE)
+        REGISTRO.setLevel(logging.INFO)
 
 # -------------------- COMPONENTES AUXILIARES --------------------
 
+REGISTRO_DISPLAY = REGISTRO.getChild("Display")
+REGISTRO_MOTOR = REGISTRO.getChild("Motor")
+REGISTRO_BUZZER = REGISTRO.getChild("Buzzer")
+REGISTRO_WIFI = REGISTRO.getChild("WiFi")
+
 class Display:
+    __slots__ = ("update_status_callback",)
+
     def __init__(self, update_status_callback=None):
         self.update_status_callback = update_status_callback
 
@@ -12,21 +116,115 @@ class Display:
         if self.update_status_callback:
             self.update_status_callback(message)
         else:
-            print(f"[Display]: {message}")
+            REGISTRO_DISPLAY.info("%s", message)
 
 class SensorDePeso:
+    __slots__ = ("peso", "ao_consumir")
+
     def __init__(self):
         self.peso = 1000  # gramas iniciais
+        self.ao_consumir = None
 
     def medir_peso(self) -> int:
         return self.peso
 
     def consumir_peso(self, quantidade):
         self.peso = max(self.peso - quantidade, 0)
+        if self.ao_consumir:
+            self.ao_consumir(quantidade)
+
+    def reabastecer(self, quantidade):
+        self.peso += quantidade
 
 class Motor:
-    def liberar_racao(self) -> None:
-        print("[Motor]: Ração liberada!")
+    __slots__ = ("sensor", "gramas_por_pulso")
+
+    def __init__(self, sensor=None, gramas_por_pulso=10):
+        # Na simulação o motor tira a ração do reservatório medido pelo sensor.
+        self.sensor = sensor
+        self.gramas_por_pulso = gramas_por_pulso
+
+    def liberar_racao(self, **dados) -> None:
+        # `dados` (gramas, origem, peso) só aparece no log em JSON.
+        REGISTRO_MOTOR.info("Ração liberada!", extra={"dados": dados})
+
+    def pulsar(self, fracao=1.0) -> None:
+        if self.sensor is not None:
+            self.sensor.consumir_peso(min(self.gramas_por_pulso * fracao, self.sensor.peso))
+
+class MotorSimulado(Motor):
+    # Motor com vazão irregular por pulso e travamento opcional, para testes e benchmarks.
+    __slots__ = ("variacao", "travado", "aleatorio")
+
+    def __init__(self, sensor, gramas_por_pulso=10, variacao=0.3, travado=False, semente=None):
+        super().__init__(sensor, gramas_por_pulso)
+        self.variacao = variacao
+        self.travado = travado
+        self.aleatorio = random.Random(semente)
+
+    def liberar_racao(self, **dados) -> None:
+        pass
+
+    def pulsar(self, fracao=1.0) -> None:
+        if self.travado:
+            return
+        fator = 1 + self.aleatorio.uniform(-self.variacao, self.variacao)
+        self.sensor.consumir_peso(min(self.gramas_por_pulso * fracao * fator, self.sensor.peso))
+
+class RelogioSistema:
+    def agora(self) -> datetime:
+        return datetime.now()
+
+# Relógio controlado pelo teste/simulação. Também é uma fila de eventos:
+# TimerSimulado arma callbacks nele e executar_ate salta direto de um evento
+# para o próximo, então semanas de agenda rodam em segundos.
+class RelogioSimulado:
+    def __init__(self, inicio: datetime):
+        self.atual = inicio
+        self._eventos = []
+        self._seq = itertools.count()
+
+    def agora(self) -> datetime:
+        return self.atual
+
+    def avancar(self, delta: timedelta) -> None:
+        self.executar_ate(self.atual + delta)
+
+    def agendar(self, momento: datetime, callback):
+        evento = [momento, next(self._seq), callback]
+        heapq.heappush(self._eventos, evento)
+        return evento
+
+    def cancelar(self, evento):
+        evento[2] = None
+
+    def proximo_evento(self):
+        while self._eventos and self._eventos[0][2] is None:
+            heapq.heappop(self._eventos)
+        return self._eventos[0][0] if self._eventos else None
+
+    def executar_ate(self, limite: datetime) -> int:
+        executados = 0
+        while True:
+            proximo = self.proximo_evento()
+            if proximo is None or proximo > limite:
+                break
+            momento, _, callback = heapq.heappop(self._eventos)
+            self.atual = max(self.atual, momento)
+            callback()
+            executados += 1
+        self.atual = max(self.atual, limite)
+        return executados
+
+class TimerSimulado:
+    def __init__(self, relogio: RelogioSimulado):
+        self.relogio = relogio
+
+    def armar(self, atraso, callback):
+        return self.relogio.agendar(self.relogio.atual + timedelta(seconds=max(atraso, 0)), callback)
+
+    def cancelar(self, handle):
+        self.relogio.cancelar(handle)
 
 class RTC:
     _instance = None
@@ -34,28 +232,1044 @@ class RTC:
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(RTC, cls).__new__(cls)
+            cls._instance.relogio = RelogioSistema()
         return cls._instance
 
     def agora(self) -> datetime:
-        return datetime.now()
+        return self.relogio.agora()
+
+    def usar_relogio(self, relogio) -> None:
+        self.relogio = relogio
+
+    def restaurar(self) -> None:
+        self.relogio = RelogioSistema()
 
 class Buzzer:
+    __slots__ = ()
+
     def alertar(self) -> None:
-        print("[Buzzer]: BEEP BEEP - Reabastecer ração!")
+        REGISTRO_BUZZER.warning("BEEP BEEP - Reabastecer ração!")
+
+# -------------------- NOTIFICAÇÕES --------------------
+
+class TransporteLoopback:
+    # Transporte local para testes: guarda os lotes e pode simular falhas.
+    def __init__(self, falhas=0):
+        self.lotes = []
+        self.falhas = falhas
+
+    def __call__(self, lote):
+        if self.falhas:
+            self.falhas -= 1
+            raise ConnectionError("falha simulada no envio")
+        self.lotes.append(lote)
+
+    @property
+    def mensagens(self):
+        return [mensagem for lote in self.lotes for mensagem in lote]
+
+# Fila limitada de saída. Mensagens repetidas enquanto aguardam envio são
+# agrupadas, o envio é feito em lotes, falhas são repetidas com backoff
+# exponencial e, sem conexão, tudo fica retido até o próximo conectar.
+#
+# Sem iniciar() o envio acontece na própria chamada de publicar. Com um
+# timer (TimerTk/TimerAsyncio) o envio vai para o loop de eventos; sem
+# timer, para uma thread em segundo plano.
+class FilaNotificacoes:
+    def __init__(self, transporte, capacidade=256, tamanho_lote=16, backoff_inicial=0.5, backoff_maximo=60):
+        self.transporte = transporte
+        self.capacidade = capacidade
+        self.tamanho_lote = tamanho_lote
+        self.backoff_inicial = backoff_inicial
+        self.backoff_maximo = backoff_maximo
+        self.conectado = False
+        self.descartadas = 0
+        self.falhas_consecutivas = 0
+        self._pendentes = OrderedDict()
+        self._proxima_tentativa = 0.0
+        self._condicao = threading.Condition(threading.Lock())
+        self._timer = None
+        self._handle = None
+        self._thread = None
+        self._parado = False
+
+    def __len__(self):
+        return len(self._pendentes)
+
+    def publicar(self, mensagem: str) -> None:
+        with self._condicao:
+            if mensagem in self._pendentes:
+                self._pendentes[mensagem] += 1
+            else:
+                if len(self._pendentes) >= self.capacidade:
+                    self._pendentes.popitem(last=False)
+                    self.descartadas += 1
+                self._pendentes[mensagem] = 1
+            self._condicao.notify()
+        self._despertar()
+
+    def definir_conexao(self, conectado: bool) -> None:
+        with self._condicao:
+            self.conectado = conectado
+            self._proxima_tentativa = 0.0
+            self._condicao.notify()
+        if conectado:
+            self._despertar()
+
+    def pendentes(self) -> list:
+        with self._condicao:
+            return list(self._pendentes.items())
+
+    def restaurar(self, pendentes) -> None:
+        # Recoloca mensagens de um snapshot (com as contagens) sem disparar envio.
+        with self._condicao:
+            self._pendentes.update(pendentes)
+
+    def _pronta(self) -> bool:
+        return self.conectado and bool(self._pendentes) and time.monotonic() >= self._proxima_tentativa
+
+    def drenar(self) -> int:
+        enviadas = 0
+        while True:
+            with self._condicao:
+                if not self._pronta():
+                    return enviadas
+                itens = list(itertools.islice(self._pendentes.items(), self.tamanho_lote))
+            lote = [mensagem if vezes == 1 else f"{mensagem} (x{vezes})" for mensagem, vezes in itens]
+            try:
+                self.transporte(lote)
+            except Exception:
+                with self._condicao:
+                    self.falhas_consecutivas += 1
+                    atraso = self.backoff_inicial * 2 ** (self.falhas_consecutivas - 1)
+                    self._proxima_tentativa = time.monotonic() + min(atraso, self.backoff_maximo)
+                return enviadas
+            with self._condicao:
+                self.falhas_consecutivas = 0
+                for mensagem, vezes in itens:
+                    restantes = self._pendentes.get(mensagem, 0) - vezes
+                    if restantes > 0:
+                        self._pendentes[mensagem] = restantes
+                    else:
+                        self._pendentes.pop(mensagem, None)
+            enviadas += len(lote)
+
+    # ---- envio em segundo plano ----
+
+    def iniciar(self, timer=None):
+        self._parado = False
+        if timer is not None:
+            self._timer = timer
+        else:
+            self._thread = threading.Thread(target=self._executar_thread, name="notificacoes", daemon=True)
+            self._thread.start()
+        self._despertar()
+
+    def parar(self):
+        with self._condicao:
+            self._parado = True
+            self._condicao.notify()
+        if self._handle is not None:
+            self._timer.cancelar(self._handle)
+            self._handle = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._timer = None
+
+    def _despertar(self):
+        if self._thread is not None:
+            return  # a thread já foi avisada pela condição
+        if self._timer is None:
+            self.drenar()
+        elif self._handle is None and self.conectado and self._pendentes:
+            atraso = max(self._proxima_tentativa - time.monotonic(), 0)
+            self._handle = self._timer.armar(atraso, self._executar_timer)
+
+    def _executar_timer(self):
+        self._handle = None
+        self.drenar()
+        self._despertar()
+
+    def _executar_thread(self):
+        while True:
+            with self._condicao:
+                while not self._parado and not self._pronta():
+                    espera = None
+                    if self.conectado and self._pendentes:
+                        espera = self._proxima_tentativa - time.monotonic()
+                    self._condicao.wait(espera)
+                if self._parado:
+                    return
+            self.drenar()
 
 class ModuloWiFi:
-    def __init__(self):
+    __slots__ = ("conectado", "fila")
+
+    def __init__(self, transporte=None):
         self.conectado = False
+        self.fila = FilaNotificacoes(transporte or self._imprimir)
 
     def conectar(self):
         self.conectado = True
+        self.fila.definir_conexao(True)
 
     def desconectar(self):
         self.conectado = False
+        self.fila.definir_conexao(False)
 
     def enviar_notificacao(self, mensagem: str) -> None:
-        if self.conectado:
-            print(f"[WiFi]: {mensagem}")
+        # Sem conexão a mensagem fica na fila até o próximo conectar.
+        self.fila.publicar(mensagem)
+
+    def _imprimir(self, lote):
+        for mensagem in lote:
+            REGISTRO_WIFI.info("%s", mensagem, extra={"dados": {"lote": len(lote)}})
+
+# -------------------- AMOSTRAGEM DO SENSOR --------------------
+
+class BufferCircular:
+    __slots__ = ("dados", "capacidade", "posicao", "total")
+
+    def __init__(self, capacidade=4096):
+        self.dados = array("f", bytes(4 * capacidade))
+        self.capacidade = capacidade
+        self.posicao = 0
+        self.total = 0
+
+    def __len__(self):
+        return min(self.total, self.capacidade)
+
+    def adicionar(self, valor) -> None:
+        self.dados[self.posicao] = valor
+        self.posicao = (self.posicao + 1) % self.capacidade
+        self.total += 1
+
+    def valores(self) -> array:
+        # Amostras da mais antiga para a mais recente.
+        if self.total < self.capacidade:
+            return self.dados[:self.posicao]
+        return self.dados[self.posicao:] + self.dados[:self.posicao]
+
+    def como_numpy(self):
+        import numpy as np
+        return np.array(self.valores(), dtype=np.float32)
+
+class FiltroMediana:
+    __slots__ = ("janela", "ordenados")
+
+    def __init__(self, tamanho=5):
+        self.janela = deque(maxlen=tamanho)
+        self.ordenados = []
+
+    def filtrar(self, valor):
+        janela, ordenados = self.janela, self.ordenados
+        if len(janela) == janela.maxlen:
+            del ordenados[bisect.bisect_left(ordenados, janela[0])]
+        janela.append(valor)
+        bisect.insort(ordenados, valor)
+        return ordenados[len(ordenados) // 2]
+
+class FiltroEMA:
+    __slots__ = ("alfa", "valor")
+
+    def __init__(self, alfa=0.1):
+        self.alfa = alfa
+        self.valor = None
+
+    def filtrar(self, valor):
+        self.valor = valor if self.valor is None else self.valor + self.alfa * (valor - self.valor)
+        return self.valor
+
+class GeradorSinalSintetico:
+    # Célula de carga simulada: nível real mais ruído gaussiano e picos ocasionais.
+    def __init__(self, fonte=lambda: 1000, ruido=1.5, chance_pico=0.005, amplitude_pico=80, semente=None):
+        self.fonte = fonte
+        self.ruido = ruido
+        self.chance_pico = chance_pico
+        self.amplitude_pico = amplitude_pico
+        self.aleatorio = random.Random(semente)
+
+    def __call__(self) -> float:
+        valor = self.fonte() + self.aleatorio.gauss(0, self.ruido)
+        if self.aleatorio.random() < self.chance_pico:
+            valor += self.aleatorio.choice((-1, 1)) * self.amplitude_pico
+        return valor
+
+# Lê o sensor em alta frequência, guarda as leituras brutas em um buffer
+# circular e aplica mediana (remove picos) seguida de média exponencial
+# (suaviza o ruído). Só mudanças maiores que `limiar` gramas são publicadas.
+class AmostradorPeso:
+    def __init__(self, sensor, leitura=None, capacidade=4096, janela_mediana=5, alfa=0.1, limiar=2.0):
+        self.sensor = sensor
+        self.leitura = leitura or sensor.medir_peso
+        self.brutos = BufferCircular(capacidade)
+        self.mediana = FiltroMediana(janela_mediana)
+        self.ema = FiltroEMA(alfa)
+        self.limiar = limiar
+        self.filtrado = None
+        self.publicado = None
+        self._inscritos = []
+        self._thread = None
+        self._parar = None  # criado em iniciar: a maioria dos amostradores nunca ganha thread
+
+    def inscrever(self, callback):
+        self._inscritos.append(callback)
+
+    def amostrar(self, valor=None) -> float:
+        if valor is None:
+            valor = self.leitura()
+        self.brutos.adicionar(valor)
+        self.filtrado = filtrado = self.ema.filtrar(self.mediana.filtrar(valor))
+        if self.publicado is None or abs(filtrado - self.publicado) >= self.limiar:
+            self.publicado = filtrado
+            for callback in self._inscritos:
+                callback(filtrado)
+        return filtrado
+
+    def amostrar_lote(self, quantidade) -> float:
+        for _ in range(quantidade):
+            self.amostrar()
+        return self.filtrado
+
+    def iniciar(self, frequencia=1000, bloco=10):
+        # Lê em blocos para não depender de um sleep por amostra.
+        def executar():
+            periodo = bloco / frequencia
+            proximo = time.perf_counter()
+            while not self._parar.is_set():
+                self.amostrar_lote(bloco)
+                proximo += periodo
+                self._parar.wait(max(proximo - time.perf_counter(), 0))
+
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=executar, name="amostrador", daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        if self._thread is not None:
+            self._parar.set()
+            self._thread.join()
+            self._thread = None
+
+    def leitura_estavel(self, amostras=9) -> float:
+        # Mediana de uma rajada curta, sem o atraso da média exponencial.
+        leitura, amostrar = self.leitura, self.amostrar
+        valores = []
+        for _ in range(amostras):
+            valor = leitura()
+            amostrar(valor)
+            valores.append(valor)
+        return statistics.median(valores)
+
+# -------------------- DISPENSA EM MALHA FECHADA --------------------
+
+ResultadoDispensa = namedtuple("ResultadoDispensa", "gramas pulsos travado vazio duracao")
+
+# Aciona o motor em pulsos até a queda de peso medida atingir o alvo e
+# devolve quanto realmente saiu. A vazão por pulso é reestimada a cada
+# leitura para encurtar o último pulso. Pulsos seguidos sem variação de peso
+# indicam motor travado; reservatório zerado interrompe sem acusar trava.
+class ControladorDispensa:
+    def __init__(self, motor, sensor, leitura=None, tolerancia=1.0, variacao_minima=1.0,
+                 pulsos_sem_variacao=3, max_pulsos=100):
+        self.motor = motor
+        self.sensor = sensor
+        self.leitura = leitura or sensor.medir_peso
+        self.tolerancia = tolerancia
+        self.variacao_minima = variacao_minima
+        self.pulsos_sem_variacao = pulsos_sem_variacao
+        self.max_pulsos = max_pulsos
+        self.duracao_maxima = 0.0
+
+    def dispensar(self, alvo) -> ResultadoDispensa:
+        inicio = time.perf_counter()
+        inicial = anterior = atual = self.leitura()
+        pulsos = sem_variacao = 0
+        acionamento = 0.0
+        por_pulso = self.motor.gramas_por_pulso
+        travado = vazio = False
+        while inicial - atual < alvo - self.tolerancia and pulsos < self.max_pulsos:
+            fracao = min((alvo - (inicial - atual)) / por_pulso, 1.0)
+            self.motor.pulsar(fracao)
+            pulsos += 1
+            acionamento += fracao
+            atual = self.leitura()
+            if inicial - atual > 0:
+                por_pulso = (inicial - atual) / acionamento
+            if atual <= 0:
+                vazio = True
+                break
+            if anterior - atual < self.variacao_minima:
+                sem_variacao += 1
+                if sem_variacao >= self.pulsos_sem_variacao:
+                    travado = True
+                    break
+            else:
+                sem_variacao = 0
+            anterior = atual
+        duracao = time.perf_counter() - inicio
+        self.duracao_maxima = max(self.duracao_maxima, duracao)
+        return ResultadoDispensa(max(inicial - atual, 0), pulsos, travado, vazio, duracao)
+
+# -------------------- HISTÓRICO --------------------
+
+ORIGEM_MANUAL = 0
+ORIGEM_AGENDADA = 1
+ORIGEM_APP = 2
+NOMES_ORIGEM = ("manual", "agendada", "app")
+
+class RegistroAlimentacao(namedtuple("RegistroAlimentacao", "timestamp gramas peso_restante origem")):
+    __slots__ = ()
+
+    def __str__(self):
+        # Formatado só quando alguém exibe o registro.
+        quando = datetime.fromtimestamp(self.timestamp).strftime("%d/%m/%Y %H:%M:%S")
+        return f"{quando} - Ração liberada ({self.gramas:g}g, {NOMES_ORIGEM[self.origem]})"
+
+# Histórico em colunas compactas (array) em vez de uma lista de strings:
+# cada alimentação ocupa 17 bytes e mantém o timestamp completo.
+class HistoricoAlimentacao:
+    __slots__ = ("timestamps", "gramas", "pesos_restantes", "origens")
+
+    def __init__(self):
+        self.timestamps = array("d")
+        self.gramas = array("f")
+        self.pesos_restantes = array("f")
+        self.origens = array("B")
+
+    def registrar(self, timestamp: float, gramas, peso_restante, origem=ORIGEM_MANUAL) -> None:
+        self.timestamps.append(timestamp)
+        self.gramas.append(gramas)
+        self.pesos_restantes.append(peso_restante)
+        self.origens.append(origem)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return [self[i] for i in range(*indice.indices(len(self)))]
+        return RegistroAlimentacao(self.timestamps[indice], self.gramas[indice],
+                                   self.pesos_restantes[indice], self.origens[indice])
+
+    def __iter__(self):
+        return map(RegistroAlimentacao, self.timestamps, self.gramas, self.pesos_restantes, self.origens)
+
+    def indice_por_data(self, timestamp: float) -> int:
+        # Os registros são anexados em ordem cronológica.
+        return bisect.bisect_left(self.timestamps, timestamp)
+
+    def pagina(self, inicio, tamanho) -> list:
+        return [str(registro) for registro in self[inicio:inicio + tamanho]]
+
+# -------------------- AGENDA --------------------
+
+UM_DIA = timedelta(days=1)
+RESOLUCAO = timedelta(microseconds=1)
+DIAS_SEMANA = ("seg", "ter", "qua", "qui", "sex", "sab", "dom")
+
+def proximo_horario(horario, apos: datetime) -> datetime:
+    disparo = datetime.combine(apos.date(), horario)
+    if disparo < apos:
+        disparo += UM_DIA
+    return disparo
+
+# Regra de recorrência compilada: os horários do dia ficam ordenados (um
+# intervalo "a cada 4h" é expandido uma única vez) e, para cada dia da semana,
+# guarda-se quantos dias faltam até o próximo dia permitido. Assim o próximo
+# disparo sai de uma busca binária mais um salto, sem percorrer o calendário.
+class Recorrencia:
+    __slots__ = ("horarios", "dias", "data_inicio", "data_fim", "porcao", "_salto")
+
+    def __init__(self, horarios, dias=None, data_inicio=None, data_fim=None, porcao=None):
+        self.horarios = tuple(sorted(set(horarios)))
+        self.dias = frozenset(range(7) if dias is None else dias)
+        if not self.horarios or not self.dias:
+            raise ValueError("Recorrência sem horários ou dias")
+        if data_inicio and data_fim and data_fim < data_inicio:
+            raise ValueError("Período da recorrência invertido")
+        self.data_inicio = data_inicio
+        self.data_fim = data_fim
+        self.porcao = porcao
+        self._salto = tuple(
+            next(salto for salto in range(7) if (dia + salto) % 7 in self.dias) for dia in range(7)
+        )
+
+    @classmethod
+    def intervalo(cls, inicio, fim, a_cada: timedelta, **opcoes) -> "Recorrencia":
+        if a_cada <= timedelta(0):
+            raise ValueError("Intervalo da recorrência deve ser positivo")
+        atual = datetime.combine(datetime.min.date(), inicio)
+        limite = datetime.combine(datetime.min.date(), fim)
+        horarios = []
+        while atual <= limite:
+            horarios.append(atual.time())
+            atual += a_cada
+        return cls(horarios, **opcoes)
+
+    @classmethod
+    def de_dict(cls, dados: dict) -> "Recorrencia":
+        opcoes = {
+            "dias": [DIAS_SEMANA.index(dia) for dia in dados["dias"]] if "dias" in dados else None,
+            "data_inicio": date.fromisoformat(dados["inicio"]) if dados.get("inicio") else None,
+            "data_fim": date.fromisoformat(dados["fim"]) if dados.get("fim") else None,
+            "porcao": dados.get("porcao"),
+        }
+        if "intervalo" in dados:
+            inicio, fim, minutos = dados["intervalo"]
+            return cls.intervalo(dtime.fromisoformat(inicio), dtime.fromisoformat(fim),
+                                 timedelta(minutes=minutos), **opcoes)
+        return cls([dtime.fromisoformat(horario) for horario in dados["horarios"]], **opcoes)
+
+    def para_dict(self) -> dict:
+        dados = {"horarios": [horario.strftime("%H:%M") for horario in self.horarios]}
+        if len(self.dias) < 7:
+            dados["dias"] = [DIAS_SEMANA[dia] for dia in sorted(self.dias)]
+        if self.data_inicio:
+            dados["inicio"] = self.data_inicio.isoformat()
+        if self.data_fim:
+            dados["fim"] = self.data_fim.isoformat()
+        if self.porcao is not None:
+            dados["porcao"] = self.porcao
+        return dados
+
+    def grupo(self) -> tuple:
+        # Regras do mesmo grupo só diferem nos horários e podem ser fundidas.
+        return (self.dias, self.data_inicio, self.data_fim, self.porcao)
+
+    def proximo(self, apos: datetime):
+        # Primeira ocorrência em `apos` ou depois; None se a regra já terminou.
+        dia = apos.date()
+        if self.data_inicio and dia < self.data_inicio:
+            dia, indice = self.data_inicio, 0
+        else:
+            indice = bisect.bisect_left(self.horarios, apos.time())
+            if indice == len(self.horarios):
+                dia, indice = dia + UM_DIA, 0
+        salto = self._salto[dia.weekday()]
+        if salto:
+            dia, indice = dia + timedelta(days=salto), 0
+        if self.data_fim and dia > self.data_fim:
+            return None
+        return datetime.combine(dia, self.horarios[indice])
+
+    def ocorrencias(self, apos: datetime):
+        proximo = self.proximo(apos)
+        while proximo is not None:
+            yield proximo
+            proximo = self.proximo(proximo + RESOLUCAO)
+
+    def contar(self, desde: datetime, limite: datetime) -> int:
+        # Ocorrências em [desde, limite], um passo por dia do intervalo.
+        primeiro = max(desde.date(), self.data_inicio) if self.data_inicio else desde.date()
+        ultimo = min(limite.date(), self.data_fim) if self.data_fim else limite.date()
+        total = 0
+        dia = primeiro
+        while dia <= ultimo:
+            if dia.weekday() in self.dias:
+                inicio = bisect.bisect_left(self.horarios, desde.time()) if dia == desde.date() else 0
+                fim = bisect.bisect_right(self.horarios, limite.time()) if dia == limite.date() else len(self.horarios)
+                total += max(fim - inicio, 0)
+            dia += UM_DIA
+        return total
+
+    def __str__(self):
+        if len(self.horarios) > 3:
+            texto = f"{self.horarios[0].strftime('%H:%M')}-{self.horarios[-1].strftime('%H:%M')} ({len(self.horarios)}x)"
+        else:
+            texto = ", ".join(horario.strftime("%H:%M") for horario in self.horarios)
+        if len(self.dias) < 7:
+            texto += " | " + ", ".join(DIAS_SEMANA[dia] for dia in sorted(self.dias))
+        return texto
+
+class Agendamento:
+    __slots__ = ("id", "horario", "diario", "disparo", "ativo", "regra")
+
+    def __init__(self, id, horario, diario, disparo, regra=None):
+        self.id = id
+        self.horario = horario
+        self.diario = diario
+        self.disparo = disparo
+        self.ativo = True
+        self.regra = regra
+
+    @property
+    def porcao(self):
+        return self.regra.porcao if self.regra else None
+
+    def __iter__(self):
+        # Permite desempacotar como a antiga tupla (horario, diario).
+        yield self.horario
+        yield self.diario
+
+    def __repr__(self):
+        if self.regra:
+            return f"Agendamento(regra={str(self.regra)!r})"
+        return f"Agendamento({self.horario!r}, diario={self.diario})"
+
+# Agendamentos indexados pelo próximo disparo em um heap. Remoções são
+# preguiçosas: o item é marcado como inativo e descartado quando chega ao
+# topo, mantendo cada operação em O(log n).
+#
+# Cada checagem dispara tudo o que venceu desde a checagem anterior, então
+# atrasos do laço de atualização não fazem uma refeição ser pulada.
+#
+# Com `fuso`, os instantes recebidos e os disparos são datetimes UTC.
+class Agenda:
+    def __init__(self, fuso=None):
+        self._heap = []
+        self._seq = itertools.count()
+        self._ids = itertools.count(1)
+        self._por_id = {}
+        self.fuso = fuso
+        self.ultima_checagem = None
+        # [limite, total, passo]: disparos até `limite` e o primeiro instante
+        # depois dele em que essa contagem muda. Mantido a cada inserção e
+        # remoção, para disparos_ate não percorrer a agenda inteira.
+        self._contagem = None
+
+    def __len__(self):
+        return len(self._por_id)
+
+    def __iter__(self):
+        return (item for _, _, item in sorted(self._heap) if item.ativo)
+
+    def buscar(self, id):
+        return self._por_id.get(id)
+
+    def _inserir(self, agendamento):
+        heapq.heappush(self._heap, (agendamento.disparo, next(self._seq), agendamento))
+        self._ajustar_contagem(agendamento, 1)
+
+    def _proximo(self, horario, agora: datetime) -> datetime:
+        if self.fuso is None:
+            return proximo_horario(horario, agora)
+        return proximo_horario_fuso(horario, agora, self.fuso)
+
+    def _proximo_regra(self, regra: Recorrencia, agora: datetime):
+        if self.fuso is None:
+            return regra.proximo(agora)
+        disparo = regra.proximo(para_local(agora, self.fuso))
+        return None if disparo is None else para_utc(disparo, self.fuso)
+
+    def definir_fuso(self, fuso, agora: datetime) -> None:
+        # Recalcula todos os disparos no novo referencial; `agora` já deve
+        # estar nele (UTC com fuso, horário local sem).
+        self.fuso = fuso
+        ativos = list(self._por_id.values())
+        for agendamento in ativos:
+            if agendamento.regra is not None:
+                agendamento.disparo = self._proximo_regra(agendamento.regra, agora)
+            else:
+                agendamento.disparo = self._proximo(agendamento.horario, agora)
+        for agendamento in ativos:
+            if agendamento.disparo is None:
+                self.remover(agendamento)
+        self._heap = [(agendamento.disparo, next(self._seq), agendamento)
+                      for agendamento in self._por_id.values()]
+        heapq.heapify(self._heap)
+        self.ultima_checagem = agora
+        self._contagem = None
+
+    def restaurar(self, agendamentos, ultima_checagem=None) -> None:
+        # Recarrega agendamentos já com id e disparo (de um snapshot) com um único heapify.
+        self._por_id = {agendamento.id: agendamento for agendamento in agendamentos}
+        self._heap = [(agendamento.disparo, next(self._seq), agendamento) for agendamento in self._por_id.values()]
+        heapq.heapify(self._heap)
+        self._ids = itertools.count(max(self._por_id, default=0) + 1)
+        self.ultima_checagem = ultima_checagem
+        self._contagem = None
+
+    def adicionar(self, horario, diario, agora: datetime) -> Agendamento:
+        agendamento = Agendamento(next(self._ids), horario, diario, self._proximo(horario, agora))
+        self._inserir(agendamento)
+        self._por_id[agendamento.id] = agendamento
+        return agendamento
+
+    def _criar(self, regra: Recorrencia, agora: datetime):
+        disparo = self._proximo_regra(regra, agora)
+        if disparo is None:
+            return None
+        agendamento = Agendamento(next(self._ids), regra.horarios[0], True, disparo, regra)
+        self._por_id[agendamento.id] = agendamento
+        return agendamento
+
+    def adicionar_regra(self, regra: Recorrencia, agora: datetime) -> Agendamento:
+        agendamento = self._criar(regra, agora)
+        if agendamento is None:
+            raise ValueError("Recorrência já encerrada")
+        self._inserir(agendamento)
+        return agendamento
+
+    def importar(self, regras, agora: datetime) -> list:
+        # Regras com os mesmos dias, período e porção são fundidas numa só, e
+        # horários já cobertos (pela agenda ou por uma regra importada com os
+        # mesmos período e porção em mais dias) são descartados, então a
+        # importação não gera disparos duplicados. O heap é reconstruído uma
+        # vez no final.
+        grupos = {}
+        for regra in regras:
+            grupos.setdefault(regra.grupo(), set()).update(regra.horarios)
+        coberturas = {}
+        for agendamento in self._por_id.values():
+            if agendamento.regra is not None:
+                dias, inicio, fim, porcao = agendamento.regra.grupo()
+                coberturas.setdefault((inicio, fim, porcao), []).append((dias, agendamento.regra.horarios))
+            elif agendamento.diario:
+                coberturas.setdefault((None, None, None), []).append((frozenset(range(7)), (agendamento.horario,)))
+        for (dias, inicio, fim, porcao), horarios in grupos.items():
+            coberturas.setdefault((inicio, fim, porcao), []).append((dias, horarios))
+        for (dias, inicio, fim, porcao), horarios in grupos.items():
+            for outros_dias, outros in coberturas[inicio, fim, porcao]:
+                if outros is not horarios and outros_dias >= dias:
+                    horarios.difference_update(outros)
+        novos = []
+        for (dias, inicio, fim, porcao), horarios in grupos.items():
+            if horarios:
+                agendamento = self._criar(Recorrencia(horarios, dias, inicio, fim, porcao), agora)
+                if agendamento is not None:
+                    novos.append(agendamento)
+        self._heap.extend((agendamento.disparo, next(self._seq), agendamento) for agendamento in novos)
+        heapq.heapify(self._heap)
+        for agendamento in novos:
+            self._ajustar_contagem(agendamento, 1)
+        return novos
+
+    def remover(self, agendamento) -> bool:
+        if not agendamento.ativo:
+            return False
+        self._ajustar_contagem(agendamento, -1)
+        agendamento.ativo = False
+        del self._por_id[agendamento.id]
+        # Reconstrói o heap quando a maioria das entradas já está obsoleta.
+        if len(self._heap) > 2 * len(self._por_id) + 32:
+            self._heap = [entrada for entrada in self._heap if entrada[2].ativo]
+            heapq.heapify(self._heap)
+        return True
+
+    def _descartar_inativos(self):
+        while self._heap and not self._heap[0][2].ativo:
+            heapq.heappop(self._heap)
+
+    def proximo_disparo(self):
+        self._descartar_inativos()
+        return self._heap[0][0] if self._heap else None
+
+    def _contar(self, agendamento, limite: datetime) -> int:
+        disparo = agendamento.disparo
+        if disparo > limite:
+            return 0
+        if agendamento.regra is not None:
+            if self.fuso is None:
+                return agendamento.regra.contar(disparo, limite)
+            return agendamento.regra.contar(para_local(disparo, self.fuso), para_local(limite, self.fuso))
+        if agendamento.diario:
+            return 1 + (limite - disparo) // UM_DIA
+        return 1
+
+    def _passo(self, agendamento, limite: datetime):
+        # Primeiro instante depois de `limite` em que _contar muda (None: nunca).
+        disparo = agendamento.disparo
+        if disparo > limite:
+            return disparo
+        if agendamento.regra is not None:
+            return self._proximo_regra(agendamento.regra, limite + RESOLUCAO)
+        if agendamento.diario:
+            return disparo + ((limite - disparo) // UM_DIA + 1) * UM_DIA
+        return None
+
+    def _ajustar_contagem(self, agendamento, sinal):
+        contagem = self._contagem
+        if contagem is None:
+            return
+        limite, total, passo = contagem
+        contagem[1] = total + sinal * self._contar(agendamento, limite)
+        if sinal > 0:
+            novo = self._passo(agendamento, limite)
+            if novo is not None and (passo is None or novo < passo):
+                contagem[2] = novo
+
+    def disparos_ate(self, limite: datetime) -> int:
+        contagem = self._contagem
+        if contagem is not None and contagem[0] <= limite and (contagem[2] is None or limite < contagem[2]):
+            return contagem[1]
+        total = 0
+        passos = []
+        for _, _, agendamento in self._heap:
+            if agendamento.ativo:
+                total += self._contar(agendamento, limite)
+                passo = self._passo(agendamento, limite)
+                if passo is not None:
+                    passos.append(passo)
+        if self.fuso is not None:
+            # Perto de uma mudança de horário a hora local salta; recontar depois dela.
+            transicao = proxima_transicao(self.fuso, limite)
+            if transicao != math.inf:
+                passos.append(datetime.fromtimestamp(transicao, UTC))
+        self._contagem = [limite, total, min(passos, default=None)]
+        return total
+
+    def reiniciar_janela(self, agora: datetime) -> None:
+        # O que vencer antes de `agora` é considerado perdido, não atrasado.
+        self.ultima_checagem = agora
+
+    def vencidos(self, agora: datetime) -> list:
+        desde, self.ultima_checagem = self.ultima_checagem, agora
+        disparados = []
+        while True:
+            self._descartar_inativos()
+            if not self._heap or self._heap[0][0] > agora:
+                return disparados
+            disparo, _, agendamento = heapq.heappop(self._heap)
+            self._ajustar_contagem(agendamento, -1)
+            if desde is None or disparo > desde:
+                disparados.append(agendamento)
+                if not agendamento.diario:
+                    agendamento.ativo = False
+                    del self._por_id[agendamento.id]
+                    continue
+            if agendamento.regra is not None:
+                agendamento.disparo = self._proximo_regra(agendamento.regra, agora + RESOLUCAO)
+                if agendamento.disparo is None:
+                    agendamento.ativo = False
+                    del self._por_id[agendamento.id]
+                    continue
+            if self.fuso is None:
+                while agendamento.disparo <= agora:
+                    agendamento.disparo += UM_DIA
+            else:
+                while agendamento.disparo <= agora:
+                    agendamento.disparo = avancar_dia_fuso(agendamento, self.fuso)
+            self._inserir(agendamento)
+
+# -------------------- FUSOS HORÁRIOS --------------------
+
+# Com fuso configurado, a agenda guarda os disparos em UTC: os horários
+# continuam sendo de parede (locais), mas a ordem entre alimentadores de fusos
+# diferentes passa a ser uma só. Um horário que cai no buraco da mudança de
+# horário (02:30 quando o relógio pula para 03:00) dispara logo após o salto;
+# um horário repetido (01:30 no fim do horário de verão) dispara uma única vez.
+UTC = timezone.utc
+
+@functools.lru_cache(maxsize=None)
+def transicoes_fuso(fuso: ZoneInfo, ano: int) -> tuple:
+    # Timestamps UTC em que o deslocamento do fuso muda ao longo do ano:
+    # amostra um dia por vez e refina por busca binária até o segundo.
+    transicoes = []
+    inicio = datetime(ano, 1, 1, tzinfo=UTC).timestamp()
+    anterior = datetime.fromtimestamp(inicio, fuso).utcoffset()
+    for dia in range(1, 367):
+        instante = inicio + dia * 86400
+        deslocamento = datetime.fromtimestamp(instante, fuso).utcoffset()
+        if deslocamento != anterior:
+            baixo, alto = instante - 86400, instante
+            while alto - baixo > 1:
+                meio = (baixo + alto) // 2
+                if datetime.fromtimestamp(meio, fuso).utcoffset() == anterior:
+                    baixo = meio
+                else:
+                    alto = meio
+            transicoes.append(alto)
+            anterior = deslocamento
+    return tuple(transicoes)
+
+def proxima_transicao(fuso: ZoneInfo, instante: datetime) -> float:
+    momento = instante.timestamp()
+    for ano in (instante.year, instante.year + 1):
+        transicoes = transicoes_fuso(fuso, ano)
+        indice = bisect.bisect_right(transicoes, momento)
+        if indice < len(transicoes):
+            return transicoes[indice]
+    return math.inf
+
+def para_local(instante: datetime, fuso: ZoneInfo) -> datetime:
+    return instante.astimezone(fuso).replace(tzinfo=None)
+
+def para_utc(local: datetime, fuso: ZoneInfo) -> datetime:
+    return local.replace(tzinfo=fuso).astimezone(UTC)
+
+def proximo_horario_fuso(horario, apos: datetime, fuso: ZoneInfo) -> datetime:
+    dia = para_local(apos, fuso).date()
+    disparo = para_utc(datetime.combine(dia, horario), fuso)
+    if disparo < apos:
+        disparo = para_utc(datetime.combine(dia + UM_DIA, horario), fuso)
+    return disparo
+
+def avancar_dia_fuso(agendamento, fuso: ZoneInfo) -> datetime:
+    # Sem mudança de horário a um dia de distância, o dia seguinte é
+    # exatamente 24h em UTC; perto de uma transição (inclusive um disparo que
+    # foi empurrado pelo buraco) o horário local é reconvertido.
+    disparo = agendamento.disparo
+    seguinte = disparo + UM_DIA
+    if seguinte.timestamp() < proxima_transicao(fuso, disparo - UM_DIA):
+        return seguinte
+    return para_utc(datetime.combine(para_local(disparo, fuso).date() + UM_DIA, agendamento.horario), fuso)
+
+# -------------------- ALERTA PREDITIVO --------------------
+
+PORCAO_PADRAO = 50
+PORCAO_MINIMA = 10
+PORCAO_MAXIMA = 500
+PESO_MINIMO = 50  # abaixo disso o motor não libera ração
+
+# Estima o consumo pelas chamadas a consumir_peso das últimas 24h e pelos
+# agendamentos das próximas 24h, e avisa uma única vez antes de a ração
+# acabar. O aviso só volta a ser emitido depois de um reabastecimento.
+class AlertaPreditivo:
+    HORIZONTE = timedelta(hours=24)
+
+    def __init__(self, feeder):
+        self.feeder = feeder
+        self.consumos = deque()
+        self.consumo_recente = 0
+        self.alertado = False
+        feeder.sensor.ao_consumir = self.registrar_consumo
+
+    def registrar_consumo(self, quantidade):
+        agora = self.feeder.rtc.agora().timestamp()
+        self.consumos.append((agora, quantidade))
+        self.consumo_recente += quantidade
+        limite = agora - self.HORIZONTE.total_seconds()
+        while self.consumos[0][0] < limite:
+            self.consumo_recente -= self.consumos.popleft()[1]
+        self.avaliar()
+
+    def avaliar(self) -> bool:
+        if self.alertado:
+            return False
+        agora = self.feeder.agora()
+        peso = self.feeder.sensor.medir_peso()
+        # Consumo previsto: o maior entre as últimas 24h e o que está agendado nas próximas.
+        agendadas = self.feeder.agendamentos.disparos_ate(agora + self.HORIZONTE)
+        necessario = max(self.consumo_recente, agendadas * self.feeder.porcao())
+        if peso - necessario > PESO_MINIMO:
+            return False
+        self.alertado = True
+        if necessario > 0:
+            horas = max(peso - PESO_MINIMO, 0) / necessario * self.HORIZONTE.total_seconds() / 3600
+            self.feeder.emitir_alerta(f"Ração deve acabar em cerca de {horas:.0f}h. Reabasteça!")
+        else:
+            self.feeder.emitir_alerta("Ração insuficiente para os próximos agendamentos!")
+        return True
+
+    def rearmar(self):
+        self.alertado = False
+
+# -------------------- PLANEJAMENTO DE PORÇÕES --------------------
+
+KCAL_POR_GRAMA = 3.5  # ração seca típica
+REFEICOES_PADRAO = 2  # sem agendamentos, considera duas refeições por dia
+FATOR_PADRAO = 1.6    # adulto castrado
+FATORES_RACA = {
+    "border collie": 2.0, "pastor alemao": 1.8, "labrador": 1.8, "golden retriever": 1.8,
+    "husky": 2.0, "beagle": 1.6, "vira-lata": 1.6, "srd": 1.6, "poodle": 1.4,
+    "yorkshire": 1.4, "shih tzu": 1.3, "bulldog": 1.3, "pug": 1.2, "gato": 1.2,
+    "persa": 1.2, "siames": 1.2,
+}
+
+PlanoRacao = namedtuple("PlanoRacao", "diaria porcao refeicoes")
+
+@functools.lru_cache(maxsize=1024)
+def fator_raca(raca: str) -> float:
+    chave = unicodedata.normalize("NFKD", raca).encode("ascii", "ignore").decode().strip().lower()
+    return FATORES_RACA.get(chave, FATOR_PADRAO)
+
+@functools.lru_cache(maxsize=4096)
+def racao_diaria(peso_kg: float, raca: str) -> float:
+    # Energia de manutenção: 70 * kg^0.75 (repouso) vezes o fator da raça.
+    return 70 * peso_kg ** 0.75 * fator_raca(raca) / KCAL_POR_GRAMA
+
+# Divide a ração diária entre os agendamentos das próximas 24h, descontando
+# o que o pet comeu além da conta nas últimas 24h. O plano fica guardado no
+# alimentador e só é refeito quando o pet ou a agenda mudam (ou em lote); a
+# contagem de refeições vem da mesma contagem incremental da agenda usada
+# pelo alerta preditivo, então replanejar não percorre os agendamentos.
+class PlanejadorPorcoes:
+    JANELA = 86400
+
+    def planejar(self, feeder, agora=None):
+        if not feeder.peso_pet:
+            return None
+        agora = feeder.agora() if agora is None else feeder.instante(agora)
+        diaria = racao_diaria(round(feeder.peso_pet, 1), feeder.raca_pet)
+        historico = feeder.historico_alimentacao
+        inicio = historico.indice_por_data(agora.timestamp() - self.JANELA)
+        excesso = max(sum(historico.gramas[inicio:]) - diaria, 0)
+        refeicoes = feeder.agendamentos.disparos_ate(agora + UM_DIA) or REFEICOES_PADRAO
+        porcao = min(max((diaria - excesso) / refeicoes, PORCAO_MINIMA), PORCAO_MAXIMA)
+        return PlanoRacao(diaria, porcao, refeicoes)
+
+    def planejar_lote(self, feeders, agora=None) -> list:
+        planos = []
+        for feeder in feeders:
+            feeder.plano = self.planejar(feeder, agora)
+            planos.append(feeder.plano)
+        return planos
+
+PLANEJADOR = PlanejadorPorcoes()
+
+# -------------------- FILA DE COMANDOS --------------------
+
+class Comando:
+    __slots__ = ("funcao", "args", "enfileirado", "concluido", "resultado", "erro")
+
+    def __init__(self, funcao, args):
+        self.funcao = funcao
+        self.args = args
+        self.enfileirado = time.perf_counter()
+        self.concluido = False
+        self.resultado = None
+        self.erro = None
+
+# Serializa os comandos que mexem no motor e no sensor. Cada chamador
+# enfileira o comando e disputa a vez de consumidor: quem consegue a trava
+# executa, em ordem, tudo o que estiver na fila, inclusive comandos de outras
+# threads. Sem disputa o comando roda na thread de quem chamou (a do Tk, por
+# exemplo). Leituras de peso não passam pela fila.
+class FilaComandos:
+    def __init__(self):
+        self._fila = deque()
+        self._consumidor = threading.RLock()
+        self.executados = 0
+        self.latencia_total = 0.0
+        self.latencia_maxima = 0.0
+        self.profundidade_maxima = 0
+
+    def __len__(self):
+        return len(self._fila)
+
+    def executar(self, funcao, *args):
+        comando = Comando(funcao, args)
+        self._fila.append(comando)
+        self.profundidade_maxima = max(self.profundidade_maxima, len(self._fila))
+        with self._consumidor:
+            while not comando.concluido:
+                self._executar_proximo()
+        if comando.erro is not None:
+            raise comando.erro
+        return comando.resultado
+
+    def _executar_proximo(self):
+        comando = self._fila.popleft()
+        latencia = time.perf_counter() - comando.enfileirado
+        self.executados += 1
+        self.latencia_total += latencia
+        self.latencia_maxima = max(self.latencia_maxima, latencia)
+        try:
+            comando.resultado = comando.funcao(*comando.args)
+        except Exception as erro:
+            comando.erro = erro
+        comando.concluido = True
+
+    def metricas(self) -> dict:
+        return {
+            "executados": self.executados,
+            "profundidade": len(self._fila),
+            "profundidade_maxima": self.profundidade_maxima,
+            "latencia_media": self.latencia_total / self.executados if self.executados else 0.0,
+            "latencia_maxima": self.latencia_maxima,
+        }
 
 # -------------------- CLASSE PRINCIPAL --------------------
 
@@ -63,73 +1277,208 @@ class PetFeederTech:
     def __init__(self, update_status_callback=None):
         self.display = Display(update_status_callback)
         self.sensor = SensorDePeso()
-        self.motor = Motor()
+        self.motor = Motor(self.sensor)
+        # A dispensa mede a queda de peso pela mediana de rajadas curtas do
+        # amostrador, não por leituras cruas: cinco amostras já descartam um pico.
+        # O buffer só precisa guardar a última rajada.
+        self.amostrador = AmostradorPeso(self.sensor, capacidade=8)
+        self.dispensa = ControladorDispensa(self.motor, self.sensor,
+                                            leitura=functools.partial(self.amostrador.leitura_estavel, 5))
         self.rtc = RTC()
         self.buzzer = Buzzer()
-        self.wifi = ModuloWiFi()
+        self.wifi = ModuloWiFi(self._entregar_alertas)
         self.sistema_ativo = False
-        self.agendamentos = []
-        self.historico_alimentacao = []
+        self.agendamentos = Agenda()
+        self.fuso = None
+        self.historico_alimentacao = HistoricoAlimentacao()
         self.peso_pet = 0
         self.raca_pet = ""
         self.alerta_callback = None
+        self.alerta_critico_enviado = False
+        self.alerta_preditivo = AlertaPreditivo(self)
+        self.comandos = FilaComandos()
+        self.planejador = PLANEJADOR
+        self.plano = None
+        self.dispensa_travada = False
+        self._ouvintes_agenda = []
+        self._ouvintes_alimentacao = []
+        self._ouvintes_pet = []
+        self._ouvintes_reabastecimento = []
+
+    def ao_alterar_agenda(self, callback):
+        self._ouvintes_agenda.append(callback)
+
+    def ao_alimentar(self, callback):
+        self._ouvintes_alimentacao.append(callback)
+
+    def ao_configurar_pet(self, callback):
+        self._ouvintes_pet.append(callback)
+
+    def ao_reabastecer(self, callback):
+        self._ouvintes_reabastecimento.append(callback)
+
+    def agora(self) -> datetime:
+        return self.instante(self.rtc.agora())
+
+    def instante(self, momento: datetime) -> datetime:
+        # Leva um momento ao referencial da agenda: UTC com fuso, local sem.
+        if self.fuso is not None:
+            return momento.astimezone(UTC)
+        if momento.tzinfo is not None:
+            return momento.astimezone().replace(tzinfo=None)
+        return momento
+
+    def configurar_fuso(self, nome):
+        self.fuso = ZoneInfo(nome) if nome else None
+        self.agendamentos.definir_fuso(self.fuso, self.agora())
+        self.display.show_message(f"Fuso horário: {nome or 'local'}")
+        self._notificar_agenda()
+
+    def _notificar_agenda(self):
+        if self.peso_pet:
+            self.replanejar()
+        for callback in self._ouvintes_agenda:
+            callback()
 
     def ligar(self):
         self.sistema_ativo = True
+        self.agendamentos.reiniciar_janela(self.agora())
         self.display.show_message("Sistema ligado!")
+        self._notificar_agenda()
 
     def desligar(self):
         self.sistema_ativo = False
         self.display.show_message("Sistema desligado!")
+        self._notificar_agenda()
+
+    def alimentar(self, origem=ORIGEM_MANUAL, porcao=None):
+        # Botões, app do celular e agendador podem chamar de threads diferentes.
+        self.comandos.executar(self._alimentar, origem, porcao)
 
-    def alimentar(self):
+    def _alimentar(self, origem, porcao=None):
         if self.sistema_ativo:
             peso_atual = self.sensor.medir_peso()
-            if peso_atual > 50:
-                self.motor.liberar_racao()
-                self.sensor.consumir_peso(50)
-                self.historico_alimentacao.append(f"{datetime.now().strftime('%d/%m %H:%M:%S')} - Ração liberada")
-                self.display.show_message("Ração liberada!")
+            if peso_atual > PESO_MINIMO:
+                if porcao is None and self.peso_pet:
+                    # O excesso das últimas 24h pode ter saído da janela desde o último plano.
+                    self.replanejar()
+                alvo = porcao or self.porcao()
+                self.motor.liberar_racao(gramas=alvo, origem=NOMES_ORIGEM[origem], peso=peso_atual)
+                resultado = self.dispensa.dispensar(alvo)
+                self.dispensa_travada = resultado.travado
+                self.historico_alimentacao.registrar(self.rtc.agora().timestamp(), resultado.gramas, self.sensor.medir_peso(), origem)
+                if self.peso_pet:
+                    self.replanejar()
+                for callback in self._ouvintes_alimentacao:
+                    callback(self.historico_alimentacao[-1])
+                if resultado.travado:
+                    self.emitir_alerta("Motor travado! Verifique o dispensador.")
+                    self.display.show_message(f"Motor travado após liberar {resultado.gramas:.0f}g")
+                else:
+                    self.display.show_message("Ração liberada!")
             else:
                 self.buzzer.alertar()
-                if self.wifi.conectado and self.alerta_callback:
-                    self.alerta_callback("Nível de ração crítico!")
+                # Um único aviso remoto até o reabastecimento, mesmo com vários agendamentos falhando.
+                if not self.alerta_critico_enviado:
+                    self.notificar("Nível de ração crítico!")
+                    self.alerta_critico_enviado = True
                 self.display.show_message("Sem ração suficiente para alimentar!")
         else:
             self.display.show_message("Sistema desligado. Não é possível alimentar.")
 
+    def porcao(self) -> float:
+        # Sem pet configurado, a porção padrão.
+        return self.plano.porcao if self.plano else PORCAO_PADRAO
+
+    def replanejar(self):
+        self.plano = self.planejador.planejar(self)
+
     def verificar_peso(self):
         if not self.sistema_ativo:
             return
         peso = self.sensor.medir_peso()
         self.display.show_message(f"Peso atual: {peso}g")
         if peso < 200:
-            self.buzzer.alertar()
-            if self.wifi.conectado and self.alerta_callback:
-                self.alerta_callback("Nível de ração baixo!")
+            self.emitir_alerta("Nível de ração baixo!")
+
+    def emitir_alerta(self, mensagem):
+        self.buzzer.alertar()
+        self.notificar(mensagem)
+
+    def notificar(self, mensagem):
+        self.wifi.enviar_notificacao(mensagem)
 
-    def agendar_alimentacao(self, horario, diario=False):
+    def _entregar_alertas(self, lote):
+        if self.alerta_callback:
+            for mensagem in lote:
+                self.alerta_callback(mensagem)
+
+    def reabastecer(self, quantidade):
+        self.comandos.executar(self.sensor.reabastecer, quantidade)
+        self.alerta_critico_enviado = False
+        self.alerta_preditivo.rearmar()
+        self.display.show_message(f"Reabastecido: {self.sensor.medir_peso()}g")
+        for callback in self._ouvintes_reabastecimento:
+            callback()
+
+    def agendar_alimentacao(self, horario=None, diario=False, regra=None):
         if not self.sistema_ativo:
             return
-        self.agendamentos.append((horario, diario))
-        freq = "Todos os Dias" if diario else "Hoje"
-        self.display.show_message(f"Agendado para {horario.strftime('%H:%M')} | Frequência: {freq}")
-
-    def checar_agendamentos(self):
+        if regra is not None:
+            agendamento = self.agendamentos.adicionar_regra(regra, self.agora())
+            self.display.show_message(f"Agendado: {regra}")
+        else:
+            agendamento = self.agendamentos.adicionar(horario, diario, self.agora())
+            freq = "Todos os Dias" if diario else "Hoje"
+            self.display.show_message(f"Agendado para {horario.strftime('%H:%M')} | Frequência: {freq}")
+        self._notificar_agenda()
+        self.alerta_preditivo.avaliar()
+        return agendamento
+
+    def importar_agendamentos(self, regras, pet=None):
+        # Aplica um lote (agenda e, opcionalmente, (peso, raça) do pet) com uma
+        # única mensagem no display e uma única rodada de notificações.
+        if not self.sistema_ativo and pet is None:
+            return []
+        novos = self.agendamentos.importar(regras, self.agora()) if self.sistema_ativo and regras else []
+        mensagem = f"{len(novos)} agendamentos importados"
+        if pet is not None:
+            self.peso_pet, self.raca_pet = pet
+            mensagem += f" | Pet: {self.raca_pet} com {self.peso_pet}kg"
+        self.display.show_message(mensagem)
+        if novos:
+            self._notificar_agenda()
+            self.alerta_preditivo.avaliar()
+        elif pet is not None:
+            self.replanejar()
+        if pet is not None:
+            for callback in self._ouvintes_pet:
+                callback()
+        return novos
+
+    def cancelar_agendamento(self, agendamento):
+        if self.agendamentos.remover(agendamento):
+            self.display.show_message(f"Agendamento das {agendamento.horario.strftime('%H:%M')} cancelado")
+            self._notificar_agenda()
+
+    def checar_agendamentos(self, agora=None):
         if not self.sistema_ativo:
             return
-        agora = self.rtc.agora()
-        for agendamento in self.agendamentos.copy():
-            horario, diario = agendamento
-            if agora.hour == horario.hour and agora.minute == horario.minute and agora.second == 0:
-                self.alimentar()
-                if not diario:
-                    self.agendamentos.remove(agendamento)
+        agora = self.agora() if agora is None else self.instante(agora)
+        total = len(self.agendamentos)
+        for agendamento in self.agendamentos.vencidos(agora):
+            self.alimentar(ORIGEM_AGENDADA, agendamento.porcao)
+        # Agendamentos únicos e regras encerradas saem da agenda ao disparar.
+        if len(self.agendamentos) != total:
+            self._notificar_agenda()
 
     def configurar_pet(self, peso, raca):
         self.peso_pet = peso
         self.raca_pet = raca
+        self.replanejar()
         self.display.show_message(f"Pet configurado: {raca} com {peso}kg")
+        for callback in self._ouvintes_pet:
+            callback()
 
     def conectar_wifi(self):
         self.wifi.conectar()
@@ -141,11 +1490,314 @@ class PetFeederTech:
 
     def set_alerta_callback(self, callback):
         self.alerta_callback = callback
+
+# -------------------- MÉTRICAS --------------------
+
+# Histograma de latência com faixas em potências de 2 microssegundos.
+class HistogramaLatencia:
+    __slots__ = ("faixas", "quantidade", "soma", "maximo")
+
+    FAIXAS = 32
+
+    def __init__(self):
+        self.faixas = array("Q", bytes(8 * self.FAIXAS))
+        self.quantidade = 0
+        self.soma = 0.0
+        self.maximo = 0.0
+
+    def registrar(self, segundos) -> None:
+        microssegundos = int(segundos * 1e6)
+        self.faixas[min(microssegundos.bit_length(), self.FAIXAS - 1)] += 1
+        self.quantidade += 1
+        self.soma += segundos
+        if segundos > self.maximo:
+            self.maximo = segundos
+
+    def percentil(self, p) -> float:
+        # Limite superior (em segundos) da faixa que contém o percentil.
+        alvo = p / 100 * self.quantidade
+        acumulado = 0
+        for faixa, contagem in enumerate(self.faixas):
+            acumulado += contagem
+            if contagem and acumulado >= alvo:
+                return (1 << faixa) / 1e6
+        return 0.0
+
+    def resumo(self) -> dict:
+        return {
+            "quantidade": self.quantidade,
+            "media": self.soma / self.quantidade if self.quantidade else 0.0,
+            "p50": self.percentil(50),
+            "p99": self.percentil(99),
+            "maximo": self.maximo,
+        }
+
+# Contadores, histogramas e medidores (funções lidas só na exportação).
+# Nada é medido até instrumentar() ser chamado: sem métricas, os métodos do
+# alimentador continuam sendo os originais, sem custo extra.
+class Metricas:
+    def __init__(self):
+        self.contadores = {}
+        self.histogramas = {}
+        self.medidores = {}
+
+    def incrementar(self, nome, quantidade=1) -> None:
+        self.contadores[nome] = self.contadores.get(nome, 0) + quantidade
+
+    def observar(self, nome, segundos) -> None:
+        histograma = self.histogramas.get(nome)
+        if histograma is None:
+            histograma = self.histogramas[nome] = HistogramaLatencia()
+        histograma.registrar(segundos)
+
+    def medir(self, nome, funcao):
+        # Envolve `funcao` registrando sua duração no histograma `nome`.
+        def medida(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                self.observar(nome, time.perf_counter() - inicio)
+        return medida
+
+    def medidor(self, nome, funcao) -> None:
+        self.medidores[nome] = funcao
+
+    def snapshot(self) -> dict:
+        return {
+            "contadores": dict(self.contadores),
+            "latencias": {nome: histograma.resumo() for nome, histograma in self.histogramas.items()},
+            "medidores": {nome: funcao() for nome, funcao in self.medidores.items()},
+        }
+
+    def salvar_snapshot(self, caminho) -> None:
+        temporario = f"{caminho}.tmp"
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            json.dump(self.snapshot(), arquivo, ensure_ascii=False)
+        os.replace(temporario, caminho)
+
+def instrumentar(feeder: PetFeederTech, metricas: Metricas, prefixo="") -> PetFeederTech:
+    for metodo in ("checar_agendamentos", "alimentar", "verificar_peso"):
+        setattr(feeder, metodo, metricas.medir(prefixo + metodo, getattr(feeder, metodo)))
+
+    alimentar_original = feeder._alimentar
+
+    def alimentar_contado(origem, porcao=None):
+        registros = len(feeder.historico_alimentacao)
+        alimentar_original(origem, porcao)
+        if len(feeder.historico_alimentacao) > registros:
+            metricas.incrementar(prefixo + "alimentacoes")
+            if feeder.dispensa_travada:
+                metricas.incrementar(prefixo + "falhas")
+        else:
+            metricas.incrementar(prefixo + "falhas")
+
+    notificar_original = feeder.notificar
+
+    def notificar_contado(mensagem):
+        metricas.incrementar(prefixo + "alertas")
+        notificar_original(mensagem)
+
+    feeder._alimentar = alimentar_contado
+    feeder.notificar = notificar_contado
+    metricas.medidor(prefixo + "fila_comandos", lambda: len(feeder.comandos))
+    metricas.medidor(prefixo + "fila_notificacoes", lambda: len(feeder.wifi.fila))
+    metricas.medidor(prefixo + "agendamentos", lambda: len(feeder.agendamentos))
+    metricas.medidor(prefixo + "latencia_fila_comandos", feeder.comandos.metricas)
+    return feeder
+
+# -------------------- AGENDADOR --------------------
+
+class TimerTk:
+    def __init__(self, root):
+        carregar_tk()
+        self.root = root
+
+    def armar(self, atraso, callback):
+        return self.root.after(max(math.ceil(atraso * 1000), 0), callback)
+
+    def cancelar(self, handle):
+        self.root.after_cancel(handle)
+
+class TimerAsyncio:
+    def __init__(self, loop=None):
+        self.loop = loop or asyncio.get_event_loop()
+
+    def armar(self, atraso, callback):
+        return self.loop.call_later(max(atraso, 0), callback)
+
+    def cancelar(self, handle):
+        handle.cancel()
+
+# Mantém um único timer armado para o próximo agendamento em vez de checar a
+# agenda a cada segundo. O atraso é limitado para tolerar ajustes no relógio.
+class Agendador:
+    ATRASO_MAXIMO = 300
+
+    def __init__(self, feeder: PetFeederTech, timer, metricas=None):
+        self.feeder = feeder
+        self.timer = timer
+        self.metricas = metricas
+        self._handle = None
+        self._previsto = None
+        feeder.ao_alterar_agenda(self.rearmar)
+        self.rearmar()
+
+    def rearmar(self):
+        self.parar()
+        if not self.feeder.sistema_ativo:
+            return
+        proximo = self.feeder.agendamentos.proximo_disparo()
+        if proximo is None:
+            return
+        agora = self.feeder.agora()
+        atraso = min((proximo - agora).total_seconds(), self.ATRASO_MAXIMO)
+        self._previsto = agora + timedelta(seconds=max(atraso, 0))
+        self._handle = self.timer.armar(atraso, self._disparar)
+
+    def parar(self):
+        if self._handle is not None:
+            self.timer.cancelar(self._handle)
+            self._handle = None
+
+    def _disparar(self):
+        self._handle = None
+        if self.metricas is not None:
+            deriva = (self.feeder.agora() - self._previsto).total_seconds()
+            self.metricas.observar("deriva_timer", max(deriva, 0))
+        self.feeder.checar_agendamentos()
+        self.rearmar()
+
+# -------------------- EXECUÇÃO SEM INTERFACE --------------------
+
+# Conduz agendamentos, verificação de peso e alertas de vários alimentadores
+# a partir de um único loop asyncio, sem depender do tkinter.
+class RuntimeHeadless:
+    def __init__(self, feeders, intervalo_peso=None, alerta_callback=None, metricas=None,
+                 arquivo_metricas=None, intervalo_metricas=10, timer=None):
+        self.feeders = list(feeders)
+        self.intervalo_peso = intervalo_peso
+        # Sem timer, um TimerAsyncio no loop de executar; um TimerSimulado
+        # permite rodar dias de operação sem esperar o relógio de parede.
+        self.timer = timer
+        self.metricas = metricas
+        self.arquivo_metricas = arquivo_metricas
+        self.intervalo_metricas = intervalo_metricas
+        self.agendadores = []
+        self._parar = None
+        self._handles = {}
+        if alerta_callback:
+            for feeder in self.feeders:
+                feeder.set_alerta_callback(alerta_callback)
+        if metricas is not None:
+            for indice, feeder in enumerate(self.feeders):
+                instrumentar(feeder, metricas, prefixo=f"{indice}." if len(self.feeders) > 1 else "")
+
+    def _armar(self, timer, chave, atraso, callback):
+        # Um handle por tarefa periódica: re-armar substitui o anterior.
+        self._handles[chave] = timer.armar(atraso, callback)
+
+    def _salvar_metricas(self, timer):
+        self.metricas.salvar_snapshot(self.arquivo_metricas)
+        if not self._parar.is_set():
+            self._armar(timer, "metricas", self.intervalo_metricas, lambda: self._salvar_metricas(timer))
+
+    def _verificar_peso(self, timer):
+        for feeder in self.feeders:
+            feeder.verificar_peso()
+        if not self._parar.is_set():
+            self._armar(timer, "peso", self.intervalo_peso, lambda: self._verificar_peso(timer))
+
+    async def executar(self, duracao=None):
+        self._parar = asyncio.Event()
+        self._handles = {}
+        timer = self.timer or TimerAsyncio(asyncio.get_running_loop())
+        self.agendadores = [Agendador(feeder, timer, self.metricas) for feeder in self.feeders]
+        for feeder in self.feeders:
+            feeder.wifi.fila.iniciar(timer)
+        if self.metricas is not None and self.arquivo_metricas:
+            self._armar(timer, "metricas", self.intervalo_metricas, lambda: self._salvar_metricas(timer))
+        if duracao is not None:
+            self._armar(timer, "duracao", duracao, self._parar.set)
+        # Com o alerta preditivo a verificação periódica de peso é opcional.
+        if self.intervalo_peso is not None:
+            self._verificar_peso(timer)
+        try:
+            await self._parar.wait()
+        finally:
+            for handle in self._handles.values():
+                timer.cancelar(handle)
+            for agendador in self.agendadores:
+                agendador.parar()
+            for feeder in self.feeders:
+                feeder.wifi.fila.parar()
+            if self.metricas is not None and self.arquivo_metricas:
+                self.metricas.salvar_snapshot(self.arquivo_metricas)
+
+    def parar(self):
+        if self._parar is not None:
+            self._parar.set()
+
+# -------------------- ATUALIZAÇÃO DA TELA --------------------
+
+# Junta as atualizações de texto e aplica no máximo uma por quadro. Em
+# rajadas (importação de agenda, tempestade de alertas) o status fica só com
+# a última mensagem e as linhas de log chegam num único insert, em vez de um
+# redesenho por evento. `aplicar` é a função que escreve no widget.
+class AtualizadorTela:
+    INTERVALO = 1 / 30
+
+    def __init__(self, timer, intervalo=INTERVALO):
+        self.timer = timer
+        self.intervalo = intervalo
+        self.quadros = 0
+        self._valores = {}
+        self._linhas = {}
+        self._handle = None
+
+    def definir(self, aplicar, valor) -> None:
+        self._valores[aplicar] = valor
+        self._agendar()
+
+    def anexar(self, aplicar, linha, limite=None) -> None:
+        # Com `limite`, só as últimas linhas da rajada chegam ao widget.
+        linhas = self._linhas.get(aplicar)
+        if linhas is None:
+            linhas = self._linhas[aplicar] = deque(maxlen=limite)
+        linhas.append(linha)
+        self._agendar()
+
+    def _agendar(self):
+        if self._handle is None:
+            self._handle = self.timer.armar(self.intervalo, self._renderizar)
+
+    def _renderizar(self):
+        self._handle = None
+        valores, self._valores = self._valores, {}
+        linhas, self._linhas = self._linhas, {}
+        self.quadros += 1
+        for aplicar, valor in valores.items():
+            aplicar(valor)
+        for aplicar, pendentes in linhas.items():
+            aplicar(list(pendentes))
+
+    def descarregar(self) -> None:
+        if self._handle is not None:
+            self.timer.cancelar(self._handle)
+            self._renderizar()
+
 # -------------------- INTERFACE DO CELULAR --------------------
 
 class AppCelular:
-    def __init__(self, parent, feeder: PetFeederTech):
+    # O log de alertas guarda até MAXIMO_ALERTAS linhas; ao passar disso as
+    # mais antigas saem em blocos de CORTE_ALERTAS, não uma a uma.
+    MAXIMO_ALERTAS = 500
+    CORTE_ALERTAS = 100
+
+    def __init__(self, parent, feeder: PetFeederTech, tela=None):
+        carregar_tk()
         self.feeder = feeder
+        self.tela = tela or AtualizadorTela(TimerTk(parent))
         self.window = tk.Toplevel(parent)
         self.window.title("PetFeeder App")
         self.window.geometry("320x600")
@@ -162,7 +1814,7 @@ class AppCelular:
         self.botao_wifi = tk.Button(self.window, text="Conectar Wi-Fi", command=self.toggle_wifi, font=("Arial", 12))
         self.botao_wifi.pack(pady=5)
 
-        self.btn_alimentar = tk.Button(self.window, text="Alimentar Agora", command=self.feeder.alimentar, font=("Arial", 12))
+        self.btn_alimentar = tk.Button(self.window, text="Alimentar Agora", command=lambda: self.feeder.alimentar(ORIGEM_APP), font=("Arial", 12))
         self.btn_verificar = tk.Button(self.window, text="Verificar Peso", command=self.feeder.verificar_peso, font=("Arial", 12))
 
     def toggle_wifi(self):
@@ -180,16 +1832,113 @@ class AppCelular:
             self.btn_verificar.pack(pady=5)
 
     def receber_alerta(self, mensagem):
-        self.alerta_text.insert(tk.END, f"{mensagem}\n")
+        self.tela.anexar(self._escrever_alertas, mensagem, self.MAXIMO_ALERTAS)
+
+    def _escrever_alertas(self, linhas):
+        if not self.alerta_text.winfo_exists():
+            return
+        self.alerta_text.insert(tk.END, "\n".join(linhas) + "\n")
+        total = int(self.alerta_text.index("end-1c").split(".")[0]) - 1
+        if total > self.MAXIMO_ALERTAS:
+            excesso = total - self.MAXIMO_ALERTAS + self.CORTE_ALERTAS
+            self.alerta_text.delete("1.0", f"{excesso + 1}.0")
         self.alerta_text.see(tk.END)
 
+# -------------------- HISTÓRICO PAGINADO --------------------
+
+# Mostra só a página visível do histórico: abrir a janela e rolar custam o
+# mesmo com dez ou com um milhão de registros.
+class VisualizadorHistorico:
+    LINHAS_POR_PAGINA = 25
+
+    def __init__(self, parent, historico: HistoricoAlimentacao):
+        carregar_tk()
+        self.historico = historico
+        self.inicio = max(len(historico) - self.LINHAS_POR_PAGINA, 0)
+
+        self.window = tk.Toplevel(parent)
+        self.window.title("Histórico de Alimentações")
+        self.window.geometry("420x480")
+
+        frame_busca = tk.Frame(self.window)
+        frame_busca.pack(pady=5)
+        tk.Label(frame_busca, text="Ir para (dd/mm/aaaa):", font=("Arial", 10)).pack(side="left")
+        self.entry_data = tk.Entry(frame_busca, font=("Arial", 10), width=12)
+        self.entry_data.pack(side="left", padx=5)
+        self.entry_data.bind("<Return>", lambda event: self.ir_para_data())
+        tk.Button(frame_busca, text="Ir", command=self.ir_para_data).pack(side="left")
+
+        frame_texto = tk.Frame(self.window)
+        frame_texto.pack(fill="both", expand=True)
+        self.scrollbar = tk.Scrollbar(frame_texto, command=self.rolar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.text = tk.Text(frame_texto, font=("Arial", 10), height=self.LINHAS_POR_PAGINA, wrap="none")
+        self.text.pack(side="left", fill="both", expand=True)
+        self.text.bind("<MouseWheel>", lambda event: self.mover(-1 if event.delta > 0 else 1))
+        self.text.bind("<Button-4>", lambda event: self.mover(-1))
+        self.text.bind("<Button-5>", lambda event: self.mover(1))
+
+        frame_navegacao = tk.Frame(self.window)
+        frame_navegacao.pack(pady=5)
+        tk.Button(frame_navegacao, text="< Anterior", command=lambda: self.mover(-self.LINHAS_POR_PAGINA)).pack(side="left", padx=5)
+        tk.Button(frame_navegacao, text="Próxima >", command=lambda: self.mover(self.LINHAS_POR_PAGINA)).pack(side="left", padx=5)
+        self.label_posicao = tk.Label(self.window, text="", font=("Arial", 9))
+        self.label_posicao.pack()
+
+        self.renderizar()
+
+    def mover(self, linhas):
+        self.ir_para(self.inicio + linhas)
+
+    def ir_para(self, inicio):
+        maximo = max(len(self.historico) - self.LINHAS_POR_PAGINA, 0)
+        self.inicio = min(max(inicio, 0), maximo)
+        self.renderizar()
+
+    def rolar(self, acao, quantidade, unidade=None):
+        if acao == "moveto":
+            self.ir_para(int(float(quantidade) * len(self.historico)))
+        elif acao == "scroll":
+            passo = self.LINHAS_POR_PAGINA if unidade == "pages" else 1
+            self.mover(int(quantidade) * passo)
+
+    def ir_para_data(self):
+        try:
+            data = datetime.strptime(self.entry_data.get(), "%d/%m/%Y")
+        except ValueError:
+            self.label_posicao.config(text="Data inválida. Use dd/mm/aaaa.")
+            return
+        self.ir_para(self.historico.indice_por_data(data.timestamp()))
+
+    def renderizar(self):
+        total = len(self.historico)
+        linhas = self.historico.pagina(self.inicio, self.LINHAS_POR_PAGINA)
+        self.text.config(state="normal")
+        self.text.delete("1.0", tk.END)
+        self.text.insert(tk.END, "\n".join(linhas))
+        self.text.config(state="disabled")
+        if total:
+            self.scrollbar.set(self.inicio / total, (self.inicio + len(linhas)) / total)
+            self.label_posicao.config(text=f"{self.inicio + 1}-{self.inicio + len(linhas)} de {total}")
+        else:
+            self.scrollbar.set(0, 1)
+            self.label_posicao.config(text="Nenhuma alimentação registrada")
+
 # -------------------- INTERFACE DO DISPOSITIVO --------------------
 
 class App:
     def __init__(self, root):
+        carregar_tk()
         self.root = root
         self.root.title("PetFeederTech")
+        self.tela = AtualizadorTela(TimerTk(self.root))
         self.feeder = PetFeederTech(self.update_status)
+        # PETFEEDER_METRICAS=arquivo.json liga a instrumentação e grava um snapshot a cada 10s.
+        self.arquivo_metricas = os.environ.get("PETFEEDER_METRICAS")
+        self.metricas = Metricas() if self.arquivo_metricas else None
+        if self.metricas:
+            instrumentar(self.feeder, self.metricas)
+            self.root.after(10000, self.salvar_metricas)
 
         self.root.geometry("400x650")
         self.frame_display = tk.Frame(root, bg="#e0e0e0", bd=2, relief="groove")
@@ -243,9 +1992,10 @@ class App:
 
         self.app_celular = None
         self.feeder.set_alerta_callback(self.alertar_no_celular)
+        self.feeder.wifi.fila.iniciar(TimerTk(self.root))
 
         self.atualizar_hora()
-        self.atualizar()
+        self.agendador = Agendador(self.feeder, TimerTk(self.root), self.metricas)
 
     def formatar_horario_em_tempo_real(self, event):
         texto = self.entry_agendar.get().replace(":", "")
@@ -275,6 +2025,9 @@ class App:
             self.entry_agendar.insert(tk.END, valor)
 
     def update_status(self, mensagem):
+        self.tela.definir(self._mostrar_status, mensagem)
+
+    def _mostrar_status(self, mensagem):
         self.status_text.config(text=mensagem)
 
     def pressionar_botao(self):
@@ -283,7 +2036,7 @@ class App:
         else:
             self.feeder.ligar()
         status = "Sistema ligado" if self.feeder.sistema_ativo else "Sistema desligado"
-        self.status_text.config(text=status)
+        self.update_status(status)
 
     def agendar(self):
         horario_str = self.entry_agendar.get()
@@ -321,37 +2074,54 @@ class App:
                 self.update_status("Peso inválido!")
 
         def abrir_historico():
-            historico_window = tk.Toplevel(config_window)
-            historico_window.title("Histórico de Alimentações")
-            historico_window.geometry("300x400")
-            text = tk.Text(historico_window, font=("Arial", 10))
-            text.pack()
-            for registro in self.feeder.historico_alimentacao:
-                text.insert(tk.END, f"{registro}\n")
+            VisualizadorHistorico(config_window, self.feeder.historico_alimentacao)
 
         tk.Button(config_window, text="Salvar Configurações", command=salvar, font=("Arial", 12)).pack(pady=5)
         tk.Button(config_window, text="Ver Histórico de Alimentações", command=abrir_historico, font=("Arial", 12)).pack(pady=5)
 
     def abrir_celular(self):
         if not self.app_celular or not tk.Toplevel.winfo_exists(self.app_celular.window):
-            self.app_celular = AppCelular(self.root, self.feeder)
+            self.app_celular = AppCelular(self.root, self.feeder, self.tela)
 
     def alertar_no_celular(self, mensagem):
         if self.app_celular:
             self.app_celular.receber_alerta(mensagem)
 
-    def atualizar_hora(self):
-        agora = datetime.now().strftime("%H:%M:%S")
-        self.label_hora.config(text=agora)
-        self.root.after(1000, self.atualizar_hora)
+    def salvar_metricas(self):
+        self.metricas.salvar_snapshot(self.arquivo_metricas)
+        self.root.after(10000, self.salvar_metricas)
 
-    def atualizar(self):
-        self.feeder.checar_agendamentos()
-        self.root.after(1000, self.atualizar)
+    def atualizar_hora(self):
+        agora = self.feeder.rtc.agora()
+        if self.metricas:
+            # O callback deveria rodar no início do segundo; o resto é atraso do loop do Tk.
+            self.metricas.observar("deriva_relogio_tela", agora.microsecond / 1e6)
+        texto = f"{agora:%H:%M:%S}"
+        if texto != self.label_hora["text"]:
+            self.label_hora.config(text=texto)
+        # Alinha ao início do próximo segundo para o relógio não derivar.
+        self.root.after(1000 - agora.microsecond // 1000, self.atualizar_hora)
 
 # -------------------- EXECUÇÃO --------------------
 
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = App(root)
-    root.mainloop()
\ No newline at end of file
+    if "--headless" in sys.argv:
+        feeder = PetFeederTech()
+        feeder.ligar()
+        feeder.conectar_wifi()
+        feeder.set_alerta_callback(lambda mensagem: REGISTRO_WIFI.info(
+            "%s", mensagem, extra={"dados": {"peso": feeder.sensor.peso}}))
+        arquivo = sys.argv[sys.argv.index("--metricas") + 1] if "--metricas" in sys.argv else None
+        metricas = Metricas() if arquivo else None
+        registro = None
+        if "--log" in sys.argv:
+            registro = RegistroJSON(sys.argv[sys.argv.index("--log") + 1]).iniciar()
+        try:
+            asyncio.run(RuntimeHeadless([feeder], metricas=metricas, arquivo_metricas=arquivo).executar())
+        finally:
+            if registro is not None:
+                registro.parar()
+    else:
+        root = carregar_tk().Tk()
+        app = App(root)
+        root.mainloop()
\ No newline at end of file
@@ -0,0 +1,207 @@
+import json
+import queue
+import sqlite3
+import threading
+import time
+from array import array
+from datetime import time as dtime
+from zoneinfo import ZoneInfo
+
+from src.main import PetFeederTech, Recorrencia
+
+# -------------------- ARMAZENAMENTO PERSISTENTE --------------------
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS historico (
+    feeder TEXT NOT NULL,
+    inicio REAL NOT NULL,
+    timestamps BLOB NOT NULL,
+    gramas BLOB NOT NULL,
+    pesos_restantes BLOB NOT NULL,
+    origens BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS historico_feeder ON historico (feeder, inicio);
+CREATE TABLE IF NOT EXISTS agendamentos (
+    feeder TEXT NOT NULL,
+    horario TEXT NOT NULL,
+    diario INTEGER NOT NULL,
+    regra TEXT
+);
+CREATE INDEX IF NOT EXISTS agendamentos_feeder ON agendamentos (feeder);
+CREATE TABLE IF NOT EXISTS estado (
+    feeder TEXT NOT NULL,
+    chave TEXT NOT NULL,
+    valor TEXT NOT NULL,
+    PRIMARY KEY (feeder, chave)
+);
+"""
+
+COLUNAS_HISTORICO = ("timestamps", "gramas", "pesos_restantes", "origens")
+
+def _linhas_agenda(feeder: PetFeederTech) -> list:
+    return [(agendamento.horario.isoformat(), int(agendamento.diario),
+             json.dumps(agendamento.regra.para_dict()) if agendamento.regra else None)
+            for agendamento in feeder.agendamentos]
+
+# Grava histórico, agendamentos e configuração em SQLite no modo WAL. As
+# escritas vão para uma fila e uma thread as aplica em lotes, com um único
+# commit (e fsync, synchronous=FULL) por lote, então alimentar nunca espera pelo disco.
+# O histórico é gravado em blocos de colunas compactas, recarregados com
+# array.frombytes.
+class ArmazenamentoSQLite:
+    MAX_BLOCOS = 64
+
+    def __init__(self, caminho, intervalo_gravacao=0.2, tamanho_lote=1024):
+        self.intervalo_gravacao = intervalo_gravacao
+        self.tamanho_lote = tamanho_lote
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None)
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.execute("PRAGMA synchronous=FULL")
+        self._conexao.executescript(ESQUEMA)
+        colunas = [linha[1] for linha in self._conexao.execute("PRAGMA table_info(agendamentos)")]
+        if "regra" not in colunas:
+            # Bancos anteriores às regras de recorrência.
+            self._conexao.execute("ALTER TABLE agendamentos ADD COLUMN regra TEXT")
+        self._trava = threading.Lock()
+        self._fila = queue.Queue()
+        self._gravador = threading.Thread(target=self._gravar, name="persistencia", daemon=True)
+        self._gravador.start()
+
+    # ---- carga ----
+
+    def carregar(self, feeder: PetFeederTech, nome="padrao") -> PetFeederTech:
+        with self._trava:
+            blocos = self._conexao.execute(
+                "SELECT inicio, timestamps, gramas, pesos_restantes, origens FROM historico "
+                "WHERE feeder = ? ORDER BY inicio, rowid", (nome,)).fetchall()
+            estado = dict(self._conexao.execute(
+                "SELECT chave, valor FROM estado WHERE feeder = ?", (nome,)).fetchall())
+            agendamentos = self._conexao.execute(
+                "SELECT horario, diario, regra FROM agendamentos WHERE feeder = ? ORDER BY rowid", (nome,)).fetchall()
+
+        historico = feeder.historico_alimentacao
+        for bloco in blocos:
+            for coluna, dados in zip(COLUNAS_HISTORICO, bloco[1:]):
+                getattr(historico, coluna).frombytes(dados)
+        if len(blocos) > self.MAX_BLOCOS:
+            self._fila.put(("compactar", nome, blocos[0][0],
+                            [getattr(historico, coluna).tobytes() for coluna in COLUNAS_HISTORICO]))
+
+        if "peso_pet" in estado:
+            feeder.peso_pet = json.loads(estado["peso_pet"])
+        if "raca_pet" in estado:
+            feeder.raca_pet = json.loads(estado["raca_pet"])
+        if "sensor_peso" in estado:
+            feeder.sensor.peso = json.loads(estado["sensor_peso"])
+        if json.loads(estado.get("fuso", "null")):
+            feeder.fuso = ZoneInfo(json.loads(estado["fuso"]))
+            feeder.agendamentos.definir_fuso(feeder.fuso, feeder.agora())
+        feeder.replanejar()
+
+        agora = feeder.agora()
+        for horario, diario, regra in agendamentos:
+            if regra is None:
+                feeder.agendamentos.adicionar(dtime.fromisoformat(horario), bool(diario), agora)
+                continue
+            regra = Recorrencia.de_dict(json.loads(regra))
+            if regra.proximo(agora) is not None:
+                feeder.agendamentos.adicionar_regra(regra, agora)
+        if agendamentos:
+            feeder._notificar_agenda()
+        return feeder
+
+    def vincular(self, feeder: PetFeederTech, nome="padrao") -> PetFeederTech:
+        self.carregar(feeder, nome)
+        feeder.ao_alimentar(lambda registro: self._registrar_alimentacao(nome, feeder, registro))
+        feeder.ao_configurar_pet(lambda: self.salvar_estado(feeder, nome))
+        feeder.ao_reabastecer(lambda: self._fila.put(("estado", nome, "sensor_peso", feeder.sensor.peso)))
+        feeder.ao_alterar_agenda(lambda: self.salvar_agenda(feeder, nome))
+        return feeder
+
+    # ---- escrita ----
+
+    def _registrar_alimentacao(self, nome, feeder, registro):
+        self._fila.put(("historico", nome, registro))
+        self._fila.put(("estado", nome, "sensor_peso", feeder.sensor.peso))
+
+    def salvar_estado(self, feeder: PetFeederTech, nome="padrao") -> None:
+        self._fila.put(("estado", nome, "peso_pet", feeder.peso_pet))
+        self._fila.put(("estado", nome, "raca_pet", feeder.raca_pet))
+        self._fila.put(("estado", nome, "sensor_peso", feeder.sensor.peso))
+
+    def salvar_agenda(self, feeder: PetFeederTech, nome="padrao") -> None:
+        # As linhas são montadas aqui, na thread dona do feeder: a thread de
+        # gravação só recebe tuplas e nunca percorre a agenda viva.
+        # Os horários só fazem sentido junto com o fuso em que foram definidos.
+        self._fila.put(("estado", nome, "fuso", feeder.fuso and feeder.fuso.key))
+        self._fila.put(("agenda", nome, _linhas_agenda(feeder)))
+
+    def sincronizar(self, timeout=None) -> bool:
+        concluido = threading.Event()
+        self._fila.put(("sincronizar", concluido))
+        return concluido.wait(timeout)
+
+    def fechar(self) -> None:
+        self._fila.put(None)
+        self._gravador.join()
+        self._conexao.close()
+
+    def _gravar(self):
+        while True:
+            lote = [self._fila.get()]
+            limite = time.monotonic() + self.intervalo_gravacao
+            while lote[-1] is not None and lote[-1][0] != "sincronizar" and len(lote) < self.tamanho_lote:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(self._fila.get(timeout=restante))
+                except queue.Empty:
+                    break
+            self._aplicar(lote)
+            if lote[-1] is None:
+                return
+
+    def _aplicar(self, lote):
+        historicos = {}
+        estados = {}
+        agendas = {}
+        compactacoes = []
+        barreiras = []
+        for operacao in lote:
+            if operacao is None:
+                continue
+            tipo = operacao[0]
+            if tipo == "historico":
+                historicos.setdefault(operacao[1], []).append(operacao[2])
+            elif tipo == "estado":
+                estados[operacao[1], operacao[2]] = json.dumps(operacao[3])
+            elif tipo == "agenda":
+                agendas[operacao[1]] = operacao[2]
+            elif tipo == "compactar":
+                compactacoes.append(operacao[1:])
+            elif tipo == "sincronizar":
+                barreiras.append(operacao[1])
+
+        with self._trava:
+            conexao = self._conexao
+            conexao.execute("BEGIN")
+            for nome, inicio, colunas in compactacoes:
+                conexao.execute("DELETE FROM historico WHERE feeder = ?", (nome,))
+                conexao.execute("INSERT INTO historico VALUES (?, ?, ?, ?, ?, ?)", (nome, inicio, *colunas))
+            for nome, registros in historicos.items():
+                colunas = (array("d"), array("f"), array("f"), array("B"))
+                for registro in registros:
+                    for coluna, valor in zip(colunas, registro):
+                        coluna.append(valor)
+                conexao.execute("INSERT INTO historico VALUES (?, ?, ?, ?, ?, ?)",
+                                (nome, registros[0].timestamp, *(coluna.tobytes() for coluna in colunas)))
+            conexao.executemany("INSERT OR REPLACE INTO estado VALUES (?, ?, ?)",
+                                [(nome, chave, valor) for (nome, chave), valor in estados.items()])
+            for nome, linhas in agendas.items():
+                conexao.execute("DELETE FROM agendamentos WHERE feeder = ?", (nome,))
+                conexao.executemany("INSERT INTO agendamentos VALUES (?, ?, ?, ?)",
+                                    [(nome, *linha) for linha in linhas])
+            conexao.execute("COMMIT")
+        for barreira in barreiras:
+            barreira.set()
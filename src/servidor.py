@@ -0,0 +1,305 @@
+import asyncio
+import json
+import sys
+import time
+from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
+
+from src.main import ORIGEM_APP, PetFeederTech, Recorrencia, RuntimeHeadless
+
+# -------------------- API DE CONTROLE LOCAL --------------------
+
+STATUS = {200: "OK", 201: "Created", 204: "No Content", 400: "Bad Request",
+          404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+class ErroHTTP(Exception):
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+
+def _resumo(indice, feeder: PetFeederTech) -> dict:
+    return {
+        "id": indice,
+        "ativo": feeder.sistema_ativo,
+        "peso": feeder.sensor.medir_peso(),
+        "wifi": feeder.wifi.conectado,
+        "agendamentos": len(feeder.agendamentos),
+        "pet": {"peso": feeder.peso_pet, "raca": feeder.raca_pet},
+        "fuso": feeder.fuso and feeder.fuso.key,
+    }
+
+def _cabecalho(dados: bytes):
+    # Linha de requisição e cabeçalhos; ValueError se algo vier malformado.
+    linhas = dados.decode("latin-1").split("\r\n")
+    metodo, alvo, versao = linhas[0].split(" ", 2)
+    cabecalhos = {}
+    for linha in linhas[1:]:
+        if ":" in linha:
+            nome, valor = linha.split(":", 1)
+            cabecalhos[nome.strip().lower()] = valor.strip()
+    tamanho = int(cabecalhos.get("content-length", 0))
+    if tamanho < 0:
+        raise ValueError("Content-Length negativo")
+    return metodo, alvo, versao, cabecalhos, tamanho
+
+def _agendamento(agendamento) -> dict:
+    dados = {
+        "id": agendamento.id,
+        "horario": agendamento.horario.strftime("%H:%M"),
+        "diario": agendamento.diario,
+        "disparo": agendamento.disparo.isoformat(),
+    }
+    if agendamento.regra is not None:
+        dados["regra"] = agendamento.regra.para_dict()
+    return dados
+
+# Servidor HTTP/1.1 mínimo sobre asyncio, com conexões persistentes
+# (keep-alive). Alertas são empurrados aos inscritos em GET /eventos como
+# Server-Sent Events, então o celular não precisa ficar consultando.
+#
+#   GET    /alimentadores
+#   GET    /alimentadores/{id}
+#   POST   /alimentadores/{id}/alimentar
+#   GET    /alimentadores/{id}/peso
+#   GET    /alimentadores/{id}/agendamentos
+#   POST   /alimentadores/{id}/agendamentos       {"horario": "HH:MM", "diario": false}
+#                                                  {"regra": {"intervalo": ["06:00", "22:00", 240], "dias": ["seg"]}}
+#                                                  {"regras": [...]}  (importação em lote)
+#   DELETE /alimentadores/{id}/agendamentos/{ag}
+#   GET    /alimentadores/{id}/historico?inicio=0&n=50
+#   GET    /eventos
+#   GET    /metricas                               (se houver Metricas)
+class ServidorControle:
+    TAMANHO_FILA_EVENTOS = 64
+    TAMANHO_MAXIMO_CORPO = 1 << 20
+
+    def __init__(self, feeders, host="127.0.0.1", porta=8080, metricas=None):
+        if isinstance(feeders, PetFeederTech):
+            feeders = [feeders]
+        self.feeders = list(getattr(feeders, "feeders", feeders))
+        self.host = host
+        self.porta = porta
+        self.metricas = metricas
+        self.inscritos = set()
+        self._servidor = None
+        if metricas is not None:
+            metricas.medidor("inscritos_eventos", lambda: len(self.inscritos))
+        for indice, feeder in enumerate(self.feeders):
+            self._observar_alertas(indice, feeder)
+
+    def _observar_alertas(self, indice, feeder):
+        anterior = feeder.alerta_callback
+
+        def callback(mensagem):
+            if anterior:
+                anterior(mensagem)
+            self.publicar_evento({"alimentador": indice, "mensagem": mensagem})
+
+        feeder.set_alerta_callback(callback)
+
+    def publicar_evento(self, evento: dict) -> None:
+        dados = f"data: {json.dumps(evento, ensure_ascii=False)}\n\n".encode()
+        for fila in self.inscritos:
+            if fila.full():
+                fila.get_nowait()  # inscrito lento perde o evento mais antigo
+            fila.put_nowait(dados)
+
+    async def iniciar(self):
+        self._servidor = await asyncio.start_server(self._atender, self.host, self.porta, backlog=4096)
+        self.porta = self._servidor.sockets[0].getsockname()[1]
+        return self
+
+    async def parar(self):
+        if self._servidor is not None:
+            self._servidor.close()
+            await self._servidor.wait_closed()
+            self._servidor = None
+
+    # ---- protocolo ----
+
+    async def _atender(self, reader, writer):
+        try:
+            while True:
+                try:
+                    metodo, alvo, versao, cabecalhos, tamanho = _cabecalho(await reader.readuntil(b"\r\n\r\n"))
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except (asyncio.LimitOverrunError, ValueError):
+                    # Sem como achar o início da próxima requisição: responde e fecha.
+                    await self._recusar(writer, 400, "Requisição malformada")
+                    return
+                if tamanho > self.TAMANHO_MAXIMO_CORPO:
+                    await self._recusar(writer, 413, "Corpo grande demais")
+                    return
+                try:
+                    corpo = await reader.readexactly(tamanho) if tamanho else b""
+                except asyncio.IncompleteReadError:
+                    return  # cliente fechou antes de enviar o corpo anunciado
+                manter = cabecalhos.get("connection", "").lower() != "close" and versao == "HTTP/1.1"
+
+                url = urlsplit(alvo)
+                if metodo == "GET" and url.path == "/eventos":
+                    await self._transmitir_eventos(writer)
+                    return
+                status, resposta = self._responder(metodo, url.path, parse_qs(url.query), corpo)
+                self._escrever(writer, status, resposta, manter)
+                await writer.drain()
+                if not manter:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _recusar(self, writer, status, mensagem):
+        self._escrever(writer, status, {"erro": mensagem}, False)
+        await writer.drain()
+
+    def _escrever(self, writer, status, resposta, manter):
+        dados = b"" if resposta is None else json.dumps(resposta, ensure_ascii=False).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {STATUS[status]}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(dados)}\r\n"
+            f"Connection: {'keep-alive' if manter else 'close'}\r\n\r\n".encode() + dados
+        )
+
+    async def _transmitir_eventos(self, writer):
+        fila = asyncio.Queue(self.TAMANHO_FILA_EVENTOS)
+        self.inscritos.add(fila)
+        try:
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                         b"Cache-Control: no-cache\r\nConnection: keep-alive\r\n\r\n")
+            await writer.drain()
+            while True:
+                writer.write(await fila.get())
+                await writer.drain()
+        finally:
+            self.inscritos.discard(fila)
+
+    # ---- rotas ----
+
+    def _responder(self, metodo, caminho, consulta, corpo):
+        try:
+            return self._rotear(metodo, [parte for parte in caminho.split("/") if parte], consulta, corpo)
+        except ErroHTTP as erro:
+            return erro.status, {"erro": str(erro)}
+        except (ValueError, KeyError, TypeError) as erro:
+            return 400, {"erro": str(erro)}
+
+    def _feeder(self, texto):
+        try:
+            return int(texto), self.feeders[int(texto)]
+        except (ValueError, IndexError):
+            raise ErroHTTP(404, "Alimentador não encontrado")
+
+    def _rotear(self, metodo, partes, consulta, corpo):
+        if partes == ["metricas"] and self.metricas is not None:
+            self._exigir(metodo, "GET")
+            return 200, self.metricas.snapshot()
+        if not partes or partes[0] != "alimentadores":
+            raise ErroHTTP(404, "Rota não encontrada")
+        if len(partes) == 1:
+            self._exigir(metodo, "GET")
+            return 200, [_resumo(indice, feeder) for indice, feeder in enumerate(self.feeders)]
+
+        indice, feeder = self._feeder(partes[1])
+        recurso = partes[2] if len(partes) > 2 else None
+        if recurso is None:
+            self._exigir(metodo, "GET")
+            return 200, _resumo(indice, feeder)
+        if recurso == "alimentar":
+            self._exigir(metodo, "POST")
+            feeder.alimentar(ORIGEM_APP)
+            return 200, {"peso": feeder.sensor.medir_peso()}
+        if recurso == "peso":
+            self._exigir(metodo, "GET")
+            feeder.verificar_peso()
+            return 200, {"peso": feeder.sensor.medir_peso()}
+        if recurso == "historico":
+            self._exigir(metodo, "GET")
+            historico = feeder.historico_alimentacao
+            tamanho = min(int(consulta.get("n", ["50"])[0]), 1000)
+            inicio = int(consulta.get("inicio", [max(len(historico) - tamanho, 0)])[0])
+            return 200, {"total": len(historico), "inicio": inicio,
+                         "registros": [registro._asdict() for registro in historico[inicio:inicio + tamanho]]}
+        if recurso == "agendamentos":
+            return self._agendamentos(metodo, feeder, partes[3:], corpo)
+        raise ErroHTTP(404, "Rota não encontrada")
+
+    def _agendamentos(self, metodo, feeder, resto, corpo):
+        if not resto:
+            if metodo == "GET":
+                return 200, [_agendamento(agendamento) for agendamento in feeder.agendamentos]
+            self._exigir(metodo, "POST")
+            dados = json.loads(corpo or b"{}")
+            if not feeder.sistema_ativo:
+                raise ErroHTTP(400, "Sistema desligado")
+            if "regras" in dados:
+                novos = feeder.importar_agendamentos([Recorrencia.de_dict(regra) for regra in dados["regras"]])
+                return 201, [_agendamento(agendamento) for agendamento in novos]
+            if "regra" in dados:
+                agendamento = feeder.agendar_alimentacao(regra=Recorrencia.de_dict(dados["regra"]))
+            else:
+                horario = datetime.strptime(dados["horario"], "%H:%M").time()
+                agendamento = feeder.agendar_alimentacao(horario, bool(dados.get("diario", False)))
+            return 201, _agendamento(agendamento)
+        self._exigir(metodo, "DELETE")
+        agendamento = feeder.agendamentos.buscar(int(resto[0]))
+        if agendamento is None:
+            raise ErroHTTP(404, "Agendamento não encontrado")
+        feeder.cancelar_agendamento(agendamento)
+        return 204, None
+
+    def _exigir(self, metodo, esperado):
+        if metodo != esperado:
+            raise ErroHTTP(405, "Método não permitido")
+
+# -------------------- EXECUÇÃO AVULSA --------------------
+
+async def servir(host="127.0.0.1", porta=8080, ao_iniciar=None):
+    # Alimentador ligado e com Wi-Fi (sem conexão os alertas ficam presos na
+    # fila e nunca chegam a /eventos); o runtime arma os agendamentos criados
+    # pela API e entrega as notificações.
+    feeder = PetFeederTech()
+    feeder.ligar()
+    feeder.conectar_wifi()
+    servidor = await ServidorControle(feeder, host, porta).iniciar()
+    runtime = RuntimeHeadless([feeder])
+    print(f"Servidor em http://{servidor.host}:{servidor.porta}")
+    if ao_iniciar is not None:
+        ao_iniciar(servidor, runtime)
+    try:
+        await runtime.executar()
+    finally:
+        await servidor.parar()
+
+# -------------------- TESTE DE CARGA --------------------
+
+async def medir_carga(clientes=1000, requisicoes=20):
+    feeder = PetFeederTech(lambda mensagem: None)
+    feeder.ligar()
+    servidor = await ServidorControle(feeder, porta=0).iniciar()
+    pedido = b"GET /alimentadores/0 HTTP/1.1\r\nHost: localhost\r\n\r\n"
+
+    async def cliente():
+        reader, writer = await asyncio.open_connection("127.0.0.1", servidor.porta)
+        for _ in range(requisicoes):
+            writer.write(pedido)
+            cabecalho = await reader.readuntil(b"\r\n\r\n")
+            tamanho = int(cabecalho.split(b"Content-Length: ")[1].split(b"\r\n")[0])
+            await reader.readexactly(tamanho)
+        writer.close()
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente() for _ in range(clientes)))
+    duracao = time.perf_counter() - inicio
+    await servidor.parar()
+    return clientes * requisicoes / duracao
+
+if __name__ == "__main__":
+    if "--carga" in sys.argv:
+        clientes = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+        print(f"{clientes} clientes: {asyncio.run(medir_carga(clientes)):.0f} requisições/s")
+    else:
+        asyncio.run(servir())
@@ -0,0 +1,257 @@
+import gc
+import os
+import pickle
+import sys
+import time
+from zoneinfo import ZoneInfo
+
+from src.main import Agendamento, PetFeederTech, PlanoRacao, Recorrencia
+
+# -------------------- SNAPSHOT E RESTAURAÇÃO --------------------
+
+# O estado de um alimentador é dividido em três grupos, capturados e
+# restaurados de forma independente:
+#   escalares  sensor, Wi-Fi, pet, plano, alertas e notificações pendentes
+#   agenda     agendamentos com id e próximo disparo, e a janela de checagem
+#   historico  (inicio, colunas em bytes) a partir do registro `inicio`
+# Um snapshot completo tem os três; um delta só o que mudou. Os arquivos são
+# pickles de tipos básicos: leia apenas arquivos gerados pelo próprio sistema.
+VERSAO = 1
+COLUNAS_HISTORICO = ("timestamps", "gramas", "pesos_restantes", "origens")
+
+def _escalares(feeder: PetFeederTech) -> dict:
+    return {
+        "sistema_ativo": feeder.sistema_ativo,
+        "peso": feeder.sensor.peso,
+        "wifi": feeder.wifi.conectado,
+        "peso_pet": feeder.peso_pet,
+        "raca_pet": feeder.raca_pet,
+        "fuso": feeder.fuso and feeder.fuso.key,
+        "plano": tuple(feeder.plano) if feeder.plano else None,
+        "alerta_critico_enviado": feeder.alerta_critico_enviado,
+        "dispensa_travada": feeder.dispensa_travada,
+        "alertado": feeder.alerta_preditivo.alertado,
+        "consumos": tuple(feeder.alerta_preditivo.consumos),
+        "pendentes": tuple(feeder.wifi.fila.pendentes()),
+    }
+
+def _agenda(feeder: PetFeederTech) -> tuple:
+    itens = [
+        (agendamento.id, agendamento.horario, agendamento.diario, agendamento.disparo,
+         agendamento.regra.para_dict() if agendamento.regra else None)
+        for agendamento in feeder.agendamentos
+    ]
+    return feeder.agendamentos.ultima_checagem, itens
+
+def _historico(feeder: PetFeederTech, inicio=0) -> tuple:
+    historico = feeder.historico_alimentacao
+    return inicio, tuple(getattr(historico, coluna)[inicio:].tobytes() for coluna in COLUNAS_HISTORICO)
+
+def _verificar_versao(versao):
+    if versao != VERSAO:
+        raise ValueError(f"Versão de snapshot não suportada: {versao}")
+
+def _aplicar(feeder: PetFeederTech, parcial: dict) -> None:
+    escalares = parcial.get("escalares")
+    if escalares is not None:
+        feeder.sistema_ativo = escalares["sistema_ativo"]
+        feeder.sensor.peso = escalares["peso"]
+        feeder.peso_pet = escalares["peso_pet"]
+        feeder.raca_pet = escalares["raca_pet"]
+        feeder.fuso = ZoneInfo(escalares["fuso"]) if escalares["fuso"] else None
+        feeder.agendamentos.fuso = feeder.fuso
+        feeder.plano = PlanoRacao(*escalares["plano"]) if escalares["plano"] else None
+        feeder.alerta_critico_enviado = escalares["alerta_critico_enviado"]
+        feeder.dispensa_travada = escalares["dispensa_travada"]
+        alerta = feeder.alerta_preditivo
+        alerta.alertado = escalares["alertado"]
+        alerta.consumos.clear()
+        if escalares["consumos"]:
+            alerta.consumos.extend(escalares["consumos"])
+        alerta.consumo_recente = sum(quantidade for _, quantidade in alerta.consumos)
+        # Conecta antes de recolocar as pendências, para que nada seja enviado na restauração.
+        if feeder.wifi.conectado != escalares["wifi"]:
+            feeder.wifi.conectado = escalares["wifi"]
+            feeder.wifi.fila.definir_conexao(escalares["wifi"])
+        if escalares["pendentes"]:
+            feeder.wifi.fila.restaurar(escalares["pendentes"])
+
+    agenda = parcial.get("agenda")
+    if agenda is not None:
+        ultima_checagem, itens = agenda
+        feeder.agendamentos.restaurar(
+            [Agendamento(id, horario, diario, disparo, Recorrencia.de_dict(regra) if regra else None)
+             for id, horario, diario, disparo, regra in itens],
+            ultima_checagem,
+        )
+
+    historico = parcial.get("historico")
+    if historico is not None:
+        inicio, colunas = historico
+        for nome, dados in zip(COLUNAS_HISTORICO, colunas):
+            coluna = getattr(feeder.historico_alimentacao, nome)
+            del coluna[inicio:]
+            coluna.frombytes(dados)
+
+def capturar(feeder: PetFeederTech) -> dict:
+    return {
+        "versao": VERSAO,
+        "escalares": _escalares(feeder),
+        "agenda": _agenda(feeder),
+        "historico": _historico(feeder),
+    }
+
+def restaurar(estado: dict, update_status_callback=None, feeder=None) -> PetFeederTech:
+    _verificar_versao(estado["versao"])
+    feeder = feeder or PetFeederTech(update_status_callback)
+    _aplicar(feeder, estado)
+    return feeder
+
+def clonar(feeder: PetFeederTech, update_status_callback=None) -> PetFeederTech:
+    return restaurar(capturar(feeder), update_status_callback)
+
+# ---- checkpoints incrementais de uma frota ----
+
+# O primeiro checkpoint é completo. Os seguintes levam, por alimentador, só os
+# grupos alterados: escalares por comparação, agenda por ouvinte (mais a
+# mudança do próximo disparo, que cobre os agendamentos já disparados) e o
+# histórico a partir do último registro gravado. Alimentadores sem mudança
+# ficam de fora.
+class Checkpoints:
+    def __init__(self, feeders, caminho=None):
+        self.feeders = list(getattr(feeders, "feeders", feeders))
+        self.caminho = caminho
+        self._escalares = [None] * len(self.feeders)
+        self._historico = [0] * len(self.feeders)
+        self._agenda = [None] * len(self.feeders)
+        self._agenda_alterada = [True] * len(self.feeders)
+        self._fim = None  # fim do último registro que este objeto sabe válido
+        for indice, feeder in enumerate(self.feeders):
+            feeder.ao_alterar_agenda(lambda indice=indice: self._marcar_agenda(indice))
+
+    def _marcar_agenda(self, indice):
+        self._agenda_alterada[indice] = True
+
+    def capturar(self, completo=False) -> dict:
+        alterados = {}
+        for indice, feeder in enumerate(self.feeders):
+            parcial = {}
+            escalares = _escalares(feeder)
+            if completo or escalares != self._escalares[indice]:
+                parcial["escalares"] = self._escalares[indice] = escalares
+            assinatura = (len(feeder.agendamentos), feeder.agendamentos.proximo_disparo())
+            if completo or self._agenda_alterada[indice] or assinatura != self._agenda[indice]:
+                parcial["agenda"] = _agenda(feeder)
+                self._agenda[indice] = assinatura
+                self._agenda_alterada[indice] = False
+            inicio = 0 if completo else self._historico[indice]
+            total = len(feeder.historico_alimentacao)
+            if completo or total != inicio:
+                parcial["historico"] = _historico(feeder, min(inicio, total))
+                self._historico[indice] = total
+            if parcial:
+                alterados[indice] = parcial
+        return {"versao": VERSAO, "completo": completo, "momento": time.time(), "feeders": alterados}
+
+    def gravar(self) -> int:
+        # Anexa um delta ao arquivo (o primeiro é sempre completo) e devolve
+        # quantos alimentadores mudaram. Um registro cortado no fim do arquivo
+        # é removido antes, senão tudo o que viesse depois ficaria ilegível;
+        # como o delta perdido não é recuperável, o próximo vai completo.
+        tamanho = os.path.getsize(self.caminho) if os.path.exists(self.caminho) else 0
+        if self._fim is None and tamanho:
+            self._fim = _fim_valido(self.caminho)
+        fim = self._fim or 0
+        completo = fim == 0 or tamanho != fim
+        checkpoint = self.capturar(completo)
+        with open(self.caminho, "r+b" if tamanho else "wb") as arquivo:
+            arquivo.truncate(fim)
+            arquivo.seek(fim)
+            pickle.dump(checkpoint, arquivo, pickle.HIGHEST_PROTOCOL)
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+            self._fim = arquivo.tell()
+        return len(checkpoint["feeders"])
+
+    def compactar(self) -> None:
+        # Substitui a cadeia de deltas por um único checkpoint completo.
+        temporario = f"{self.caminho}.tmp"
+        with open(temporario, "wb") as arquivo:
+            pickle.dump(self.capturar(completo=True), arquivo, pickle.HIGHEST_PROTOCOL)
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+            fim = arquivo.tell()
+        os.replace(temporario, self.caminho)
+        self._fim = fim
+
+def _fim_valido(caminho) -> int:
+    # Posição logo após o último checkpoint legível do arquivo.
+    fim = 0
+    with open(caminho, "rb") as arquivo:
+        while True:
+            try:
+                pickle.load(arquivo)
+            except (EOFError, pickle.UnpicklingError):
+                return fim
+            fim = arquivo.tell()
+
+def ler_checkpoints(caminho):
+    # Um registro final cortado (queda durante a gravação) encerra a leitura
+    # no último checkpoint completo, em vez de perder a frota inteira.
+    with open(caminho, "rb") as arquivo:
+        while True:
+            try:
+                yield pickle.load(arquivo)
+            except (EOFError, pickle.UnpicklingError):
+                return
+
+def restaurar_frota(checkpoints, update_status_callback=None) -> list:
+    # Só objetos novos e vivos são criados aqui; pausar o coletor cíclico
+    # evita varreduras repetidas de uma geração que só cresce.
+    feeders = {}
+    coletor = gc.isenabled()
+    gc.disable()
+    try:
+        for checkpoint in checkpoints:
+            _verificar_versao(checkpoint["versao"])
+            if checkpoint["completo"]:
+                feeders = {}
+            for indice, parcial in checkpoint["feeders"].items():
+                feeder = feeders.get(indice)
+                if feeder is None:
+                    feeder = feeders[indice] = PetFeederTech(update_status_callback)
+                _aplicar(feeder, parcial)
+    finally:
+        if coletor:
+            gc.enable()
+    return [feeders[indice] for indice in sorted(feeders)]
+
+# -------------------- BENCHMARK --------------------
+
+def medir_restauracao(quantidade=10_000):
+    import tempfile
+    from datetime import time as dtime
+
+    from src.frota import Frota
+
+    frota = Frota.criar(quantidade, update_status_callback=lambda mensagem: None)
+    frota.ligar()
+    for indice, feeder in enumerate(frota.feeders):
+        feeder.agendar_alimentacao(dtime(7, indice % 60), diario=True)
+        feeder.agendar_alimentacao(dtime(19, 0), diario=True)
+        for _ in range(10):
+            feeder.historico_alimentacao.registrar(1.7e9 + indice, 50, 900, 1)
+    with tempfile.TemporaryDirectory() as pasta:
+        checkpoints = Checkpoints(frota, os.path.join(pasta, "frota.ckpt"))
+        checkpoints.gravar()
+        frota[0].alimentar()
+        checkpoints.gravar()
+        inicio = time.perf_counter()
+        restaurados = restaurar_frota(ler_checkpoints(checkpoints.caminho))
+        duracao = time.perf_counter() - inicio
+    assert len(restaurados) == quantidade
+    return duracao
+
+if __name__ == "__main__":
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    print(f"{quantidade} alimentadores restaurados em {medir_restauracao(quantidade):.3f} s")
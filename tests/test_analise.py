@@ -0,0 +1,90 @@
+import unittest
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from src.main import ORIGEM_AGENDADA, HistoricoAlimentacao, PetFeederTech
+
+@unittest.skipIf(np is None, "numpy não instalado")
+class TestAnalise(unittest.TestCase):
+    def setUp(self):
+        from src import analise
+        self.analise = analise
+        self.inicio = datetime(2025, 5, 5, 8, 0)  # segunda-feira
+        self.historico = HistoricoAlimentacao()
+        for dia in range(10):
+            for hora in (0, 10):
+                quando = self.inicio + timedelta(days=dia, hours=hora)
+                self.historico.registrar(quando.timestamp(), 50, 500, ORIGEM_AGENDADA)
+
+    def test_consumo_diario_e_semanal(self):
+        dias, gramas = self.analise.consumo_diario(self.historico, deslocamento=self.deslocamento())
+        self.assertEqual(str(dias[0]), "2025-05-05")
+        self.assertEqual(gramas.tolist(), [100.0] * 10)
+        semanas, gramas = self.analise.consumo_semanal(self.historico, deslocamento=self.deslocamento())
+        self.assertEqual([str(semana) for semana in semanas], ["2025-05-05", "2025-05-12"])
+        self.assertEqual(gramas.tolist(), [700.0, 300.0])
+
+    def test_histograma_e_intervalos(self):
+        histograma = self.analise.histograma_horario(self.historico, deslocamento=self.deslocamento())
+        self.assertEqual(histograma[8], 500)
+        self.assertEqual(histograma[18], 500)
+        estatisticas = self.analise.estatisticas_intervalos(self.historico)
+        self.assertEqual(estatisticas["quantidade"], 19)
+        self.assertEqual(estatisticas["minimo"], 10 * 3600)
+
+    def test_soma_movel_e_previsao(self):
+        moveis = self.analise.soma_movel(self.historico, 24 * 3600)
+        self.assertEqual(moveis[-1], 100)
+        agora = self.historico.timestamps[-1]
+        previsao = self.analise.previsao_esvaziamento(self.historico, 750, agora=agora)
+        self.assertAlmostEqual(previsao - agora, 7 * 86400)
+
+    def test_analise_em_lote(self):
+        feeders = [PetFeederTech(lambda mensagem: None) for _ in range(3)]
+        feeders[0].historico_alimentacao = self.historico
+        eixo, matriz = self.analise.consumo_diario_frota(feeders, deslocamento=self.deslocamento())
+        self.assertEqual(matriz.shape, (3, 10))
+        self.assertEqual(matriz[0].sum(), 1000)
+        self.assertEqual(matriz[1:].sum(), 0)
+        previsoes = self.analise.previsao_esvaziamento_frota(feeders, agora=self.historico.timestamps[-1])
+        self.assertTrue(np.isfinite(previsoes[0]))
+        self.assertTrue(np.isinf(previsoes[1:]).all())
+
+    def test_analise_em_lote_usa_o_fuso_de_cada_alimentador(self):
+        feeders = [PetFeederTech(lambda mensagem: None) for _ in range(2)]
+        for feeder, nome in zip(feeders, ("Asia/Tokyo", "America/Sao_Paulo")):
+            feeder.configurar_fuso(nome)
+            fuso = ZoneInfo(nome)
+            for dia in (5, 6):
+                quando = datetime(2025, 5, dia, 23, 30, tzinfo=fuso)
+                feeder.historico_alimentacao.registrar(quando.timestamp(), 40, 500, ORIGEM_AGENDADA)
+        eixo, matriz = self.analise.consumo_diario_frota(feeders)
+        self.assertEqual([str(dia) for dia in eixo], ["2025-05-05", "2025-05-06"])
+        self.assertEqual(matriz.tolist(), [[40.0, 40.0], [40.0, 40.0]])
+        vazio = self.analise.consumo_diario_frota([PetFeederTech(lambda mensagem: None)])
+        self.assertEqual(vazio[1].shape, (1, 0))
+
+    def test_mudanca_de_horario_nao_desloca_os_periodos(self):
+        fuso = ZoneInfo("America/New_York")
+        historico = HistoricoAlimentacao()
+        for dia in range(5, 14):  # o horário de verão começa em 9/3/2025
+            historico.registrar(datetime(2025, 3, dia, 8, 0, tzinfo=fuso).timestamp(), 50, 500, ORIGEM_AGENDADA)
+            historico.registrar(datetime(2025, 3, dia, 23, 30, tzinfo=fuso).timestamp(), 30, 500, ORIGEM_AGENDADA)
+        histograma = self.analise.histograma_horario(historico, deslocamento=fuso)
+        self.assertEqual((histograma[8], histograma[23]), (450, 270))
+        dias, gramas = self.analise.consumo_diario(historico, deslocamento=fuso)
+        self.assertEqual((str(dias[0]), str(dias[-1])), ("2025-03-05", "2025-03-13"))
+        self.assertEqual(gramas.tolist(), [80.0] * 9)
+        semanas, gramas = self.analise.consumo_semanal(historico, deslocamento=fuso)
+        self.assertEqual(gramas.tolist(), [400.0, 320.0])
+
+    def deslocamento(self):
+        return int(self.inicio.astimezone().utcoffset().total_seconds())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,19 @@
+import unittest
+from benchmarks.bench_petfeedertech import BENCHMARKS, comparar, executar
+
+class TestBenchmarks(unittest.TestCase):
+    def test_executa_em_escala_reduzida(self):
+        selecionados = ["agenda_insercao", "agendar_alimentacao", "historico_anexar", "simulacao_semana_frota"]
+        resultado = executar(escala=0.001, selecionados=selecionados, repeticoes=2)
+        self.assertEqual(set(resultado["resultados"]), set(selecionados))
+        self.assertTrue(all(item["valor"] >= 0 for item in resultado["resultados"].values()))
+        self.assertIn("memoria_por_feeder", BENCHMARKS)
+
+    def test_comparar_detecta_regressao(self):
+        referencia = {"resultados": {"alimentar": {"valor": 10.0}, "tick": {"valor": 2.0}}}
+        atual = {"resultados": {"alimentar": {"valor": 16.0}, "tick": {"valor": 2.5}, "novo": {"valor": 1.0}}}
+        regressoes = comparar(atual, referencia, tolerancia=0.5)
+        self.assertEqual([nome for nome, *_ in regressoes], ["alimentar"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+from datetime import datetime, time, timedelta
+from src.frota import Frota
+from src.main import RTC, UTC, RelogioSimulado, TimerSimulado
+
+class TestFrota(unittest.TestCase):
+    def setUp(self):
+        self.frota = Frota.criar(5, update_status_callback=lambda mensagem: None)
+        self.frota.ligar()
+        self.inicio = datetime.now().replace(microsecond=0) + timedelta(minutes=5)
+
+    def agendar(self, indice, segundos):
+        return self.frota[indice].agendar_alimentacao((self.inicio + timedelta(seconds=segundos)).time())
+
+    def test_tick_so_dispara_alimentadores_vencidos(self):
+        self.agendar(1, 0)
+        self.agendar(3, 10)
+        self.assertEqual(self.frota.proximo_disparo(), self.inicio)
+        self.assertEqual(self.frota.tick(self.inicio), 1)
+        pesos = [feeder.sensor.medir_peso() for feeder in self.frota.feeders]
+        self.assertEqual(pesos, [1000, 950, 1000, 1000, 1000])
+        self.assertEqual(self.frota.proximo_disparo(), self.inicio + timedelta(seconds=10))
+
+    def test_cancelar_remove_da_roda(self):
+        agendamento = self.agendar(2, 0)
+        self.frota[2].cancelar_agendamento(agendamento)
+        self.assertIsNone(self.frota.proximo_disparo())
+        self.assertEqual(self.frota.tick(self.inicio), 0)
+
+    def test_operacoes_em_lote(self):
+        self.frota.alimentar([0, 4])
+        self.frota.configurar_pet(8, "Beagle", selecao=range(3))
+        pesos = self.frota.verificar_peso([0, 1, 4])
+        self.assertEqual(pesos, {0: 950, 1: 1000, 4: 950})
+        self.assertEqual([feeder.raca_pet for feeder in self.frota.feeders], ["Beagle"] * 3 + [""] * 2)
+
+    def test_semana_simulada_em_timer_compartilhado(self):
+        relogio = RelogioSimulado(datetime(2025, 6, 2, 0, 0))
+        RTC().usar_relogio(relogio)
+        self.addCleanup(RTC().restaurar)
+        frota = Frota.criar(500, update_status_callback=lambda mensagem: None)
+        frota.ligar()
+        for indice, feeder in enumerate(frota.feeders):
+            feeder.sensor.peso = 10_000
+            feeder.agendar_alimentacao(time(7, indice % 60), diario=True)
+            feeder.agendar_alimentacao(time(18, 0), diario=True)
+        frota.iniciar(TimerSimulado(relogio))
+        relogio.executar_ate(datetime(2025, 6, 8, 23, 59))
+        self.assertEqual({len(feeder.historico_alimentacao) for feeder in frota.feeders}, {14})
+
+    def test_linha_do_tempo_utc_com_fusos_diferentes(self):
+        relogio = RelogioSimulado(datetime(2025, 6, 2, 0, 0, tzinfo=UTC))
+        RTC().usar_relogio(relogio)
+        self.addCleanup(RTC().restaurar)
+        frota = Frota.criar(3, update_status_callback=lambda mensagem: None)
+        frota.ligar()
+        ordem = []
+        for indice, fuso in enumerate(("America/Sao_Paulo", "Asia/Tokyo", "Europe/Lisbon")):
+            frota[indice].configurar_fuso(fuso)
+            frota[indice].agendar_alimentacao(time(8, 0), diario=True)
+            frota[indice].ao_alimentar(lambda registro, fuso=fuso: ordem.append(fuso))
+        frota.iniciar(TimerSimulado(relogio))
+        relogio.executar_ate(datetime(2025, 6, 3, 12, 0, tzinfo=UTC))
+        # 08:00 em Tóquio é 23:00 UTC do dia anterior; em Lisboa, 07:00 UTC; em São Paulo, 11:00 UTC.
+        self.assertEqual(ordem, ["Europe/Lisbon", "America/Sao_Paulo", "Asia/Tokyo", "Europe/Lisbon", "America/Sao_Paulo"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import io
+import os
+import tempfile
+import unittest
+from datetime import date, time, timedelta
+from src import intercambio
+from src.frota import Frota
+from src.main import Recorrencia
+
+class TestIntercambio(unittest.TestCase):
+    def setUp(self):
+        self.mensagens = []
+        self.origem = Frota.criar(3, update_status_callback=self.mensagens.append)
+        self.origem.ligar()
+        self.origem[0].agendar_alimentacao(time(7, 30), diario=True)
+        self.origem[0].agendar_alimentacao(time(23, 59))
+        self.origem[1].agendar_alimentacao(regra=Recorrencia.intervalo(
+            time(6, 0), time(22, 0), timedelta(hours=4), dias=[0, 2], porcao=30,
+            data_inicio=date(2025, 1, 1), data_fim=date(2026, 12, 31)))
+        self.origem[2].configurar_pet(7.5, "Poodle")
+
+    def agendas(self, frota):
+        return [sorted((str(agendamento.regra), agendamento.porcao) for agendamento in feeder.agendamentos)
+                for feeder in frota.feeders]
+
+    def test_formatos_equivalentes_e_ida_e_volta(self):
+        lote = intercambio.exportar(self.origem)
+        self.assertEqual(len(lote), 2 + 5 + 1)
+        lidos = []
+        for escrever, ler, arquivo in ((intercambio.escrever_csv, intercambio.ler_csv, io.StringIO()),
+                                       (intercambio.escrever_jsonl, intercambio.ler_jsonl, io.StringIO()),
+                                       (intercambio.escrever_binario, intercambio.ler_binario, io.BytesIO())):
+            escrever(lote, arquivo)
+            arquivo.seek(0)
+            lidos.append(ler(arquivo))
+        for lido in lidos:
+            self.assertEqual(lido.agenda, lote.agenda)
+            self.assertEqual(lido.pets, lote.pets)
+            self.assertEqual(lido.racas, ["Poodle"])
+
+        destino = Frota.criar(3, update_status_callback=lambda mensagem: None)
+        destino.ligar()
+        self.assertEqual(intercambio.aplicar(lidos[2], destino), 3)
+        self.assertEqual(self.agendas(destino)[1], self.agendas(self.origem)[1])
+        self.assertEqual(len(destino[0].agendamentos), 2)
+        self.assertEqual((destino[2].peso_pet, destino[2].raca_pet), (7.5, "Poodle"))
+        self.assertEqual(destino[2].plano, self.origem[2].plano)
+
+    def test_aplicacao_em_lote_com_uma_mensagem(self):
+        lote = intercambio.Lote()
+        for minuto in range(0, 1440, 5):
+            lote.adicionar_agendamento(0, minuto)
+            lote.adicionar_agendamento(0, minuto)
+        lote.adicionar_pet(0, 12, "Beagle")
+        alteracoes = []
+        self.origem[0].ao_alterar_agenda(lambda: alteracoes.append(1))
+        del self.mensagens[:]
+        self.assertEqual(intercambio.aplicar(lote, self.origem), 1)
+        self.assertEqual(self.mensagens, ["1 agendamentos importados | Pet: Beagle com 12.0kg"])
+        self.assertEqual(alteracoes, [1])
+        # 07:30 já existia como agendamento diário.
+        self.assertEqual(len(self.origem[0].agendamentos.buscar(3).regra.horarios), 287)
+
+    def test_validacao_aponta_a_linha(self):
+        arquivo = io.StringIO("alimentador,horario,dias,inicio,fim,porcao,peso,raca\n0,07:30,seg,,,,,\n0,7h30,,,,,,\n")
+        with self.assertRaisesRegex(ValueError, "Linha 3"):
+            intercambio.ler_csv(arquivo)
+        for horario in ("10:75", "12:-5", "24:00"):
+            with self.assertRaisesRegex(ValueError, "Linha 1: Horário inválido"):
+                intercambio.ler_jsonl(io.StringIO(f'{{"alimentador": 0, "horario": "{horario}"}}\n'))
+        binario = io.BytesIO()
+        intercambio.escrever_binario(intercambio.exportar(self.origem), binario)
+        for tamanho in (len(intercambio.MAGICO) + 3, len(binario.getvalue()) - 2):
+            with self.assertRaisesRegex(ValueError, "truncado"):
+                intercambio.ler_binario(io.BytesIO(binario.getvalue()[:tamanho]))
+        lote = intercambio.Lote()
+        lote.adicionar_agendamento(0, 60)
+        lote.adicionar_agendamento(0, 1500)
+        with self.assertRaisesRegex(ValueError, "^Agendamento 1: Horário fora do dia"):
+            intercambio.aplicar(lote, self.origem)
+        lote = intercambio.Lote()
+        lote.adicionar_agendamento(5, 60)
+        with self.assertRaisesRegex(ValueError, "^Agendamento 0: Alimentador inexistente"):
+            intercambio.aplicar(lote, self.origem)
+        lote = intercambio.Lote()
+        lote.adicionar_pet(0, 12.0, "Beagle")
+        lote.adicionar_pet(0, 0.0, "Beagle")
+        with self.assertRaisesRegex(ValueError, "^Pet 1: Peso do pet inválido"):
+            intercambio.aplicar(lote, self.origem)
+
+    def test_arquivo_por_extensao(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, "agenda.bin")
+            intercambio.escrever(intercambio.exportar(self.origem), caminho)
+            self.assertEqual(intercambio.ler(caminho).agenda, intercambio.exportar(self.origem).agenda)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, time, timedelta
+from src.main import ORIGEM_AGENDADA, PetFeederTech, Recorrencia
+from src.persistencia import ArmazenamentoSQLite
+
+class TestArmazenamentoSQLite(unittest.TestCase):
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.caminho = os.path.join(self.diretorio.name, "feeder.db")
+
+    def tearDown(self):
+        self.diretorio.cleanup()
+
+    def novo_feeder(self):
+        return PetFeederTech(lambda mensagem: None)
+
+    def test_recarrega_estado_apos_reinicio(self):
+        armazenamento = ArmazenamentoSQLite(self.caminho)
+        feeder = armazenamento.vincular(self.novo_feeder())
+        feeder.ligar()
+        feeder.configurar_pet(7.5, "Poodle")
+        feeder.agendar_alimentacao(time(8, 0), diario=True)
+        feeder.agendar_alimentacao(time(18, 30))
+        feeder.alimentar()
+        feeder.alimentar(ORIGEM_AGENDADA)
+        armazenamento.fechar()
+
+        armazenamento = ArmazenamentoSQLite(self.caminho)
+        restaurado = armazenamento.carregar(self.novo_feeder())
+        armazenamento.fechar()
+        self.assertEqual((restaurado.peso_pet, restaurado.raca_pet), (7.5, "Poodle"))
+        self.assertEqual(restaurado.sensor.medir_peso(), feeder.sensor.medir_peso())
+        self.assertEqual(restaurado.plano, feeder.plano)
+        self.assertEqual(list(restaurado.historico_alimentacao), list(feeder.historico_alimentacao))
+        self.assertEqual(sorted(tuple(item) for item in restaurado.agendamentos),
+                         [(time(8, 0), True), (time(18, 30), False)])
+
+    def test_disparo_unico_e_reabastecimento_persistem(self):
+        armazenamento = ArmazenamentoSQLite(self.caminho)
+        feeder = armazenamento.vincular(self.novo_feeder())
+        feeder.ligar()
+        agora = datetime.now().replace(second=0, microsecond=0)
+        agendamento = feeder.agendar_alimentacao((agora + timedelta(hours=1)).time())
+        diario = (agora + timedelta(hours=2)).time()
+        feeder.agendar_alimentacao(diario, diario=True)
+        feeder.checar_agendamentos(agendamento.disparo)
+        feeder.reabastecer(500)
+        armazenamento.fechar()
+
+        armazenamento = ArmazenamentoSQLite(self.caminho)
+        restaurado = armazenamento.carregar(self.novo_feeder())
+        armazenamento.fechar()
+        self.assertEqual([tuple(item) for item in restaurado.agendamentos], [(diario, True)])
+        self.assertEqual(restaurado.sensor.medir_peso(), 1450)
+
+    def test_compacta_blocos_do_historico(self):
+        armazenamento = ArmazenamentoSQLite(self.caminho, intervalo_gravacao=0)
+        feeder = armazenamento.vincular(self.novo_feeder())
+        feeder.ligar()
+        for _ in range(ArmazenamentoSQLite.MAX_BLOCOS + 5):
+            feeder.sensor.peso = 1000
+            feeder.alimentar()
+            armazenamento.sincronizar()
+        armazenamento.carregar(self.novo_feeder())
+        armazenamento.sincronizar()
+        blocos = armazenamento._conexao.execute("SELECT COUNT(*) FROM historico").fetchone()[0]
+        armazenamento.fechar()
+        self.assertEqual(blocos, 1)
+
+    def test_recarrega_regras_de_recorrencia(self):
+        armazenamento = ArmazenamentoSQLite(self.caminho)
+        feeder = armazenamento.vincular(self.novo_feeder())
+        feeder.ligar()
+        feeder.configurar_fuso("America/Sao_Paulo")
+        regra = Recorrencia([time(7, 0), time(12, 0)], dias=[0, 2, 4], porcao=30)
+        feeder.agendar_alimentacao(regra=regra)
+        armazenamento.fechar()
+
+        armazenamento = ArmazenamentoSQLite(self.caminho)
+        restaurado = armazenamento.carregar(self.novo_feeder())
+        armazenamento.fechar()
+        (agendamento,) = list(restaurado.agendamentos)
+        self.assertEqual(agendamento.regra.para_dict(), regra.para_dict())
+        self.assertEqual(agendamento.porcao, 30)
+        self.assertEqual(restaurado.fuso.key, "America/Sao_Paulo")
+        self.assertEqual(agendamento.disparo, feeder.agendamentos.proximo_disparo())
+
+if __name__ == "__main__":
+    unittest.main()
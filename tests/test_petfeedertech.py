@@ -1,6 +1,24 @@
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time as relogio
 import unittest
-from datetime import datetime, timedelta
-from src.main import PetFeederTech
+from datetime import date, datetime, time, timedelta
+from src.main import (
+    ORIGEM_AGENDADA, ORIGEM_APP, PORCAO_MINIMA, Agenda, Agendador, AmostradorPeso, AtualizadorTela, BufferCircular, ControladorDispensa,
+    FilaNotificacoes, GeradorSinalSintetico, HistogramaLatencia, HistoricoAlimentacao, Metricas,
+    Motor, MotorSimulado, PetFeederTech, PlanejadorPorcoes, REGISTRO_WIFI, RTC, Recorrencia, RegistroJSON,
+    RelogioSimulado, RuntimeHeadless, TimerAsyncio, TimerSimulado, TransporteLoopback, UTC, ZoneInfo, fator_raca,
+    instrumentar, racao_diaria, transicoes_fuso,
+)
 
 class TestPetFeederTech(unittest.TestCase):
     def setUp(self):
@@ -19,6 +37,14 @@ class TestPetFeederTech(unittest.TestCase):
         peso_final = self.feeder.sensor.medir_peso()
         self.assertEqual(peso_final, peso_inicial - 50)
 
+    def test_alimentar_registra_historico(self):
+        self.feeder.ligar()
+        self.feeder.alimentar(ORIGEM_APP)
+        registro = self.feeder.historico_alimentacao[-1]
+        self.assertEqual(len(self.feeder.historico_alimentacao), 1)
+        self.assertEqual((registro.gramas, registro.peso_restante, registro.origem), (50, 950, ORIGEM_APP))
+        self.assertIn("Ração liberada (50g, app)", str(registro))
+
     def test_nao_alimentar_com_pouca_racao(self):
         self.feeder.ligar()
         self.feeder.sensor.peso = 10  # Força pouca ração
@@ -48,5 +74,640 @@ class TestPetFeederTech(unittest.TestCase):
         self.feeder.verificar_peso()
         self.assertLess(self.feeder.sensor.medir_peso(), 200)  # Deve ativar alerta
 
+class TestAgenda(unittest.TestCase):
+    def setUp(self):
+        self.agenda = Agenda()
+        self.inicio = datetime(2025, 5, 10, 8, 0, 0)
+
+    def test_proximo_disparo(self):
+        self.agenda.adicionar(time(12, 0), False, self.inicio)
+        self.agenda.adicionar(time(9, 30), True, self.inicio)
+        self.agenda.adicionar(time(7, 0), False, self.inicio)
+        self.assertEqual(self.agenda.proximo_disparo(), datetime(2025, 5, 10, 9, 30))
+
+    def test_vencidos_remove_unico_e_reagenda_diario(self):
+        self.agenda.adicionar(time(9, 0), False, self.inicio)
+        self.agenda.adicionar(time(9, 0), True, self.inicio)
+        self.assertEqual(self.agenda.vencidos(datetime(2025, 5, 10, 8, 59, 59)), [])
+        disparados = self.agenda.vencidos(datetime(2025, 5, 10, 9, 0, 0))
+        self.assertEqual(len(disparados), 2)
+        self.assertEqual(len(self.agenda), 1)
+        self.assertEqual(self.agenda.proximo_disparo(), datetime(2025, 5, 11, 9, 0))
+
+    def test_vencidos_recupera_atraso_sem_disparo_duplo(self):
+        self.agenda.adicionar(time(9, 0), True, self.inicio)
+        self.agenda.vencidos(datetime(2025, 5, 10, 8, 59, 59))
+        self.assertEqual(len(self.agenda.vencidos(datetime(2025, 5, 10, 9, 0, 3))), 1)
+        self.assertEqual(self.agenda.vencidos(datetime(2025, 5, 10, 9, 0, 4)), [])
+
+    def test_reiniciar_janela_descarta_perdidos(self):
+        self.agenda.adicionar(time(9, 0), False, self.inicio)
+        self.agenda.reiniciar_janela(datetime(2025, 5, 10, 10, 0))
+        self.assertEqual(self.agenda.vencidos(datetime(2025, 5, 10, 10, 0, 1)), [])
+        self.assertEqual(self.agenda.proximo_disparo(), datetime(2025, 5, 11, 9, 0))
+
+    def test_disparos_ate_mantido_a_cada_alteracao(self):
+        def recontado(limite):
+            self.agenda._contagem = None
+            return self.agenda.disparos_ate(limite)
+
+        agora = self.inicio
+        self.assertEqual(self.agenda.disparos_ate(agora + timedelta(days=1)), 0)
+        unico = self.agenda.adicionar(time(9, 0), False, agora)
+        self.agenda.adicionar(time(7, 0), True, agora)
+        self.agenda.adicionar_regra(Recorrencia([time(8, 0), time(20, 0)], dias=[5, 6]), agora)
+        self.agenda.importar([Recorrencia([time(12, 0)])], agora)
+        for minutos in (0, 30, 90, 600, 1440, 2000):
+            momento = agora + timedelta(minutes=minutos)
+            self.agenda.vencidos(momento)
+            if minutos == 30:
+                self.agenda.remover(unico)
+            limite = momento + timedelta(days=1)
+            esperado = self.agenda.disparos_ate(limite)
+            self.assertEqual(esperado, recontado(limite))
+
+    def test_remover(self):
+        agendamento = self.agenda.adicionar(time(9, 0), False, self.inicio)
+        self.assertTrue(self.agenda.remover(agendamento))
+        self.assertEqual(len(self.agenda), 0)
+        self.assertIsNone(self.agenda.proximo_disparo())
+
+    def test_checar_agendamentos_alimenta_no_horario(self):
+        feeder = PetFeederTech()
+        feeder.ligar()
+        horario = (datetime.now() + timedelta(hours=1)).replace(second=0, microsecond=0)
+        feeder.agendar_alimentacao(horario.time(), diario=False)
+        feeder.rtc = type("RTCFixo", (), {"agora": lambda self: horario})()
+        feeder.checar_agendamentos()
+        self.assertEqual(feeder.sensor.medir_peso(), 950)
+        self.assertEqual(len(feeder.agendamentos), 0)
+
+class TestRecorrencia(unittest.TestCase):
+    # 03/03/2025 é uma segunda-feira.
+    def setUp(self):
+        self.regra = Recorrencia.intervalo(time(6, 0), time(22, 0), timedelta(hours=4), dias=[0, 2])
+
+    def test_intervalo_com_dias_da_semana(self):
+        self.assertEqual(len(self.regra.horarios), 5)
+        self.assertEqual(self.regra.proximo(datetime(2025, 3, 2, 23, 0)), datetime(2025, 3, 3, 6, 0))
+        self.assertEqual(self.regra.proximo(datetime(2025, 3, 3, 10, 0)), datetime(2025, 3, 3, 10, 0))
+        self.assertEqual(self.regra.proximo(datetime(2025, 3, 3, 22, 30)), datetime(2025, 3, 5, 6, 0))
+
+    def test_periodo_e_contagem(self):
+        regra = Recorrencia([time(8, 0), time(20, 0)], data_inicio=date(2025, 3, 4), data_fim=date(2025, 3, 6))
+        ocorrencias = list(regra.ocorrencias(datetime(2025, 3, 1)))
+        self.assertEqual(len(ocorrencias), 6)
+        self.assertEqual(ocorrencias[0], datetime(2025, 3, 4, 8, 0))
+        self.assertIsNone(regra.proximo(datetime(2025, 3, 6, 21, 0)))
+        desde, limite = datetime(2025, 3, 3, 7, 0), datetime(2025, 3, 12, 9, 0)
+        esperado = sum(1 for _ in itertools.takewhile(lambda momento: momento <= limite, self.regra.ocorrencias(desde)))
+        self.assertEqual(self.regra.contar(desde, limite), esperado)
+
+    def test_dicionario_ida_e_volta(self):
+        dados = {"intervalo": ["06:00", "22:00", 240], "dias": ["seg", "qua"], "porcao": 30}
+        regra = Recorrencia.de_dict(dados)
+        self.assertEqual(Recorrencia.de_dict(regra.para_dict()).para_dict(), regra.para_dict())
+        self.assertEqual(regra.para_dict()["horarios"], ["06:00", "10:00", "14:00", "18:00", "22:00"])
+
+    def test_importacao_funde_e_descarta_horarios_repetidos(self):
+        agenda = Agenda()
+        agora = datetime(2025, 3, 3, 0, 0)
+        agenda.adicionar(time(6, 0), True, agora)
+        regras = [Recorrencia([time(6, 0), time(12, 0)]), Recorrencia([time(12, 0), time(18, 0)]),
+                  Recorrencia([time(12, 0)], dias=[5, 6])]
+        regras += [Recorrencia([time(12, 0)], dias=[5, 6]) for _ in range(1000)]
+        novos = agenda.importar(regras, agora)
+        # 12:00 de sábado e domingo já está na regra de todos os dias.
+        self.assertEqual([agendamento.regra.horarios for agendamento in novos], [(time(12, 0), time(18, 0))])
+        self.assertEqual(len(agenda), 2)
+        self.assertEqual(agenda.importar(regras, agora), [])
+        self.assertEqual(agenda.disparos_ate(datetime(2025, 3, 3, 23, 59)), 3)
+        self.assertEqual(agenda.disparos_ate(datetime(2025, 3, 8, 23, 59)), 18)
+
+        # Mesmos dias, porção diferente: não é duplicata.
+        novos = agenda.importar([Recorrencia([time(12, 0)], dias=[5], porcao=80)], agora)
+        self.assertEqual(len(novos), 1)
+
+    def test_disparos_da_regra_com_porcao_propria(self):
+        relogio = RelogioSimulado(datetime(2025, 3, 3, 0, 0))
+        RTC().usar_relogio(relogio)
+        self.addCleanup(RTC().restaurar)
+        feeder = PetFeederTech(lambda mensagem: None)
+        feeder.ligar()
+        feeder.sensor.peso = 10_000
+        Agendador(feeder, TimerSimulado(relogio))
+        feeder.agendar_alimentacao(regra=Recorrencia.intervalo(time(6, 0), time(22, 0), timedelta(hours=4),
+                                                               dias=[0, 2], porcao=30))
+        relogio.executar_ate(datetime(2025, 3, 9, 23, 59))
+        historico = feeder.historico_alimentacao
+        self.assertEqual(len(historico), 10)
+        self.assertEqual(str(historico[5])[:16], "05/03/2025 06:00")
+        self.assertEqual(feeder.sensor.medir_peso(), 10_000 - 10 * 30)
+
+class TestFusoHorario(unittest.TestCase):
+    def setUp(self):
+        self.fuso = ZoneInfo("America/New_York")
+
+    def simular(self, horario, inicio, fim):
+        relogio = RelogioSimulado(inicio)
+        RTC().usar_relogio(relogio)
+        self.addCleanup(RTC().restaurar)
+        feeder = PetFeederTech(lambda mensagem: None)
+        feeder.configurar_fuso("America/New_York")
+        feeder.ligar()
+        feeder.sensor.peso = 10_000
+        Agendador(feeder, TimerSimulado(relogio))
+        feeder.agendar_alimentacao(horario, diario=True)
+        relogio.executar_ate(fim)
+        return [datetime.fromtimestamp(registro.timestamp, self.fuso).strftime("%d %H:%M %Z")
+                for registro in feeder.historico_alimentacao]
+
+    def test_tabela_de_transicoes(self):
+        self.assertEqual(transicoes_fuso(self.fuso, 2025), (
+            datetime(2025, 3, 9, 7, tzinfo=UTC).timestamp(), datetime(2025, 11, 2, 6, tzinfo=UTC).timestamp()))
+
+    def test_horario_no_buraco_do_horario_de_verao(self):
+        disparos = self.simular(time(2, 30), datetime(2025, 3, 8, tzinfo=UTC), datetime(2025, 3, 10, 12, tzinfo=UTC))
+        self.assertEqual(disparos, ["08 02:30 EST", "09 03:30 EDT", "10 02:30 EDT"])
+
+    def test_horario_repetido_no_fim_do_horario_de_verao(self):
+        disparos = self.simular(time(1, 30), datetime(2025, 11, 1, tzinfo=UTC), datetime(2025, 11, 3, 12, tzinfo=UTC))
+        self.assertEqual(disparos, ["01 01:30 EDT", "02 01:30 EDT", "03 01:30 EST"])
+
+class TestHistoricoAlimentacao(unittest.TestCase):
+    def test_registros_compactos(self):
+        historico = HistoricoAlimentacao()
+        inicio = datetime(2025, 5, 10, 8, 0).timestamp()
+        for n in range(5):
+            historico.registrar(inicio + n * 3600, 50, 1000 - 50 * (n + 1), ORIGEM_AGENDADA)
+        self.assertEqual(len(historico), 5)
+        self.assertEqual([registro.peso_restante for registro in historico[1:3]], [900, 850])
+        self.assertEqual(historico.timestamps.itemsize * len(historico.timestamps), 40)
+        self.assertEqual(str(historico[0]), "10/05/2025 08:00:00 - Ração liberada (50g, agendada)")
+
+    def test_paginacao_e_busca_por_data(self):
+        historico = HistoricoAlimentacao()
+        inicio = datetime(2025, 1, 1, 8, 0)
+        for dia in range(100):
+            historico.registrar((inicio + timedelta(days=dia)).timestamp(), 50, 500, ORIGEM_AGENDADA)
+        indice = historico.indice_por_data(datetime(2025, 2, 1).timestamp())
+        self.assertEqual(indice, 31)
+        pagina = historico.pagina(indice, 3)
+        self.assertEqual(len(pagina), 3)
+        self.assertTrue(pagina[0].startswith("01/02/2025 08:00:00"))
+        self.assertEqual(historico.pagina(98, 10)[-1][:10], "10/04/2025")
+
+class TestAlertaPreditivo(unittest.TestCase):
+    def setUp(self):
+        self.alertas = []
+        self.feeder = PetFeederTech(lambda mensagem: None)
+        self.feeder.ligar()
+        self.feeder.conectar_wifi()
+        self.feeder.set_alerta_callback(self.alertas.append)
+
+    def test_alerta_antes_de_faltar_para_agendamentos(self):
+        self.feeder.sensor.peso = 250
+        for minutos in (30, 60, 90):
+            self.feeder.agendar_alimentacao((datetime.now() + timedelta(minutes=minutos)).time(), diario=True)
+        self.assertEqual(self.alertas, [])
+        self.feeder.alimentar()
+        self.assertEqual(self.alertas, ["Ração deve acabar em cerca de 24h. Reabasteça!"])
+        self.feeder.alimentar()
+        self.assertEqual(len(self.alertas), 1)
+
+    def test_alerta_critico_uma_vez_ate_reabastecer(self):
+        self.feeder.sensor.peso = 40
+        for _ in range(5):
+            self.feeder.alimentar()
+        self.assertEqual(self.alertas.count("Nível de ração crítico!"), 1)
+        self.feeder.reabastecer(5)
+        self.feeder.alimentar()
+        self.assertEqual(self.alertas.count("Nível de ração crítico!"), 2)
+
+class TestFilaNotificacoes(unittest.TestCase):
+    def test_retem_offline_e_envia_ao_conectar(self):
+        transporte = TransporteLoopback()
+        fila = FilaNotificacoes(transporte, tamanho_lote=2)
+        for mensagem in ("baixo", "crítico", "baixo", "vazio"):
+            fila.publicar(mensagem)
+        self.assertEqual(transporte.lotes, [])
+        fila.definir_conexao(True)
+        self.assertEqual(transporte.lotes, [["baixo (x2)", "crítico"], ["vazio"]])
+        self.assertEqual(len(fila), 0)
+
+    def test_capacidade_descarta_mais_antigas(self):
+        fila = FilaNotificacoes(TransporteLoopback(), capacidade=2)
+        for mensagem in ("a", "b", "c"):
+            fila.publicar(mensagem)
+        self.assertEqual((len(fila), fila.descartadas), (2, 1))
+
+    def test_repete_com_backoff(self):
+        transporte = TransporteLoopback(falhas=2)
+        fila = FilaNotificacoes(transporte, backoff_inicial=0.01)
+        fila.definir_conexao(True)
+        fila.publicar("alerta")
+        self.assertEqual((transporte.mensagens, fila.falhas_consecutivas), ([], 1))
+        self.assertEqual(fila.drenar(), 0)  # ainda dentro do backoff
+        relogio.sleep(0.015)
+        fila.drenar()
+        relogio.sleep(0.025)
+        self.assertEqual(fila.drenar(), 1)
+        self.assertEqual(transporte.mensagens, ["alerta"])
+
+    def test_thread_em_segundo_plano(self):
+        transporte = TransporteLoopback()
+        fila = FilaNotificacoes(transporte)
+        fila.iniciar()
+        fila.definir_conexao(True)
+        fila.publicar("alerta")
+        for _ in range(100):
+            if transporte.mensagens:
+                break
+            relogio.sleep(0.01)
+        fila.parar()
+        self.assertEqual(transporte.mensagens, ["alerta"])
+
+    def test_alerta_do_feeder_passa_pela_fila(self):
+        alertas = []
+        feeder = PetFeederTech(lambda mensagem: None)
+        feeder.set_alerta_callback(alertas.append)
+        feeder.ligar()
+        feeder.sensor.peso = 150
+        feeder.verificar_peso()
+        self.assertEqual(alertas, [])
+        feeder.conectar_wifi()
+        self.assertEqual(alertas, ["Nível de ração baixo!"])
+
+class TestFilaComandos(unittest.TestCase):
+    def test_alimentacoes_concorrentes_nao_perdem_atualizacoes(self):
+        feeder = PetFeederTech(lambda mensagem: None)
+        feeder.ligar()
+        feeder.sensor.peso = 100_000
+        threads = [threading.Thread(target=lambda: [feeder.alimentar() for _ in range(50)]) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(feeder.sensor.medir_peso(), 100_000 - 8 * 50 * 50)
+        self.assertEqual(len(feeder.historico_alimentacao), 400)
+        metricas = feeder.comandos.metricas()
+        self.assertEqual((metricas["executados"], metricas["profundidade"]), (400, 0))
+
+    def test_erro_do_comando_volta_para_quem_chamou(self):
+        feeder = PetFeederTech(lambda mensagem: None)
+        with self.assertRaises(ZeroDivisionError):
+            feeder.comandos.executar(lambda: 1 / 0)
+        self.assertEqual(feeder.comandos.executar(lambda: 42), 42)
+
+class TestAmostradorPeso(unittest.TestCase):
+    def test_buffer_circular(self):
+        buffer = BufferCircular(4)
+        for valor in range(6):
+            buffer.adicionar(valor)
+        self.assertEqual(list(buffer.valores()), [2, 3, 4, 5])
+        self.assertEqual(len(buffer), 4)
+
+    def test_filtra_ruido_e_publica_mudancas(self):
+        feeder = PetFeederTech(lambda mensagem: None)
+        gerador = GeradorSinalSintetico(feeder.sensor.medir_peso, ruido=1.0, chance_pico=0.02, semente=7)
+        amostrador = AmostradorPeso(feeder.sensor, leitura=gerador, capacidade=1024)
+        publicados = []
+        amostrador.inscrever(publicados.append)
+        amostrador.amostrar_lote(2000)
+        self.assertAlmostEqual(amostrador.filtrado, 1000, delta=2)
+        self.assertLess(len(publicados), 10)
+        feeder.sensor.consumir_peso(50)
+        amostrador.amostrar_lote(200)
+        self.assertAlmostEqual(publicados[-1], 950, delta=3)
+        self.assertEqual(len(amostrador.brutos), 1024)
+
+    def test_amostragem_continua_em_thread(self):
+        amostrador = AmostradorPeso(PetFeederTech(lambda mensagem: None).sensor)
+        amostrador.iniciar(frequencia=2000)
+        relogio.sleep(0.05)
+        amostrador.parar()
+        self.assertGreater(amostrador.brutos.total, 20)
+        self.assertEqual(amostrador.filtrado, 1000)
+
+class TestControladorDispensa(unittest.TestCase):
+    def setUp(self):
+        self.alertas = []
+        self.feeder = PetFeederTech(lambda mensagem: None)
+        self.feeder.set_alerta_callback(self.alertas.append)
+        self.feeder.ligar()
+        self.feeder.conectar_wifi()
+
+    def test_porcao_vem_do_plano_do_pet(self):
+        self.feeder.configurar_pet(12, "Beagle")
+        self.feeder.alimentar()
+        porcao = self.feeder.plano.porcao
+        self.assertAlmostEqual(self.feeder.historico_alimentacao[-1].gramas, porcao, places=3)
+        self.assertAlmostEqual(self.feeder.sensor.medir_peso(), 1000 - porcao)
+
+    def test_mede_gramas_reais_com_motor_irregular_e_ruido(self):
+        sensor = self.feeder.sensor
+        motor = MotorSimulado(sensor, gramas_por_pulso=8, variacao=0.4, semente=3)
+        amostrador = AmostradorPeso(sensor, leitura=GeradorSinalSintetico(sensor.medir_peso, ruido=0.3, semente=3))
+        controlador = ControladorDispensa(motor, sensor, leitura=amostrador.leitura_estavel)
+        resultado = controlador.dispensar(60)
+        self.assertAlmostEqual(resultado.gramas, 60, delta=3)
+        self.assertAlmostEqual(1000 - sensor.medir_peso(), resultado.gramas, delta=2)
+        self.assertFalse(resultado.travado)
+
+    def test_alimentador_dispensa_pela_leitura_filtrada(self):
+        sensor = self.feeder.sensor
+        self.feeder.amostrador.leitura = GeradorSinalSintetico(sensor.medir_peso, ruido=0.3, chance_pico=0.05, semente=5)
+        self.feeder.alimentar()
+        self.assertAlmostEqual(self.feeder.historico_alimentacao[-1].gramas, 50, delta=3)
+        self.assertAlmostEqual(sensor.medir_peso(), 950, delta=3)
+        self.assertGreater(self.feeder.amostrador.brutos.total, 0)
+
+    def test_detecta_motor_travado(self):
+        self.feeder.motor = MotorSimulado(self.feeder.sensor, travado=True)
+        self.feeder.dispensa = ControladorDispensa(self.feeder.motor, self.feeder.sensor)
+        self.feeder.alimentar()
+        registro = self.feeder.historico_alimentacao[-1]
+        self.assertEqual(registro.gramas, 0)
+        self.assertEqual(self.alertas, ["Motor travado! Verifique o dispensador."])
+
+class TestPlanejadorPorcoes(unittest.TestCase):
+    def setUp(self):
+        self.feeder = PetFeederTech(lambda mensagem: None)
+        self.feeder.ligar()
+
+    def test_racao_diaria_por_peso_e_raca(self):
+        self.assertAlmostEqual(racao_diaria(10.0, "Beagle"), 70 * 10 ** 0.75 * 1.6 / 3.5)
+        self.assertEqual(fator_raca("Pastor Alemão"), 1.8)
+        self.assertEqual(fator_raca("Raça Desconhecida"), 1.6)
+
+    def test_divide_entre_agendamentos(self):
+        self.feeder.configurar_pet(10, "Beagle")
+        self.assertEqual(self.feeder.plano.refeicoes, 2)
+        for minutos in (60, 120, 180, 240):
+            self.feeder.agendar_alimentacao((datetime.now() + timedelta(minutes=minutos)).time(), diario=True)
+        plano = self.feeder.plano
+        self.assertEqual(plano.refeicoes, 4)
+        self.assertAlmostEqual(plano.porcao, plano.diaria / 4)
+
+    def test_refeicoes_acompanham_agenda_grande(self):
+        self.feeder.sensor.peso = 10 ** 9
+        self.feeder.configurar_pet(10, "Beagle")
+        agendamentos = [self.feeder.agendar_alimentacao(time(minuto // 60, minuto % 60), diario=True)
+                        for minuto in range(0, 1440, 2)]
+        self.assertEqual(self.feeder.plano.refeicoes, 720)
+        for agendamento in agendamentos[::3]:
+            self.feeder.cancelar_agendamento(agendamento)
+        self.assertEqual(self.feeder.plano.refeicoes, 480)
+
+    def test_desconta_excesso_das_ultimas_24h(self):
+        self.feeder.configurar_pet(10, "Beagle")
+        diaria = self.feeder.plano.diaria
+        agora = datetime.now().timestamp()
+        self.feeder.historico_alimentacao.registrar(agora - 3600, diaria + 60, 500)
+        self.feeder.replanejar()
+        self.assertAlmostEqual(self.feeder.plano.porcao, (diaria - 60) / 2, places=3)
+
+    def test_proxima_porcao_desconta_o_que_acabou_de_comer(self):
+        self.feeder.sensor.peso = 10 ** 6
+        self.feeder.configurar_pet(10, "Beagle")
+        diaria = self.feeder.plano.diaria
+        self.feeder.alimentar(porcao=2 * diaria)
+        self.assertEqual(self.feeder.porcao(), PORCAO_MINIMA)
+        self.feeder.historico_alimentacao.timestamps[-1] -= 2 * 86400
+        self.feeder.alimentar()
+        self.assertAlmostEqual(self.feeder.historico_alimentacao[-1].gramas, diaria / 2, delta=1)
+
+    def test_planejamento_em_lote(self):
+        feeders = [PetFeederTech(lambda mensagem: None) for _ in range(50)]
+        for indice, feeder in enumerate(feeders):
+            feeder.peso_pet, feeder.raca_pet = 5 + indice % 5, "Poodle"
+        planos = PlanejadorPorcoes().planejar_lote(feeders)
+        self.assertEqual(len({round(plano.diaria, 6) for plano in planos}), 5)
+        self.assertIs(feeders[3].plano, planos[3])
+
+class TestRelogioSimulado(unittest.TestCase):
+    def setUp(self):
+        self.relogio = RelogioSimulado(datetime(2025, 3, 1, 6, 0))
+        RTC().usar_relogio(self.relogio)
+        self.addCleanup(RTC().restaurar)
+
+    def test_rtc_usa_relogio_plugavel(self):
+        feeder = PetFeederTech(lambda mensagem: None)
+        self.assertEqual(feeder.rtc.agora(), datetime(2025, 3, 1, 6, 0))
+        self.relogio.avancar(timedelta(hours=2))
+        self.assertEqual(feeder.rtc.agora(), datetime(2025, 3, 1, 8, 0))
+
+    def test_um_mes_de_agendamentos_com_reabastecimento(self):
+        feeder = PetFeederTech(lambda mensagem: None)
+        feeder.ligar()
+        Agendador(feeder, TimerSimulado(self.relogio))
+        feeder.agendar_alimentacao(time(8, 0), diario=True)
+        feeder.agendar_alimentacao(time(19, 0), diario=True)
+        for semana in range(1, 5):
+            self.relogio.agendar(datetime(2025, 3, 1, 12) + timedelta(weeks=semana), lambda: feeder.reabastecer(700))
+        self.relogio.executar_ate(datetime(2025, 3, 31, 23, 59))
+        historico = feeder.historico_alimentacao
+        self.assertEqual(len(historico), 62)
+        self.assertEqual(str(historico[0])[:16], "01/03/2025 08:00")
+        self.assertEqual(str(historico[-1])[:16], "31/03/2025 19:00")
+        self.assertEqual(feeder.sensor.medir_peso(), 1000 + 4 * 700 - 62 * 50)
+
+class TimerFalso:
+    def __init__(self):
+        self.armados = []
+
+    def armar(self, atraso, callback):
+        self.armados.append(atraso)
+        return len(self.armados)
+
+    def cancelar(self, handle):
+        pass
+
+class TestAgendador(unittest.TestCase):
+    def test_rearma_ao_agendar_e_cancelar(self):
+        feeder = PetFeederTech()
+        timer = TimerFalso()
+        agendador = Agendador(feeder, timer)
+        feeder.ligar()
+        self.assertEqual(timer.armados, [])
+        agendamento = feeder.agendar_alimentacao((datetime.now() + timedelta(minutes=2)).time())
+        self.assertEqual(len(timer.armados), 1)
+        self.assertGreater(timer.armados[0], 60)
+        feeder.cancelar_agendamento(agendamento)
+        self.assertIsNone(agendador._handle)
+
+    def test_dispara_no_loop_asyncio(self):
+        async def cenario():
+            feeder = PetFeederTech()
+            feeder.ligar()
+            Agendador(feeder, TimerAsyncio(asyncio.get_running_loop()))
+            feeder.agendar_alimentacao((datetime.now() + timedelta(seconds=0.2)).time())
+            await asyncio.sleep(0.5)
+            return feeder.sensor.medir_peso()
+
+        self.assertEqual(asyncio.run(cenario()), 950)
+
+class TestAtualizadorTela(unittest.TestCase):
+    def setUp(self):
+        self.relogio = RelogioSimulado(datetime(2025, 1, 6, 8, 0))
+        self.tela = AtualizadorTela(TimerSimulado(self.relogio))
+        self.status = []
+        self.alertas = []
+
+    def test_rajada_vira_um_quadro(self):
+        feeder = PetFeederTech(lambda mensagem: self.tela.definir(self.status.append, mensagem))
+        feeder.ligar()
+        for minuto in range(60):
+            feeder.agendar_alimentacao(time(7, minuto), diario=True)
+            self.tela.anexar(self.alertas.append, f"alerta {minuto}", limite=10)
+        self.assertEqual(self.status, [])
+        self.relogio.executar_ate(self.relogio.atual + timedelta(seconds=1))
+        self.assertEqual(self.tela.quadros, 1)
+        self.assertEqual(self.status, ["Agendado para 07:59 | Frequência: Todos os Dias"])
+        self.assertEqual(self.alertas, [[f"alerta {minuto}" for minuto in range(50, 60)]])
+
+    def test_descarregar_aplica_na_hora(self):
+        self.tela.definir(self.status.append, "Sistema ligado!")
+        self.tela.descarregar()
+        self.tela.descarregar()
+        self.assertEqual(self.status, ["Sistema ligado!"])
+        self.relogio.executar_ate(self.relogio.atual + timedelta(seconds=1))
+        self.assertEqual(self.tela.quadros, 1)
+
+class TestMetricas(unittest.TestCase):
+    def test_percentis_do_histograma(self):
+        histograma = HistogramaLatencia()
+        for _ in range(99):
+            histograma.registrar(0.000_010)
+        histograma.registrar(0.5)
+        self.assertEqual(histograma.percentil(50), 16e-6)
+        self.assertEqual(histograma.percentil(100), (1 << 19) / 1e6)
+        self.assertEqual(histograma.resumo()["maximo"], 0.5)
+
+    def test_instrumentar_conta_alimentacoes_falhas_e_alertas(self):
+        feeder = PetFeederTech(lambda mensagem: None)
+        metricas = Metricas()
+        instrumentar(feeder, metricas)
+        feeder.ligar()
+        feeder.sensor.peso = 120
+        feeder.alimentar()
+        feeder.alimentar()
+        feeder.sensor.peso = 0
+        feeder.alimentar()
+        snapshot = metricas.snapshot()
+        self.assertEqual(snapshot["contadores"]["alimentacoes"], 2)
+        self.assertEqual(snapshot["contadores"]["falhas"], 1)
+        self.assertGreaterEqual(snapshot["contadores"]["alertas"], 1)
+        self.assertEqual(snapshot["latencias"]["alimentar"]["quantidade"], 3)
+        self.assertEqual(snapshot["medidores"]["fila_comandos"], 0)
+
+    def test_deriva_do_timer_e_snapshot_em_arquivo(self):
+        relogio = RelogioSimulado(datetime(2025, 3, 1, 6, 0))
+        RTC().usar_relogio(relogio)
+        self.addCleanup(RTC().restaurar)
+        feeder = PetFeederTech(lambda mensagem: None)
+        metricas = Metricas()
+        feeder.ligar()
+        Agendador(feeder, TimerSimulado(relogio), metricas)
+        feeder.agendar_alimentacao(time(7, 0))
+        relogio.executar_ate(datetime(2025, 3, 1, 8, 0))
+        self.assertEqual(metricas.histogramas["deriva_timer"].quantidade, 12)
+        self.assertEqual(metricas.histogramas["deriva_timer"].maximo, 0)
+
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, "metricas.json")
+            metricas.salvar_snapshot(caminho)
+            with open(caminho, encoding="utf-8") as arquivo:
+                self.assertEqual(json.load(arquivo)["latencias"]["deriva_timer"]["quantidade"], 12)
+
+class Contador:
+    def __init__(self):
+        self.formatado = 0
+
+    def __str__(self):
+        self.formatado += 1
+        return "contador"
+
+class TestRegistroEventos(unittest.TestCase):
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        self.caminho = os.path.join(pasta.name, "eventos.jsonl")
+
+    def test_console_padrao_mantem_formato(self):
+        saida = io.StringIO()
+        with contextlib.redirect_stdout(saida):
+            Motor().liberar_racao()
+        self.assertEqual(saida.getvalue(), "[Motor]: Ração liberada!\n")
+
+    def test_grava_json_lines_com_filtro_de_nivel(self):
+        contador = Contador()
+        registro = RegistroJSON(self.caminho, nivel=logging.WARNING).iniciar()
+        saida = io.StringIO()
+        with contextlib.redirect_stdout(saida):
+            REGISTRO_WIFI.info("%s", contador)
+            REGISTRO_WIFI.warning("Nível de ração baixo!")
+        registro.parar()
+        with open(self.caminho, encoding="utf-8") as arquivo:
+            eventos = [json.loads(linha) for linha in arquivo]
+        self.assertEqual(contador.formatado, 0)
+        self.assertEqual(saida.getvalue(), "")
+        self.assertEqual([(evento["componente"], evento["nivel"], evento["mensagem"]) for evento in eventos],
+                         [("WiFi", "WARNING", "Nível de ração baixo!")])
+
+    def test_liberacao_leva_dados_estruturados(self):
+        feeder = PetFeederTech(lambda mensagem: None)
+        feeder.ligar()
+        registro = RegistroJSON(self.caminho).iniciar()
+        feeder.alimentar(origem=ORIGEM_APP, porcao=40)
+        registro.parar()
+        with open(self.caminho, encoding="utf-8") as arquivo:
+            eventos = [json.loads(linha) for linha in arquivo]
+        motor = [evento for evento in eventos if evento["componente"] == "Motor"]
+        self.assertEqual(motor[0]["dados"], {"gramas": 40, "origem": "app", "peso": 1000})
+
+    def test_rotacao_por_tamanho(self):
+        registro = RegistroJSON(self.caminho, tamanho_maximo=1000, copias=2).iniciar()
+        for indice in range(100):
+            REGISTRO_WIFI.info("mensagem %d", indice)
+        registro.parar()
+        self.assertTrue(os.path.exists(self.caminho + ".1"))
+        self.assertTrue(os.path.exists(self.caminho + ".2"))
+        self.assertFalse(os.path.exists(self.caminho + ".3"))
+        self.assertLessEqual(os.path.getsize(self.caminho), 1000)
+
+class TestRuntimeHeadless(unittest.TestCase):
+    def test_importar_sem_tkinter(self):
+        saida = subprocess.run(
+            [sys.executable, "-c", "import sys, src.main; print('tkinter' in sys.modules)"],
+            capture_output=True, text=True, check=True,
+        )
+        self.assertEqual(saida.stdout.strip(), "False")
+
+    def test_executa_agendamentos_e_alertas(self):
+        relogio = RelogioSimulado(datetime(2025, 3, 3, 7, 0))
+        RTC().usar_relogio(relogio)
+        self.addCleanup(RTC().restaurar)
+        alertas = []
+        feeders = [PetFeederTech() for _ in range(3)]
+        for feeder in feeders:
+            feeder.ligar()
+            feeder.conectar_wifi()
+            feeder.sensor.peso = 150
+            feeder.agendar_alimentacao(time(7, 1))
+        runtime = RuntimeHeadless(feeders, intervalo_peso=30, alerta_callback=alertas.append,
+                                  timer=TimerSimulado(relogio))
+
+        async def cenario():
+            execucao = asyncio.ensure_future(runtime.executar(duracao=300))
+            await asyncio.sleep(0)
+            relogio.avancar(timedelta(minutes=10))
+            await execucao
+
+        asyncio.run(cenario())
+        self.assertEqual([feeder.sensor.medir_peso() for feeder in feeders], [100, 100, 100])
+        self.assertIn("Nível de ração baixo!", alertas)
+        self.assertIsNone(relogio.proximo_evento())
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,145 @@
+import asyncio
+import contextlib
+import io
+import json
+import unittest
+from src.frota import Frota
+from src.main import Metricas, instrumentar
+from src.servidor import ServidorControle, servir
+
+async def requisitar(reader, writer, metodo, caminho, corpo=None):
+    dados = b"" if corpo is None else json.dumps(corpo).encode()
+    writer.write(f"{metodo} {caminho} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(dados)}\r\n\r\n".encode() + dados)
+    cabecalho = (await reader.readuntil(b"\r\n\r\n")).decode()
+    status = int(cabecalho.split(" ")[1])
+    tamanho = int(cabecalho.split("Content-Length: ")[1].split("\r\n")[0])
+    resposta = await reader.readexactly(tamanho)
+    return status, json.loads(resposta) if resposta else None
+
+class TestServidorControle(unittest.TestCase):
+    def executar(self, cenario, metricas=None):
+        async def principal():
+            frota = Frota.criar(2, update_status_callback=lambda mensagem: None)
+            frota.ligar()
+            if metricas is not None:
+                instrumentar(frota[0], metricas)
+            servidor = await ServidorControle(frota, porta=0, metricas=metricas).iniciar()
+            try:
+                return await cenario(frota, servidor)
+            finally:
+                await servidor.parar()
+
+        return asyncio.run(principal())
+
+    def test_comandos_na_mesma_conexao(self):
+        async def cenario(frota, servidor):
+            reader, writer = await asyncio.open_connection("127.0.0.1", servidor.porta)
+            respostas = [
+                await requisitar(reader, writer, "POST", "/alimentadores/1/alimentar"),
+                await requisitar(reader, writer, "POST", "/alimentadores/1/agendamentos", {"horario": "07:30", "diario": True}),
+                await requisitar(reader, writer, "GET", "/alimentadores/1/agendamentos"),
+                await requisitar(reader, writer, "GET", "/alimentadores/1/historico?n=5"),
+                await requisitar(reader, writer, "GET", "/alimentadores/7"),
+            ]
+            status, criado = respostas[1]
+            respostas.append(await requisitar(reader, writer, "DELETE", f"/alimentadores/1/agendamentos/{criado['id']}"))
+            respostas.append(await requisitar(reader, writer, "GET", "/alimentadores"))
+            writer.close()
+            return respostas
+
+        alimentar, criar, listar, historico, inexistente, remover, resumo = self.executar(cenario)
+        self.assertEqual(alimentar, (200, {"peso": 950}))
+        self.assertEqual(criar[0], 201)
+        self.assertEqual([(item["horario"], item["diario"]) for item in listar[1]], [("07:30", True)])
+        self.assertEqual(historico[1]["total"], 1)
+        self.assertEqual(inexistente[0], 404)
+        self.assertEqual(remover, (204, None))
+        self.assertEqual([item["agendamentos"] for item in resumo[1]], [0, 0])
+
+    def test_alertas_empurrados_aos_inscritos(self):
+        async def cenario(frota, servidor):
+            reader, writer = await asyncio.open_connection("127.0.0.1", servidor.porta)
+            writer.write(b"GET /eventos HTTP/1.1\r\nHost: localhost\r\n\r\n")
+            await reader.readuntil(b"\r\n\r\n")
+            while not servidor.inscritos:
+                await asyncio.sleep(0)
+            frota[0].conectar_wifi()
+            frota[0].sensor.peso = 100
+            frota[0].verificar_peso()
+            evento = await asyncio.wait_for(reader.readuntil(b"\n\n"), 1)
+            writer.close()
+            return json.loads(evento.decode()[len("data: "):])
+
+        self.assertEqual(self.executar(cenario), {"alimentador": 0, "mensagem": "Nível de ração baixo!"})
+
+    def test_requisicao_malformada_responde_400(self):
+        async def cenario(frota, servidor):
+            respostas = []
+            for pedido in (b"GARBAGE\r\n\r\n",
+                           b"GET /alimentadores HTTP/1.1\r\nContent-Length: abc\r\n\r\n",
+                           b"GET /alimentadores HTTP/1.1\r\nX: " + b"a" * 70000 + b"\r\n\r\n"):
+                reader, writer = await asyncio.open_connection("127.0.0.1", servidor.porta)
+                writer.write(pedido)
+                respostas.append(await asyncio.wait_for(reader.read(), 1))
+                writer.close()
+            return respostas
+
+        for resposta in self.executar(cenario):
+            self.assertTrue(resposta.startswith(b"HTTP/1.1 400 "), resposta[:40])
+
+    def test_corpo_incompleto_ou_grande_demais(self):
+        async def cenario(frota, servidor):
+            reader, writer = await asyncio.open_connection("127.0.0.1", servidor.porta)
+            writer.write(b"POST /alimentadores/0/agendamentos HTTP/1.1\r\nContent-Length: 10\r\n\r\n{}")
+            writer.write_eof()
+            incompleto = await asyncio.wait_for(reader.read(), 1)
+            reader, writer = await asyncio.open_connection("127.0.0.1", servidor.porta)
+            writer.write(b"POST /alimentadores/0/agendamentos HTTP/1.1\r\nContent-Length: 999999999\r\n\r\n")
+            grande = await asyncio.wait_for(reader.read(), 1)
+            writer.close()
+            return incompleto, grande
+
+        incompleto, grande = self.executar(cenario)
+        self.assertEqual(incompleto, b"")
+        self.assertTrue(grande.startswith(b"HTTP/1.1 413 "))
+
+    def test_servidor_avulso_entrega_alertas(self):
+        async def principal():
+            iniciado = asyncio.get_running_loop().create_future()
+            tarefa = asyncio.ensure_future(servir(porta=0, ao_iniciar=lambda *partes: iniciado.set_result(partes)))
+            servidor, runtime = await iniciado
+            try:
+                reader, writer = await asyncio.open_connection("127.0.0.1", servidor.porta)
+                writer.write(b"GET /eventos HTTP/1.1\r\nHost: localhost\r\n\r\n")
+                await reader.readuntil(b"\r\n\r\n")
+                while not servidor.inscritos:
+                    await asyncio.sleep(0)
+                feeder = servidor.feeders[0]
+                feeder.sensor.peso = 100
+                feeder.verificar_peso()
+                evento = await asyncio.wait_for(reader.readuntil(b"\n\n"), 1)
+                writer.close()
+                return json.loads(evento.decode()[len("data: "):])
+            finally:
+                runtime.parar()
+                await tarefa
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            evento = asyncio.run(principal())
+        self.assertEqual(evento, {"alimentador": 0, "mensagem": "Nível de ração baixo!"})
+
+    def test_metricas_expostas(self):
+        async def cenario(frota, servidor):
+            reader, writer = await asyncio.open_connection("127.0.0.1", servidor.porta)
+            await requisitar(reader, writer, "POST", "/alimentadores/0/alimentar")
+            resposta = await requisitar(reader, writer, "GET", "/metricas")
+            writer.close()
+            return resposta
+
+        status, snapshot = self.executar(cenario, Metricas())
+        self.assertEqual(status, 200)
+        self.assertEqual(snapshot["contadores"]["alimentacoes"], 1)
+        self.assertEqual(snapshot["medidores"]["inscritos_eventos"], 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import os
+import pickle
+import tempfile
+import unittest
+from datetime import datetime, time, timedelta
+from src import snapshot
+from src.frota import Frota
+from src.main import PetFeederTech, Recorrencia
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.feeder = PetFeederTech(lambda mensagem: None)
+        self.feeder.ligar()
+        self.feeder.configurar_fuso("America/Sao_Paulo")
+        self.feeder.configurar_pet(12, "Beagle")
+        self.feeder.agendar_alimentacao(time(7, 30), diario=True)
+        self.feeder.agendar_alimentacao(regra=Recorrencia.intervalo(
+            time(6, 0), time(22, 0), timedelta(hours=4), dias=[0, 2], porcao=30))
+        self.feeder.alimentar()
+        self.feeder.wifi.enviar_notificacao("Ração acabando")
+
+    def agenda(self, feeder):
+        return sorted((agendamento.id, agendamento.disparo, str(agendamento.regra))
+                      for agendamento in feeder.agendamentos)
+
+    def test_clone_preserva_estado(self):
+        clone = snapshot.clonar(self.feeder)
+        self.assertEqual(clone.sensor.peso, self.feeder.sensor.peso)
+        self.assertEqual(self.agenda(clone), self.agenda(self.feeder))
+        self.assertEqual(clone.historico_alimentacao[:], self.feeder.historico_alimentacao[:])
+        self.assertEqual(clone.plano, self.feeder.plano)
+        self.assertEqual(clone.fuso, self.feeder.fuso)
+        self.assertEqual(clone.wifi.fila.pendentes(), [("Ração acabando", 1)])
+        # Ids continuam a partir do maior restaurado.
+        novo = clone.agendar_alimentacao(time(12, 0))
+        self.assertNotIn(novo.id, [id for id, _, _ in self.agenda(self.feeder)])
+
+    def test_versao_desconhecida_e_rejeitada(self):
+        estado = snapshot.capturar(self.feeder)
+        estado["versao"] = snapshot.VERSAO + 1
+        with self.assertRaisesRegex(ValueError, "Versão de snapshot"):
+            snapshot.restaurar(estado)
+
+class TestCheckpoints(unittest.TestCase):
+    def setUp(self):
+        self.frota = Frota.criar(3, update_status_callback=lambda mensagem: None)
+        self.frota.ligar()
+        for feeder in self.frota.feeders:
+            feeder.agendar_alimentacao(time(8, 0), diario=True)
+            feeder.alimentar()
+        self.pasta = tempfile.TemporaryDirectory()
+        self.caminho = os.path.join(self.pasta.name, "frota.ckpt")
+        self.checkpoints = snapshot.Checkpoints(self.frota, self.caminho)
+
+    def tearDown(self):
+        self.pasta.cleanup()
+
+    def test_delta_leva_so_o_que_mudou(self):
+        self.assertEqual(self.checkpoints.gravar(), 3)
+        self.assertEqual(self.checkpoints.gravar(), 0)
+        self.frota[1].alimentar()
+        self.frota[2].agendar_alimentacao(time(20, 0))
+        self.assertEqual(self.checkpoints.gravar(), 2)
+
+        delta = list(snapshot.ler_checkpoints(self.caminho))[-1]
+        self.assertFalse(delta["completo"])
+        self.assertEqual(set(delta["feeders"][1]), {"escalares", "historico"})
+        self.assertEqual(delta["feeders"][1]["historico"][0], 1)
+        self.assertEqual(set(delta["feeders"][2]), {"agenda"})
+
+    def test_restaura_frota_de_completo_mais_deltas(self):
+        self.checkpoints.gravar()
+        self.frota[0].alimentar()
+        self.frota[0].cancelar_agendamento(next(iter(self.frota[0].agendamentos)))
+        self.checkpoints.gravar()
+        # O agendamento vencido avança sem passar pelos ouvintes.
+        self.frota[1].checar_agendamentos(datetime.now() + timedelta(days=1))
+        self.checkpoints.gravar()
+
+        restaurados = snapshot.restaurar_frota(snapshot.ler_checkpoints(self.caminho))
+        for original, restaurado in zip(self.frota.feeders, restaurados):
+            self.assertEqual(restaurado.historico_alimentacao[:], original.historico_alimentacao[:])
+            self.assertEqual([a.disparo for a in restaurado.agendamentos],
+                             [a.disparo for a in original.agendamentos])
+            self.assertEqual(restaurado.sensor.peso, original.sensor.peso)
+
+    def test_registro_final_cortado_e_ignorado(self):
+        self.checkpoints.gravar()
+        tamanho = os.path.getsize(self.caminho)
+        self.frota[0].alimentar()
+        self.checkpoints.gravar()
+        with open(self.caminho, "r+b") as arquivo:
+            arquivo.truncate(os.path.getsize(self.caminho) - 10)
+        self.assertEqual(len(list(snapshot.ler_checkpoints(self.caminho))), 1)
+        restaurados = snapshot.restaurar_frota(snapshot.ler_checkpoints(self.caminho))
+        self.assertEqual(len(restaurados), 3)
+        self.assertEqual(len(restaurados[0].historico_alimentacao), 1)
+        self.assertGreater(os.path.getsize(self.caminho), tamanho)
+
+    def test_gravar_descarta_registro_cortado_antes_de_anexar(self):
+        self.checkpoints.gravar()
+        self.frota[0].alimentar()
+        self.checkpoints.gravar()
+        with open(self.caminho, "r+b") as arquivo:
+            arquivo.truncate(os.path.getsize(self.caminho) - 10)
+        # Outro processo retoma a gravação no mesmo arquivo.
+        checkpoints = snapshot.Checkpoints(self.frota, self.caminho)
+        checkpoints.gravar()
+        self.frota[1].alimentar()
+        checkpoints.gravar()
+        lidos = list(snapshot.ler_checkpoints(self.caminho))
+        self.assertEqual([checkpoint["completo"] for checkpoint in lidos], [True, True, False])
+        self.assertEqual(set(lidos[-1]["feeders"]), {1})
+        restaurados = snapshot.restaurar_frota(lidos)
+        self.assertEqual([len(feeder.historico_alimentacao) for feeder in restaurados], [2, 2, 1])
+
+    def test_compactar_reescreve_um_unico_completo(self):
+        self.checkpoints.gravar()
+        self.frota[0].alimentar()
+        self.checkpoints.gravar()
+        self.checkpoints.compactar()
+        with open(self.caminho, "rb") as arquivo:
+            unico = pickle.load(arquivo)
+            self.assertEqual(arquivo.read(), b"")
+        self.assertTrue(unico["completo"])
+        restaurados = snapshot.restaurar_frota([unico])
+        self.assertEqual(len(restaurados[0].historico_alimentacao), 2)
+
+if __name__ == "__main__":
+    unittest.main()